@@ -3,7 +3,10 @@ import os
 import shutil
 import zipfile
 from novel_process import process_novel
-from tts_process import process_tts, get_chinese_voices
+from chapter_store import count_chapters, open_chapter_reader
+from tts_process import DEFAULT_BACKEND, DEFAULT_CONCURRENCY, process_tts, get_chinese_voices, get_backend_voices
+from tts_queue import SCHEDULE_ROUND_ROBIN, SCHEDULE_SEQUENTIAL
+from tts_events import describe_progress
 from video_process_async import process_novel_videos
 import subprocess
 import sys
@@ -23,6 +26,7 @@ total_chapters = 0
 conversion_process = None
 video_process = None
 merge_process = None  # 新增合并进程变量
+variant_process = None  # 生成语速版本的进程
 
 def get_base_path():
     """获取项目基础路径"""
@@ -51,9 +55,9 @@ def save_uploaded_file(file):
         print(f"文件上传失败: {str(e)}")
         return f"文件上传失败: {str(e)}"
 
-def process_chapters():
+def process_chapters(import_workers=1):
     """处理小说分章节"""
-    novel_count = process_novel()
+    novel_count = process_novel(int(import_workers or 1))
     print(f"已处理 {novel_count} 本小说的章节分割")
     return f"章节处理完成，共处理 {novel_count} 本小说"
 
@@ -67,12 +71,21 @@ def count_total_chapters():
         for novel_dir in os.listdir(text_dir):
             novel_path = os.path.join(text_dir, novel_dir)
             if os.path.isdir(novel_path):
-                count += len([f for f in os.listdir(novel_path) if f.endswith('.txt')])
+                count += count_chapters(novel_path)
     
     return count
 
-def convert_to_speech(voice, rate):
-    """转换语音"""
+def get_events_path():
+    """语音转换进度事件文件路径"""
+    return os.path.join(get_base_path(), "data", "tmp", "tts_events.jsonl")
+
+def get_conversion_progress():
+    """读取语音转换进度"""
+    return describe_progress(get_events_path())
+
+def convert_to_speech(voice, rate, concurrency=DEFAULT_CONCURRENCY, schedule=SCHEDULE_ROUND_ROBIN, warmup=0,
+                      backend=DEFAULT_BACKEND, resynthesize=False):
+    """转换语音，resynthesize 为是否重新合成已转换的章节"""
     global conversion_process
     try:
         # 获取Python解释器路径
@@ -81,7 +94,15 @@ def convert_to_speech(voice, rate):
         # 启动新进程执行转换，显示控制台输出
         # 获取总章节数作为参数传递
         total_chapters = count_total_chapters()
-        cmd = f'"{python_path}" tts_process.py "{voice}" "{format_rate(rate)}" {total_chapters}'
+        # 每次转换重新开始记录进度事件
+        events_path = get_events_path()
+        if os.path.exists(events_path):
+            os.remove(events_path)
+        cmd = (f'"{python_path}" tts_process.py "{voice}" "{format_rate(rate)}" {total_chapters} '
+               f'--concurrency {max(1, int(concurrency or 1))} '
+               f'--schedule {schedule} --warmup {max(0, int(warmup or 0))} --backend {backend} --events "{events_path}"')
+        if resynthesize:
+            cmd += ' --resynthesize'
         conversion_process = subprocess.Popen(
             cmd, 
             shell=True,
@@ -93,6 +114,39 @@ def convert_to_speech(voice, rate):
         print(f"转换进程启动失败: {str(e)}")
         return f"转换进程启动失败: {str(e)}"
 
+def create_rate_variants(rate, override_source_rate=False, source_rate=0):
+    """由已转换的章节音频变速生成另一种语速的版本，不重新合成
+
+    变速倍数默认按转换时记录的合成语速计算，override_source_rate 为 True 时改用 source_rate。
+    """
+    global variant_process
+    try:
+        if variant_process and variant_process.poll() is None:
+            return "语速版本正在生成中"
+        python_path = sys.executable
+        cmd = f'"{python_path}" rate_variants.py "{format_rate(rate)}"'
+        if override_source_rate:
+            cmd += f' "--source-rate={format_rate(source_rate)}"'
+        variant_process = subprocess.Popen(
+            cmd,
+            shell=True,
+            stdout=None,
+            stderr=None
+        )
+        return f"正在生成语速 {format_rate(rate)} 的版本，输出到 data/out_mp3_rate/{format_rate(rate)}"
+    except Exception as e:
+        print(f"语速版本生成进程启动失败: {str(e)}")
+        return f"语速版本生成进程启动失败: {str(e)}"
+
+def update_voice_choices(backend):
+    """切换合成后端时更新语音列表"""
+    try:
+        voices = get_backend_voices(backend)
+    except Exception as e:
+        print(f"获取语音列表失败: {str(e)}")
+        voices = []
+    return gr.update(choices=voices, value=voices[0] if voices else None)
+
 def stop_conversion():
     """停止转换进程"""
     global conversion_process
@@ -133,11 +187,15 @@ def package_audio():
                 for novel_dir in os.listdir(text_dir):
                     novel_path = os.path.join(text_dir, novel_dir)
                     if os.path.isdir(novel_path):
-                        for file in os.listdir(novel_path):
-                            if file.endswith('.txt'):
-                                file_path = os.path.join(novel_path, file)
-                                arcname = os.path.join(novel_dir, "小说章节", file)
-                                zipf.write(file_path, arcname)
+                        with open_chapter_reader(novel_path) as reader:
+                            for name in reader.names():
+                                arcname = os.path.join(novel_dir, "小说章节", f"{name}.txt")
+                                file_path = reader.path(name)
+                                if file_path:
+                                    zipf.write(file_path, arcname)
+                                else:
+                                    # 打包格式的章节直接写入压缩包
+                                    zipf.writestr(arcname, reader.read(name))
                                 print(f"已添加文件: {arcname}")
             
             # 打包原始音频文件
@@ -240,7 +298,7 @@ def update_text_files():
         for novel_dir in os.listdir(text_dir):
             novel_path = os.path.join(text_dir, novel_dir)
             if os.path.isdir(novel_path):
-                chapter_count = len([f for f in os.listdir(novel_path) if f.endswith('.txt')])
+                chapter_count = count_chapters(novel_path)
                 result.append([novel_dir, chapter_count, "删除"])
     return result
 
@@ -646,6 +704,11 @@ with gr.Blocks(title="小说文本转语音工具") as demo:
     
     with gr.Tab("步骤1：文本转语音"):
         with gr.Row():
+            backend_dropdown = gr.Dropdown(
+                choices=[("Edge TTS（在线）", "edge"), ("本地引擎（离线）", "local")],
+                value=DEFAULT_BACKEND,
+                label="合成后端"
+            )
             voice_dropdown = gr.Dropdown(
                 choices=get_chinese_voices(),
                 value="zh-CN-YunxiNeural",
@@ -682,6 +745,12 @@ with gr.Blocks(title="小说文本转语音工具") as demo:
         with gr.Group():
             gr.Markdown("## 步骤2：处理小说分章节")
             with gr.Column():
+                import_workers_input = gr.Number(
+                    label="并行处理进程数（0 表示使用全部CPU核心）",
+                    value=1,
+                    precision=0,
+                    minimum=0
+                )
                 process_btn = gr.Button("开始处理章节", variant="primary")
                 with gr.Row():
                     refresh_text_btn = gr.Button("刷新文件列表", variant="secondary")
@@ -696,9 +765,44 @@ with gr.Blocks(title="小说文本转语音工具") as demo:
         with gr.Group():
             gr.Markdown("## 步骤3：转换语音")
             with gr.Column():
+                with gr.Row():
+                    concurrency_input = gr.Number(
+                        label="初始并发请求数（会根据服务状况自动调整）",
+                        value=DEFAULT_CONCURRENCY,
+                        precision=0,
+                        minimum=1
+                    )
+                    schedule_dropdown = gr.Dropdown(
+                        choices=[("各小说轮流转换", SCHEDULE_ROUND_ROBIN), ("逐本转换", SCHEDULE_SEQUENTIAL)],
+                        value=SCHEDULE_ROUND_ROBIN,
+                        label="调度策略"
+                    )
+                    warmup_input = gr.Number(
+                        label="优先转换每本小说的前几章",
+                        value=3,
+                        precision=0,
+                        minimum=0
+                    )
+                    resynthesize_checkbox = gr.Checkbox(
+                        label="重新合成已转换的章节（只换语速时请用下方的“生成语速版本”）",
+                        value=False
+                    )
                 with gr.Row():
                     convert_btn = gr.Button("开始转换语音", variant="primary")
                     stop_btn = gr.Button("停止转换", variant="secondary")
+                with gr.Row():
+                    override_source_rate_checkbox = gr.Checkbox(
+                        label="手动指定已转换音频的语速（默认使用转换时记录的语速）",
+                        value=False
+                    )
+                    source_rate_slider = gr.Slider(
+                        minimum=-50,
+                        maximum=50,
+                        value=10,
+                        step=10,
+                        label="已转换音频的语速（%）"
+                    )
+                    variant_btn = gr.Button("生成语速版本（按上方语速由已转换音频变速）", variant="secondary")
                 with gr.Row():
                     refresh_mp3_btn = gr.Button("刷新文件列表", variant="secondary")
                 mp3_files = gr.Dataframe(
@@ -797,7 +901,7 @@ with gr.Blocks(title="小说文本转语音工具") as demo:
         
         process_btn.click(
             fn=process_chapters,
-            inputs=[],
+            inputs=[import_workers_input],
             outputs=process_output
         ).then(
             fn=update_text_files,
@@ -809,18 +913,34 @@ with gr.Blocks(title="小说文本转语音工具") as demo:
             outputs=text_files
         )
         
+        backend_dropdown.change(
+            fn=update_voice_choices,
+            inputs=backend_dropdown,
+            outputs=voice_dropdown
+        )
+        
         convert_btn.click(
             fn=convert_to_speech,
-            inputs=[voice_dropdown, rate_slider],
+            inputs=[voice_dropdown, rate_slider, concurrency_input, schedule_dropdown, warmup_input,
+                    backend_dropdown, resynthesize_checkbox],
             outputs=convert_output
         ).then(
             fn=update_mp3_files,
             outputs=mp3_files
         )
         
+        variant_btn.click(
+            fn=create_rate_variants,
+            inputs=[rate_slider, override_source_rate_checkbox, source_rate_slider],
+            outputs=convert_output
+        )
+        
         refresh_mp3_btn.click(
             fn=update_mp3_files,
             outputs=mp3_files
+        ).then(
+            fn=get_conversion_progress,
+            outputs=convert_output
         )
         
         stop_btn.click(
@@ -0,0 +1,185 @@
+import os
+import glob
+import json
+import time
+import uuid
+import shutil
+import hashlib
+from typing import Dict, Iterable, Optional
+
+# 默认缓存容量上限
+DEFAULT_CACHE_SIZE_MB = 2048
+# 缓存目录中记录各缓存键最近使用时间的索引文件
+ACCESS_INDEX_NAME = 'access.json'
+# 累计这么多次命中后保存一次最近使用时间
+ACCESS_SAVE_INTERVAL = 100
+
+def get_base_path() -> str:
+    """获取项目根目录"""
+    return os.path.dirname(os.path.abspath(__file__))
+
+def get_cache_dir() -> str:
+    """音频缓存目录"""
+    return os.path.join(get_base_path(), "data", "cache", "audio")
+
+def audio_key(text: str, voice: str, rate: str) -> str:
+    """由朗读文本、语音和语速决定的缓存键"""
+    return hashlib.sha1(f"{voice}\n{rate}\n{text}".encode('utf-8')).hexdigest()
+
+def link_or_copy(src: str, dst: str):
+    """优先用硬链接把 src 放到 dst（跨文件系统等情况下改为复制），dst 已存在时原子替换
+
+    临时文件名带随机后缀，多个进程同时写入同一个 dst 时互不干扰。
+    """
+    tmp_path = f"{dst}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+class AudioCache:
+    """按内容寻址的合成音频缓存
+
+    相同的朗读文本、语音和语速只合成一次，与小说名和章节名无关。文件按缓存键保存在
+    两级目录中，总大小超过上限时淘汰最久未使用的文件。音频可以带有同名的附属文件（如字幕），
+    扩展名由 sidecars 指定，与音频一起缓存和淘汰。
+
+    缓存文件与输出的章节音频是同一文件的硬链接，修改缓存文件的修改时间会同时改变章节音频的
+    修改时间（使音频检查和语速版本的记录失效），因此最近使用时间记录在索引文件中，
+    没有记录的文件以加入缓存时的修改时间为准。用完后应调用 save() 保存最近使用时间。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_size_mb: float = DEFAULT_CACHE_SIZE_MB):
+        self.cache_dir = cache_dir or get_cache_dir()
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.size = sum(size for _, size, _ in self._entries())
+        # 本进程命中、尚未写入索引的 {缓存键: 使用时间}
+        self._accessed = {}
+
+    def _entries(self):
+        """遍历缓存文件，返回 (路径, 大小, 修改时间)"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for sub in os.listdir(self.cache_dir):
+            sub_dir = os.path.join(self.cache_dir, sub)
+            if not os.path.isdir(sub_dir):
+                continue
+            for file in os.listdir(sub_dir):
+                if file.endswith('.mp3'):
+                    path = os.path.join(sub_dir, file)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + '.mp3')
+
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, ACCESS_INDEX_NAME)
+
+    def _load_access(self) -> Dict[str, float]:
+        """读取索引中的最近使用时间，并合并本进程尚未保存的记录"""
+        try:
+            with open(self._index_path(), 'r', encoding='utf-8') as f:
+                access = json.load(f)
+        except (OSError, ValueError):
+            access = {}
+        for key, used in self._accessed.items():
+            access[key] = max(used, access.get(key, 0))
+        return access
+
+    def _write_access(self, access: Dict[str, float]):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index_path = self._index_path()
+        tmp_path = f"{index_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(access, f, separators=(',', ':'))
+        os.replace(tmp_path, index_path)
+        self._accessed = {}
+
+    def save(self):
+        """把本进程记录的最近使用时间合并写入索引（多个进程共用缓存时按较晚的时间合并）"""
+        if self._accessed:
+            self._write_access(self._load_access())
+
+    @staticmethod
+    def _sidecar(path: str, ext: str) -> str:
+        return os.path.splitext(path)[0] + ext
+
+    def get(self, key: str, output_path: str, sidecars: Iterable[str] = ()) -> bool:
+        """缓存命中时把音频（和附属文件）放到 output_path 并返回 True，缺少附属文件时视为未命中"""
+        cache_path = self.path(key)
+        if not os.path.exists(cache_path):
+            return False
+        if not all(os.path.exists(self._sidecar(cache_path, ext)) for ext in sidecars):
+            return False
+        # 音频最后放置，音频存在时附属文件也已就绪
+        for ext in sidecars:
+            link_or_copy(self._sidecar(cache_path, ext), self._sidecar(output_path, ext))
+        link_or_copy(cache_path, output_path)
+        # 记录最近使用时间（不修改与输出文件共用的修改时间）
+        self._accessed[key] = time.time()
+        if len(self._accessed) >= ACCESS_SAVE_INTERVAL:
+            self.save()
+        self.hits += 1
+        return True
+
+    def put(self, key: str, audio_path: str, sidecars: Iterable[str] = ()):
+        """把新合成的音频（和存在的附属文件）加入缓存，超过容量上限时淘汰旧文件"""
+        cache_path = self.path(key)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        for ext in sidecars:
+            src = self._sidecar(audio_path, ext)
+            if os.path.exists(src) and not os.path.exists(self._sidecar(cache_path, ext)):
+                link_or_copy(src, self._sidecar(cache_path, ext))
+        if os.path.exists(cache_path):
+            return
+        link_or_copy(audio_path, cache_path)
+        self.size += os.path.getsize(cache_path)
+        if self.size > self.max_size:
+            self.evict()
+
+    def discard(self, key: str):
+        """删除缓存的音频和附属文件"""
+        cache_path = self.path(key)
+        self._accessed.pop(key, None)
+        for path in [cache_path] + glob.glob(glob.escape(cache_path[:-4]) + '.*'):
+            try:
+                size = os.path.getsize(path) if path == cache_path else 0
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+
+    def evict(self):
+        """按最近使用时间淘汰缓存，直到总大小降到上限的 90% 以下"""
+        access = self._load_access()
+
+        def last_used(entry):
+            path, _, mtime = entry
+            return max(access.get(os.path.basename(path)[:-4], 0), mtime)
+
+        entries = sorted(self._entries(), key=last_used)
+        self.size = sum(size for _, size, _ in entries)
+        # 索引只保留仍在缓存中的文件
+        remaining = {os.path.basename(path)[:-4] for path, _, _ in entries}
+        target = self.max_size * 0.9
+        for path, size, _ in entries:
+            if self.size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+            remaining.discard(os.path.basename(path)[:-4])
+            for sidecar in glob.glob(glob.escape(path[:-4]) + '.*'):
+                try:
+                    os.remove(sidecar)
+                except OSError:
+                    pass
+        self._write_access({key: used for key, used in access.items() if key in remaining})
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import argparse
+from typing import Dict, Optional
+
+from mp3_frames import scan_mp3
+from speech_text import load_segment_plan
+
+# 朗读速度的合理范围（字/秒），超出时认为音频不完整或有误
+DEFAULT_MIN_CHARS_PER_SEC = 0.5
+DEFAULT_MAX_CHARS_PER_SEC = 15.0
+# 合成的音频由完整的帧首尾相接，帧之间无法解析的字节超过该值时认为文件损坏
+MAX_JUNK_BYTES = 512
+# 字数较少的章节时长波动大，不检查朗读速度
+MIN_CHECK_CHARS = 50
+# 可疑音频移入小说音频目录下的该子目录
+QUARANTINE_DIR = "quarantine"
+SCAN_CACHE_VERSION = 1
+
+def get_base_path() -> str:
+    """获取项目根目录"""
+    return os.path.dirname(os.path.abspath(__file__))
+
+def get_scan_cache_path() -> str:
+    """音频检查结果缓存文件"""
+    return os.path.join(get_base_path(), "data", "cache", "mp3_scan.json")
+
+class AudioChecker:
+    """检查已转换的章节音频是否完整
+
+    逐帧检查帧头（不解码），并把时长与朗读文本字数比较。检查结果按文件路径缓存，
+    文件大小和修改时间都未变化时直接使用缓存结果，大量章节的重复检查只需要 stat。
+    move_suspicious 为 True 时转换前把已转换的可疑音频移入隔离目录并重新转换，
+    否则（默认）只报告，不移动用户已有的音频。
+    """
+
+    def __init__(self, cache_path: Optional[str] = None, min_chars_per_sec: float = DEFAULT_MIN_CHARS_PER_SEC,
+                 max_chars_per_sec: float = DEFAULT_MAX_CHARS_PER_SEC, move_suspicious: bool = False):
+        self.cache_path = cache_path or get_scan_cache_path()
+        self.min_chars_per_sec = min_chars_per_sec
+        self.max_chars_per_sec = max_chars_per_sec
+        self.move_suspicious = move_suspicious
+        self.scanned = 0
+        self._dirty = False
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.results = data.get('files', {}) if data.get('version') == SCAN_CACHE_VERSION else {}
+
+    def save(self):
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = f"{self.cache_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': SCAN_CACHE_VERSION, 'files': self.results}, f,
+                      ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
+
+    def scan(self, path: str, remember: bool = True) -> Dict:
+        """检查音频文件的帧结构，返回 scan_mp3 的结果；remember 为 False 时不缓存（如临时文件）"""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        cached = self.results.get(key)
+        if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime_ns:
+            return cached
+        with open(path, 'rb') as f:
+            result = scan_mp3(f.read())
+        result.update(size=stat.st_size, mtime=stat.st_mtime_ns)
+        self.scanned += 1
+        if remember:
+            self.results[key] = result
+            self._dirty = True
+        return result
+
+    def forget(self, path: str):
+        if self.results.pop(os.path.abspath(path), None) is not None:
+            self._dirty = True
+
+    def check(self, path: str, chars: int = 0, remember: bool = True) -> Optional[str]:
+        """检查音频，正常时返回 None，可疑时返回原因"""
+        try:
+            result = self.scan(path, remember)
+        except OSError as e:
+            return f"无法读取: {str(e)}"
+        if result['frames'] == 0:
+            return "没有有效的音频帧"
+        if result['truncated']:
+            return f"结尾有 {result['truncated']} 字节不完整的帧"
+        if result['junk'] > MAX_JUNK_BYTES:
+            return f"有 {result['junk']} 字节无法解析"
+        if chars >= MIN_CHECK_CHARS:
+            speed = chars / result['duration']
+            if speed > self.max_chars_per_sec:
+                return f"时长 {result['duration']:.1f} 秒，相对 {chars} 字过短"
+            if speed < self.min_chars_per_sec:
+                return f"时长 {result['duration']:.1f} 秒，相对 {chars} 字过长"
+        return None
+
+def quarantine(path: str, reason: str) -> str:
+    """把可疑音频（和同名字幕）移入所在目录的 quarantine 子目录，返回新路径"""
+    quarantine_dir = os.path.join(os.path.dirname(path), QUARANTINE_DIR)
+    os.makedirs(quarantine_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    # 加上时间戳，同一章节多次被隔离时不覆盖
+    target_stem = f"{stem}.{time.strftime('%Y%m%d%H%M%S')}"
+    target = os.path.join(quarantine_dir, target_stem + '.mp3')
+    shutil.move(path, target)
+    for ext in ('.srt', '.vtt'):
+        sidecar = os.path.splitext(path)[0] + ext
+        if os.path.exists(sidecar):
+            shutil.move(sidecar, os.path.join(quarantine_dir, target_stem + ext))
+    with open(os.path.join(quarantine_dir, target_stem + '.txt'), 'w', encoding='utf-8') as f:
+        f.write(reason + '\n')
+    return target
+
+def check_library(mp3_root: str, text_root: str, checker: AudioChecker, move: bool = False) -> Dict[str, int]:
+    """检查全部小说的章节音频，返回 {'checked': 数量, 'suspicious': 数量}"""
+    counts = {'checked': 0, 'suspicious': 0}
+    for novel in sorted(os.listdir(mp3_root)):
+        mp3_dir = os.path.join(mp3_root, novel)
+        if not os.path.isdir(mp3_dir):
+            continue
+        chapters = load_segment_plan(os.path.join(text_root, novel)).get('chapters', {})
+        for file in sorted(os.listdir(mp3_dir)):
+            if not file.endswith('.mp3'):
+                continue
+            path = os.path.join(mp3_dir, file)
+            chapter = chapters.get(file[:-4], {})
+            reason = checker.check(path, chapter.get('speech_chars', chapter.get('chars', 0)))
+            counts['checked'] += 1
+            if reason is None:
+                continue
+            counts['suspicious'] += 1
+            if move:
+                quarantine(path, reason)
+                checker.forget(path)
+                print(f"已隔离: {novel}/{file}（{reason}）")
+            else:
+                print(f"可疑: {novel}/{file}（{reason}）")
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='检查已转换的章节音频是否完整')
+    parser.add_argument('--quarantine', action='store_true', help='把可疑音频移入隔离目录，下次转换时重新合成')
+    args = parser.parse_args()
+
+    base_path = get_base_path()
+    checker = AudioChecker()
+    start = time.monotonic()
+    counts = check_library(os.path.join(base_path, "data", "out_mp3"), os.path.join(base_path, "data", "out_text"),
+                           checker, args.quarantine)
+    checker.save()
+    print(f"检查 {counts['checked']} 个音频（扫描 {checker.scanned} 个），"
+          f"可疑 {counts['suspicious']} 个，用时 {time.monotonic() - start:.2f} 秒")
@@ -0,0 +1,271 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import List, Tuple, Dict, Optional, Callable
+
+from chapter_store import ChapterFileWriter
+from novel_process import detect_encoding, process_content, split_chapters, save_chapters
+from speech_text import read_integer
+
+# 基准结果和基线的保存位置
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "benchmark")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+RESULTS_PATH = os.path.join(BENCHMARK_DIR, "results.json")
+
+# 耗时或峰值内存超过基线该比例时视为性能退化
+DEFAULT_TOLERANCE = 0.2
+# 耗时增加不足该秒数时视为测量误差
+MIN_REGRESSION_SECONDS = 0.005
+STAGES = ['detect_encoding', 'process_content', 'split_chapters', 'save_chapters']
+HEADING_STYLES = ['arabic', 'chinese', 'traditional']
+
+# 生成正文用的常用字（均可用 GB18030 和 Big5 编码）
+TEXT_CHARS = (
+    '的一是不人我在有他中大來上個到說們為子和你地出道也時年得就那要下以生會自著去之過家學對可裡後小'
+    '心多天而能好都然沒日於起還發成事只作當想看文無開手十用主行方又如前所本見經頭面公同三已老從動兩長'
+    '知民樣現分將外但身些與高意進把法此實回二理美點月明其種聲全工己話兒者向情部正名定女問力機給等幾很'
+)
+SEPARATOR_LINES = ['-----', '=====', '*****', '~~~~~~', '##########']
+TRADITIONAL_DIGITS = str.maketrans('一二三四五六七八九十百千万', '壹贰叁肆伍陆柒捌玖拾佰仟萬')
+
+def format_heading(number: int, style: str, title: str = '') -> str:
+    """按指定数字风格生成章节标题"""
+    if style == 'arabic':
+        numeral = str(number)
+    elif style == 'chinese':
+        numeral = read_integer(number)
+    else:
+        # 配置中的繁体数字模式不含“零”，省略后仍能解析出相同的章节号
+        numeral = read_integer(number).replace('零', '').translate(TRADITIONAL_DIGITS)
+    return f"第{numeral}章 {title}".rstrip()
+
+def _paragraph(rng: random.Random, length: int) -> str:
+    """生成一段由若干句子组成的正文"""
+    sentences = []
+    total = 0
+    while total < length:
+        sentence = ''.join(rng.choice(TEXT_CHARS) for _ in range(rng.randint(6, 30)))
+        if rng.random() < 0.2:
+            sentence = f"他說：“{sentence}！”"
+        else:
+            sentence += rng.choice('。。。，！？…')
+        sentences.append(sentence)
+        total += len(sentence)
+    return ''.join(sentences)
+
+def generate_novel(chapters: int = 300, chapter_chars: int = 3000, heading_style: str = 'mixed',
+                   duplicate_ratio: float = 0.0, separator_ratio: float = 0.05,
+                   blank_ratio: float = 0.3, seed: int = 0) -> str:
+    """生成确定性的合成小说文本
+
+    heading_style 为 arabic/chinese/traditional，或 mixed 轮流使用三种风格；
+    duplicate_ratio 为重复章节标题的比例，separator_ratio 和 blank_ratio 为段落后
+    插入分隔符行和空行的概率。相同参数总是生成相同的文本。
+    """
+    rng = random.Random(seed)
+    lines = []
+    for number in range(1, chapters + 1):
+        style = HEADING_STYLES[number % 3] if heading_style == 'mixed' else heading_style
+        heading_number = number
+        if number > 1 and rng.random() < duplicate_ratio:
+            heading_number = number - 1
+        title = ''.join(rng.choice(TEXT_CHARS) for _ in range(rng.randint(2, 8)))
+        lines.append(format_heading(heading_number, style, title))
+
+        written = 0
+        while written < chapter_chars:
+            paragraph = '　　' + _paragraph(rng, rng.randint(80, 400))
+            lines.append(paragraph)
+            written += len(paragraph)
+            if rng.random() < blank_ratio:
+                lines.append('')
+            if rng.random() < separator_ratio:
+                lines.append(rng.choice(SEPARATOR_LINES))
+    return '\n'.join(lines) + '\n'
+
+def write_novel(path: str, text: str, encoding: str = 'utf-8') -> int:
+    """按指定编码写入合成小说，返回文件字节数"""
+    data = text.encode(encoding)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+# 默认的基准用例
+DEFAULT_CASES = [
+    {'name': 'utf8-arabic', 'encoding': 'utf-8', 'chapters': 300, 'heading_style': 'arabic'},
+    {'name': 'gb18030-chinese', 'encoding': 'gb18030', 'chapters': 300, 'heading_style': 'chinese'},
+    {'name': 'gb18030-traditional', 'encoding': 'gb18030', 'chapters': 300, 'heading_style': 'traditional'},
+    {'name': 'big5-chinese', 'encoding': 'big5', 'chapters': 300, 'heading_style': 'chinese'},
+    {'name': 'utf16-mixed-duplicates', 'encoding': 'utf-16', 'chapters': 300,
+     'heading_style': 'mixed', 'duplicate_ratio': 0.02, 'separator_ratio': 0.2},
+    {'name': 'utf8-large', 'encoding': 'utf-8', 'chapters': 2000, 'heading_style': 'mixed'}
+]
+GENERATOR_OPTIONS = ('chapters', 'chapter_chars', 'heading_style', 'duplicate_ratio',
+                     'separator_ratio', 'blank_ratio', 'seed')
+
+def _measure(func: Callable, repeat: int) -> Tuple[Dict, object]:
+    """预热一次后多次运行取最短耗时，再单独运行一次记录峰值内存"""
+    result = func()
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': round(best, 6), 'peak_kb': round(peak / 1024, 1)}, result
+
+def run_case(case: Dict, work_dir: str, repeat: int = 3) -> Dict:
+    """运行单个基准用例，分别测量各阶段的耗时和峰值内存"""
+    options = {key: case[key] for key in GENERATOR_OPTIONS if key in case}
+    text = generate_novel(**options)
+    novel_path = os.path.join(work_dir, f"{case['name']}.txt")
+    size = write_novel(novel_path, text, case['encoding'])
+    with open(novel_path, 'r', encoding=case['encoding']) as f:
+        content = f.read()
+
+    stages = {}
+    with redirect_stdout(io.StringIO()):
+        stages['detect_encoding'], encoding = _measure(lambda: detect_encoding(novel_path), repeat)
+        stages['process_content'], _ = _measure(lambda: process_content(content), repeat)
+        stages['split_chapters'], chapters = _measure(lambda: split_chapters(content), repeat)
+
+        runs = []
+        def save():
+            # 每次写入新目录，避免内容未变化的章节被跳过
+            output_dir = os.path.join(work_dir, f"{case['name']}-{len(runs)}")
+            runs.append(output_dir)
+            writer = ChapterFileWriter(output_dir)
+            count = save_chapters(case['name'], chapters, writer=writer)
+            writer.close()
+            shutil.rmtree(output_dir)
+            return count
+        stages['save_chapters'], _ = _measure(save, repeat)
+
+    return {
+        'bytes': size,
+        'chapters': len(chapters),
+        'encoding': encoding,
+        'stages': stages
+    }
+
+def run_benchmarks(cases: Optional[List[Dict]] = None, repeat: int = 3) -> Dict:
+    """运行全部基准用例"""
+    cases = cases or DEFAULT_CASES
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'cases': {}
+    }
+    work_dir = tempfile.mkdtemp(prefix='novel_benchmark_')
+    try:
+        for case in cases:
+            print(f"正在运行基准用例：{case['name']}")
+            results['cases'][case['name']] = run_case(case, work_dir, repeat)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def compare_results(results: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """与基线比较，返回性能退化的描述列表"""
+    regressions = []
+    for name, case in results['cases'].items():
+        base_case = baseline.get('cases', {}).get(name)
+        if not base_case:
+            continue
+        if case['chapters'] != base_case['chapters']:
+            regressions.append(f"{name}: 章节数 {base_case['chapters']} -> {case['chapters']}")
+        for stage in STAGES:
+            current = case['stages'][stage]
+            base = base_case['stages'].get(stage)
+            if not base:
+                continue
+            for key, unit in (('seconds', '秒'), ('peak_kb', 'KB')):
+                if key == 'seconds' and current[key] - base[key] < MIN_REGRESSION_SECONDS:
+                    continue
+                if base[key] and current[key] > base[key] * (1 + tolerance):
+                    regressions.append(
+                        f"{name}/{stage}: {key} {base[key]}{unit} -> {current[key]}{unit} "
+                        f"(+{current[key] / base[key] - 1:.0%})")
+    return regressions
+
+def print_results(results: Dict, baseline: Optional[Dict] = None):
+    """打印各用例各阶段的耗时和峰值内存，有基线时附带变化比例"""
+    for name, case in results['cases'].items():
+        print(f"\n{name}：{case['bytes'] / 1024 / 1024:.1f} MB，{case['chapters']} 章，编码 {case['encoding']}")
+        base_case = (baseline or {}).get('cases', {}).get(name, {})
+        for stage in STAGES:
+            current = case['stages'][stage]
+            line = f"  {stage:<16}{current['seconds'] * 1000:10.1f} ms{current['peak_kb']:12.0f} KB"
+            base = base_case.get('stages', {}).get(stage)
+            if base and base['seconds']:
+                line += f"  ({current['seconds'] / base['seconds'] - 1:+.0%})"
+            print(line)
+
+def load_results(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_results(path: str, results: Dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="小说章节分割性能基准")
+    parser.add_argument('--repeat', type=int, default=3, help="每个阶段的重复次数，取最短耗时")
+    parser.add_argument('--case', action='append', help="只运行指定名称的用例，可重复指定")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="基线文件路径")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为新的基线")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="允许超出基线的比例，默认 0.2")
+    args = parser.parse_args(argv)
+
+    cases = DEFAULT_CASES
+    if args.case:
+        cases = [case for case in DEFAULT_CASES if case['name'] in args.case]
+        if not cases:
+            print(f"没有找到用例：{', '.join(args.case)}")
+            return 2
+
+    results = run_benchmarks(cases, max(1, args.repeat))
+    save_results(RESULTS_PATH, results)
+    if args.save_baseline:
+        save_results(args.baseline, results)
+        print_results(results)
+        print(f"\n已保存基线：{args.baseline}")
+        return 0
+
+    baseline = load_results(args.baseline)
+    print_results(results, baseline)
+    if baseline is None:
+        print("\n没有基线，可使用 --save-baseline 保存本次结果作为基线")
+        return 0
+    regressions = compare_results(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n检测到 {len(regressions)} 项性能退化：")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("\n与基线相比没有性能退化")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
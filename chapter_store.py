@@ -0,0 +1,298 @@
+import os
+import re
+import sys
+import json
+import mmap
+import hashlib
+from typing import List, Tuple, Dict, Optional
+
+# 章节存储格式：files 为每章一个 txt 文件，packed 为每本小说一个数据文件加索引
+STORE_FILES = 'files'
+STORE_PACKED = 'packed'
+
+# 打包格式的数据文件和索引文件名
+PACK_DATA_NAME = 'chapters.pack'
+PACK_INDEX_NAME = 'chapters.index.json'
+
+# 追加写入后失效数据超过该比例时压缩数据文件
+PACK_COMPACT_RATIO = 0.5
+
+def get_base_path() -> str:
+    """获取项目根目录"""
+    return os.path.dirname(os.path.abspath(__file__))
+
+def chapter_name(number: int, title: str, width: int = 5) -> str:
+    """生成章节名（不含扩展名），章节号至少补齐到 width 位"""
+    # 清理文件名中的非法字符
+    title = re.sub(r'[<>:"/\\|?*]', '_', title)
+    return f"{number:0{width}d}.{title}"
+
+def chapter_sort_key(name: str) -> Tuple[int, str]:
+    """章节名（或章节文件名）的排序键：按章节号排序，章节号超过五位时字符串顺序有误"""
+    number, _, title = name.partition('.')
+    return (int(number), title) if number.isdigit() else (-1, name)
+
+def content_hash(content: str) -> str:
+    """计算章节内容哈希"""
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+def is_packed(novel_dir: str) -> bool:
+    """判断小说目录是否使用打包格式"""
+    return os.path.exists(os.path.join(novel_dir, PACK_INDEX_NAME))
+
+def load_pack_index(novel_dir: str) -> List[List]:
+    """读取打包索引，每项为 [章节号, 标题, 偏移, 长度, 哈希]"""
+    with open(os.path.join(novel_dir, PACK_INDEX_NAME), 'r', encoding='utf-8') as f:
+        return json.load(f)['chapters']
+
+def save_pack_index(novel_dir: str, entries: List[List]):
+    """原子替换打包索引"""
+    index_path = os.path.join(novel_dir, PACK_INDEX_NAME)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'chapters': entries}, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, index_path)
+
+def remove_packed(novel_dir: str):
+    """删除打包格式的数据文件和索引"""
+    for name in (PACK_INDEX_NAME, PACK_DATA_NAME):
+        path = os.path.join(novel_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+def remove_chapter_files(novel_dir: str):
+    """删除每章一个文件格式的章节文件"""
+    if os.path.isdir(novel_dir):
+        for file in os.listdir(novel_dir):
+            if file.endswith('.txt'):
+                os.remove(os.path.join(novel_dir, file))
+
+class ChapterFileWriter:
+    """每章一个 txt 文件的写入器，内容未变化的章节不重写"""
+
+    def __init__(self, novel_dir: str):
+        self.novel_dir = novel_dir
+        os.makedirs(novel_dir, exist_ok=True)
+
+    def write(self, chapter: Dict, old_hash: Optional[str] = None) -> Tuple[str, str, str]:
+        """写入章节，返回(文件名, 内容哈希, 状态)，状态为 new/changed/unchanged"""
+        filename = chapter_name(chapter['number'], chapter['title']) + '.txt'
+        filepath = os.path.join(self.novel_dir, filename)
+        new_hash = content_hash(chapter['content'])
+        exists = os.path.exists(filepath)
+        if exists and old_hash is None:
+            # 没有导入记录时与磁盘上的文件比较
+            with open(filepath, 'r', encoding='utf-8') as f:
+                old_hash = content_hash(f.read())
+        if exists and old_hash == new_hash:
+            return filename, new_hash, 'unchanged'
+
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(chapter['content'])
+        return filename, new_hash, 'changed' if exists else 'new'
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+class PackedChapterWriter:
+    """打包格式写入器
+
+    章节内容依次写入数据文件，索引在 close() 时原子替换。append=True 时保留原有数据，
+    新增或变化的章节追加到数据文件末尾，只更新索引中对应的条目；中途失败时原索引仍然有效。
+    """
+
+    def __init__(self, novel_dir: str, append: bool = False):
+        self.novel_dir = novel_dir
+        os.makedirs(novel_dir, exist_ok=True)
+        self.data_path = os.path.join(novel_dir, PACK_DATA_NAME)
+        self.old_entries = {}
+        if is_packed(novel_dir):
+            for entry in load_pack_index(novel_dir):
+                self.old_entries[chapter_name(entry[0], entry[1]) + '.txt'] = entry
+
+        self.append = append and bool(self.old_entries) and os.path.exists(self.data_path)
+        if self.append:
+            self.entries = dict(self.old_entries)
+            self._file = open(self.data_path, 'ab')
+            self._target = self.data_path
+        else:
+            self.entries = {}
+            self._target = self.data_path + '.tmp'
+            self._file = open(self._target, 'wb')
+        self._offset = self._file.tell()
+
+    def write(self, chapter: Dict, old_hash: Optional[str] = None) -> Tuple[str, str, str]:
+        """写入章节，返回(文件名, 内容哈希, 状态)，状态为 new/changed/unchanged"""
+        filename = chapter_name(chapter['number'], chapter['title']) + '.txt'
+        data = chapter['content'].encode('utf-8')
+        new_hash = hashlib.sha1(data).hexdigest()
+        old_entry = self.old_entries.get(filename)
+        if old_entry is not None and old_hash is None:
+            old_hash = old_entry[4]
+
+        if self.append and old_entry is not None and old_hash == new_hash:
+            return filename, new_hash, 'unchanged'
+
+        self._file.write(data)
+        self.entries[filename] = [chapter['number'], chapter['title'], self._offset, len(data), new_hash]
+        self._offset += len(data)
+        if old_entry is None:
+            return filename, new_hash, 'new'
+        return filename, new_hash, 'unchanged' if old_hash == new_hash else 'changed'
+
+    def close(self):
+        """写入索引，追加写入后失效数据过多时压缩数据文件"""
+        self._file.close()
+        if not self.append:
+            os.replace(self._target, self.data_path)
+        save_pack_index(self.novel_dir, list(self.entries.values()))
+
+        live = sum(entry[3] for entry in self.entries.values())
+        size = os.path.getsize(self.data_path)
+        if self.append and size and (size - live) / size > PACK_COMPACT_RATIO:
+            compact_pack(self.novel_dir)
+
+    def abort(self):
+        """放弃本次写入，原有的数据文件和索引保持不变"""
+        self._file.close()
+        if not self.append and os.path.exists(self._target):
+            os.remove(self._target)
+
+def compact_pack(novel_dir: str):
+    """只保留索引引用的数据，重写数据文件"""
+    entries = load_pack_index(novel_dir)
+    data_path = os.path.join(novel_dir, PACK_DATA_NAME)
+    tmp_path = data_path + '.tmp'
+    offset = 0
+    with open(data_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        for entry in entries:
+            src.seek(entry[2])
+            dst.write(src.read(entry[3]))
+            entry[2] = offset
+            offset += entry[3]
+    os.replace(tmp_path, data_path)
+    save_pack_index(novel_dir, entries)
+
+def open_chapter_writer(novel_dir: str, store_format: str = STORE_FILES, append: bool = False):
+    """按存储格式创建章节写入器"""
+    if store_format == STORE_PACKED:
+        return PackedChapterWriter(novel_dir, append)
+    return ChapterFileWriter(novel_dir)
+
+class ChapterFileReader:
+    """读取每章一个 txt 文件格式的章节"""
+
+    def __init__(self, novel_dir: str):
+        self.novel_dir = novel_dir
+
+    def names(self) -> List[str]:
+        """返回章节名列表（不含扩展名）"""
+        return [f[:-4] for f in os.listdir(self.novel_dir) if f.endswith('.txt')]
+
+    def read(self, name: str) -> str:
+        with open(self.path(name), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def hash(self, name: str) -> str:
+        """章节内容哈希"""
+        return content_hash(self.read(name))
+
+    def path(self, name: str) -> Optional[str]:
+        """章节对应的文件路径"""
+        return os.path.join(self.novel_dir, f"{name}.txt")
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class PackedChapterReader:
+    """通过 mmap 读取打包格式的章节，按索引顺序返回章节"""
+
+    def __init__(self, novel_dir: str):
+        self.novel_dir = novel_dir
+        self._entries = {}
+        for entry in load_pack_index(novel_dir):
+            self._entries[chapter_name(entry[0], entry[1])] = entry
+        self._file = open(os.path.join(novel_dir, PACK_DATA_NAME), 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def names(self) -> List[str]:
+        """返回章节名列表（不含扩展名）"""
+        return list(self._entries)
+
+    def read(self, name: str) -> str:
+        _, _, offset, length, _ = self._entries[name]
+        if not length:
+            return ''
+        return self._mm[offset:offset + length].decode('utf-8')
+
+    def hash(self, name: str) -> str:
+        """章节内容哈希（索引中记录，无需读取内容）"""
+        return self._entries[name][4]
+
+    def path(self, name: str) -> Optional[str]:
+        """打包格式没有单独的章节文件"""
+        return None
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_chapter_reader(novel_dir: str):
+    """按小说目录中实际使用的格式创建章节读取器"""
+    if is_packed(novel_dir):
+        return PackedChapterReader(novel_dir)
+    return ChapterFileReader(novel_dir)
+
+def count_chapters(novel_dir: str) -> int:
+    """统计小说的章节数"""
+    if is_packed(novel_dir):
+        return len(load_pack_index(novel_dir))
+    return len([f for f in os.listdir(novel_dir) if f.endswith('.txt')])
+
+def export_chapter_files(novel_dir: str, output_dir: Optional[str] = None) -> int:
+    """把打包格式导出为每章一个 txt 文件的目录结构，返回导出的章节数
+
+    章节号超过五位时自动加宽补零位数，保证按文件名排序仍是章节顺序。
+    """
+    output_dir = output_dir or novel_dir
+    os.makedirs(output_dir, exist_ok=True)
+    entries = load_pack_index(novel_dir)
+    width = max([5] + [len(str(entry[0])) for entry in entries])
+    with PackedChapterReader(novel_dir) as reader:
+        for number, title, _, _, _ in entries:
+            content = reader.read(chapter_name(number, title))
+            filepath = os.path.join(output_dir, chapter_name(number, title, width) + '.txt')
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(content)
+    return len(entries)
+
+if __name__ == "__main__":
+    # 用法：python chapter_store.py 小说名 [输出目录]
+    if len(sys.argv) > 1:
+        novel_dir = os.path.join(get_base_path(), "data", "out_text", sys.argv[1])
+        if not is_packed(novel_dir):
+            print(f"小说 {sys.argv[1]} 不是打包格式")
+        else:
+            output_dir = sys.argv[2] if len(sys.argv) > 2 else None
+            count = export_chapter_files(novel_dir, output_dir)
+            print(f"已导出 {count} 个章节文件")
+    else:
+        print("请提供要导出的小说名")
@@ -2,6 +2,9 @@ import os
 import sys
 import subprocess
 import shutil
+from chapter_store import chapter_sort_key
+from novel_process import get_subtitle_options
+from subtitles import merge_subtitles, move_subtitles
 
 def get_base_path():
     """获取项目基础路径"""
@@ -13,8 +16,10 @@ def get_ffmpeg_path():
     return os.path.join(base_path, "ffmpeg", "ffmpeg.exe")
 
 def merge_audio_files(chapters_per_file):
-    """合并音频文件"""
+    """合并音频文件，章节带有字幕时按各章节时长偏移后合并为对应的字幕文件"""
     try:
+        subtitles = get_subtitle_options()
+        formats = subtitles['formats'] if subtitles['enabled'] else None
         base_path = get_base_path()
         mp3_dir = os.path.join(base_path, "data", "out_mp3")
         merge_dir = os.path.join(base_path, "data", "out_mp3_merge")
@@ -46,13 +51,15 @@ def merge_audio_files(chapters_per_file):
                 continue
             
             # 按章节号排序
-            audio_files.sort()
+            audio_files.sort(key=chapter_sort_key)
             
             # 情况一：如果只有一个音频文件，直接复制
             if len(audio_files) == 1:
                 src_file = os.path.join(novel_path, audio_files[0])
                 dst_file = os.path.join(novel_merge_dir, audio_files[0])
                 shutil.copy2(src_file, dst_file)
+                if formats:
+                    move_subtitles(src_file, dst_file, copy=True)
                 print(f"已复制单个音频文件: {audio_files[0]}")
                 continue
             
@@ -84,6 +91,8 @@ def merge_audio_files(chapters_per_file):
                 ], capture_output=True)
                 
                 shutil.move(temp_output, final_output)
+                if formats:
+                    merge_subtitles([os.path.join(novel_path, file) for file in audio_files], final_output, formats)
                 print(f"合成完成：{start_chapter}-{end_chapter}")
                 continue
             
@@ -144,6 +153,9 @@ def merge_audio_files(chapters_per_file):
                     final_output
                 ], capture_output=True)
                 
+                if formats:
+                    merge_subtitles([os.path.join(novel_path, file) for file in [intro_file] + first_batch],
+                                    final_output, formats)
                 print(f"合成完成：{intro_file.split('.')[0]}-{end_chapter}")
                 
                 # 第三步：处理剩余的文件（00051-00100等）
@@ -180,6 +192,9 @@ def merge_audio_files(chapters_per_file):
                         ], capture_output=True)
                         
                         shutil.move(temp_output, final_output)
+                        if formats:
+                            merge_subtitles([os.path.join(novel_path, file) for file in batch_files],
+                                            final_output, formats)
                         print(f"合成完成：{start_chapter}-{end_chapter}")
             else:
                 # 如果没有00000文件，按照现有规则合并
@@ -214,6 +229,9 @@ def merge_audio_files(chapters_per_file):
                     ], capture_output=True)
                     
                     shutil.move(temp_output, final_output)
+                    if formats:
+                        merge_subtitles([os.path.join(novel_path, file) for file in batch_files],
+                                        final_output, formats)
                     print(f"合成完成：{start_chapter}-{end_chapter}")
             
             # 清理临时目录
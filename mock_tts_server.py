@@ -0,0 +1,214 @@
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import unescape
+
+from aiohttp import web, WSMsgType
+
+from tts_limiter import percentile
+
+# Edge TTS 输出格式 audio-24khz-48kbitrate-mono-mp3 的一帧：MPEG 2 Layer III，单声道，无填充
+SILENT_FRAME = b'\xff\xf3\x64\xc4' + bytes(140)
+FRAME_SECONDS = 576 / 24000
+# 每条音频消息包含的帧数
+FRAMES_PER_MESSAGE = 32
+# 语速为 +0% 时每秒朗读的字数
+SPEECH_CHARS_PER_SEC = 5.0
+TICKS_PER_SECOND = 10_000_000
+SERVICE_PATH = "/consumer/speech/synthesize/readaloud/edge/v1"
+# 逐词时间中的“词”：连续的字母数字，或最多两个汉字
+WORD_PATTERN = re.compile(r'[A-Za-z0-9]+|\w{1,2}')
+SSML_PATTERN = re.compile(r"<prosody[^>]*?rate='([^']*)'[^>]*>(.*)</prosody>", re.S)
+
+def parse_text_message(data: str) -> Tuple[Dict[str, str], str]:
+    """解析文本消息，返回 (消息头, 正文)"""
+    head, _, body = data.partition('\r\n\r\n')
+    headers = {}
+    for line in head.split('\r\n'):
+        key, _, value = line.partition(':')
+        headers[key] = value
+    return headers, body
+
+def text_message(request_id: str, path: str, body: Dict) -> str:
+    return (f"X-RequestId:{request_id}\r\nContent-Type:application/json; charset=utf-8\r\n"
+            f"Path:{path}\r\n\r\n{json.dumps(body, ensure_ascii=False)}")
+
+def audio_message(request_id: str, data: bytes) -> bytes:
+    """音频消息：两字节的消息头长度、消息头和 MP3 数据"""
+    header = f"X-RequestId:{request_id}\r\nContent-Type:audio/mpeg\r\nPath:audio\r\n".encode()
+    return len(header).to_bytes(2, 'big') + header + data
+
+def parse_ssml(ssml: str) -> Tuple[str, float]:
+    """取出 SSML 中的文本和语速倍数"""
+    match = SSML_PATTERN.search(ssml)
+    if match is None:
+        return '', 1.0
+    try:
+        speed = 1 + int(match.group(1).rstrip('%')) / 100
+    except ValueError:
+        speed = 1.0
+    return unescape(match.group(2)), max(0.1, speed)
+
+def word_boundaries(text: str, speed: float = 1.0) -> Tuple[List[Dict], float]:
+    """按固定语速估计逐词时间，返回 (WordBoundary 元数据列表, 音频总秒数)"""
+    char_seconds = 1 / (SPEECH_CHARS_PER_SEC * speed)
+    boundaries = []
+    for match in WORD_PATTERN.finditer(text):
+        word = match.group()
+        boundaries.append({
+            'Type': 'WordBoundary',
+            'Data': {
+                'Offset': int(match.start() * char_seconds * TICKS_PER_SECOND),
+                'Duration': int(len(word) * char_seconds * TICKS_PER_SECOND),
+                'text': {'Text': word, 'Length': len(word), 'BoundaryType': 'WordBoundary'}
+            }
+        })
+    return boundaries, len(text) * char_seconds
+
+class MockTTSServer:
+    """本地模拟的 Edge TTS 服务，用于不联网的压测和基准测试
+
+    实现 edge_tts.Communicate 用到的 websocket 协议：收到 SSML 后按估计的语速返回逐词时间
+    和有效的静音 MP3 帧。latency 为收到请求到开始返回音频的秒数，realtime 为每秒返回的音频秒数
+    （0 为不限速），error_rate 为以 500 拒绝请求的比例，drop_rate 为开始响应后直接断开连接的比例，
+    max_connections 为同时处理的请求上限（超出时返回 429，0 为不限）。
+    """
+
+    def __init__(self, latency: float = 0.05, realtime: float = 100.0, error_rate: float = 0.0,
+                 drop_rate: float = 0.0, max_connections: int = 0, seed: Optional[int] = None):
+        self.latency = latency
+        self.realtime = realtime
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.max_connections = max_connections
+        self.random = random.Random(seed)
+        self.url = None
+        self.active = 0
+        self.counts = {'requests': 0, 'completed': 0, 'errors': 0, 'drops': 0, 'throttled': 0,
+                       'peak_connections': 0}
+        self.latencies = []
+        self._runner = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """启动服务，返回可用作 edge_tts WSS_URL 的地址"""
+        app = web.Application()
+        app.router.add_get(SERVICE_PATH, self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        port = self._runner.addresses[0][1]
+        self.url = f"ws://{host}:{port}{SERVICE_PATH}?TrustedClientToken={uuid.uuid4().hex.upper()}"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle(self, request: web.Request):
+        self.counts['requests'] += 1
+        if self.max_connections and self.active >= self.max_connections:
+            self.counts['throttled'] += 1
+            return web.Response(status=429, text="Too Many Requests")
+        if self.random.random() < self.error_rate:
+            self.counts['errors'] += 1
+            return web.Response(status=500, text="Internal Server Error")
+
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        self.active += 1
+        self.counts['peak_connections'] = max(self.counts['peak_connections'], self.active)
+        start = time.monotonic()
+        try:
+            if await self._respond(websocket):
+                self.counts['completed'] += 1
+                self.latencies.append(time.monotonic() - start)
+        except ConnectionError:
+            pass
+        finally:
+            self.active -= 1
+            await websocket.close()
+        return websocket
+
+    async def _respond(self, websocket: web.WebSocketResponse) -> bool:
+        """等待 SSML 请求并返回音频，完整返回时为 True"""
+        headers, ssml = {}, None
+        async for message in websocket:
+            if message.type != WSMsgType.TEXT:
+                continue
+            headers, body = parse_text_message(message.data)
+            if headers.get('Path') == 'ssml':
+                ssml = body
+                break
+        if ssml is None:
+            return False
+
+        request_id = headers.get('X-RequestId') or uuid.uuid4().hex
+        await websocket.send_str(text_message(request_id, 'turn.start', {'context': {'serviceTag': 'mock'}}))
+        if self.random.random() < self.drop_rate:
+            self.counts['drops'] += 1
+            return False
+        await asyncio.sleep(self.latency)
+
+        text, speed = parse_ssml(ssml)
+        boundaries, seconds = word_boundaries(text, speed)
+        frames = max(1, int(seconds / FRAME_SECONDS + 0.5))
+        stream_start = time.monotonic()
+        index = 0
+        for first in range(0, frames, FRAMES_PER_MESSAGE):
+            count = min(FRAMES_PER_MESSAGE, frames - first)
+            # 先发送落在这段音频内的逐词时间
+            chunk_end = (first + count) * FRAME_SECONDS * TICKS_PER_SECOND
+            while index < len(boundaries) and boundaries[index]['Data']['Offset'] < chunk_end:
+                await websocket.send_str(text_message(request_id, 'audio.metadata',
+                                                      {'Metadata': [boundaries[index]]}))
+                index += 1
+            if self.realtime > 0:
+                delay = stream_start + first * FRAME_SECONDS / self.realtime - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await websocket.send_bytes(audio_message(request_id, SILENT_FRAME * count))
+        await websocket.send_str(text_message(request_id, 'turn.end', {}))
+        return True
+
+    def stats(self) -> Dict:
+        """请求计数、最大同时连接数和完成请求的延迟（秒）"""
+        stats = dict(self.counts)
+        for name, fraction in (('p50', 0.5), ('p95', 0.95)):
+            value = percentile(self.latencies, fraction)
+            stats[f'latency_{name}'] = None if value is None else round(value, 3)
+        return stats
+
+async def serve(server: MockTTSServer, host: str, port: int):
+    url = await server.start(host, port)
+    print(f"模拟 Edge TTS 服务已启动：{url}")
+    print(f"设置环境变量 EDGE_TTS_WSS_URL=\"{url}\" 后运行 tts_process.py 即可使用该服务")
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await server.stop()
+        print(json.dumps(server.stats(), ensure_ascii=False))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟的 Edge TTS 服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05, help="开始返回音频前的延迟（秒）")
+    parser.add_argument('--realtime', type=float, default=100.0, help="每秒返回的音频秒数，0 为不限速")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="以 500 拒绝请求的比例")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="开始响应后断开连接的比例")
+    parser.add_argument('--max-connections', type=int, default=0, help="同时处理的请求上限，超出时返回 429")
+    parser.add_argument('--seed', type=int, help="随机数种子")
+    args = parser.parse_args()
+    mock = MockTTSServer(args.latency, args.realtime, args.error_rate, args.drop_rate,
+                         args.max_connections, args.seed)
+    try:
+        asyncio.run(serve(mock, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
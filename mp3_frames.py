@@ -0,0 +1,173 @@
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+# 比特率表（kbps），按 (MPEG 版本是否为 1, 层) 索引，下标为帧头中的比特率序号
+BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+# 采样率表，按帧头中的版本位索引：0 为 MPEG 2.5，2 为 MPEG 2，3 为 MPEG 1
+SAMPLE_RATES = {
+    0: [11025, 12000, 8000],
+    2: [22050, 24000, 16000],
+    3: [44100, 48000, 32000],
+}
+
+class Frame(NamedTuple):
+    """一个 MPEG 音频帧：在文件中的偏移、字节数、采样数和采样率"""
+    offset: int
+    length: int
+    samples: int
+    sample_rate: int
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.sample_rate
+
+def parse_header(data: bytes, offset: int) -> Optional[Frame]:
+    """解析 offset 处的帧头，不是有效帧头时返回 None"""
+    if offset + 4 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+    version = (data[offset + 1] >> 3) & 0x03
+    layer = 4 - ((data[offset + 1] >> 1) & 0x03)
+    bitrate_index = data[offset + 2] >> 4
+    rate_index = (data[offset + 2] >> 2) & 0x03
+    padding = (data[offset + 2] >> 1) & 0x01
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if mpeg1 or layer == 2 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return Frame(offset, length, samples, sample_rate)
+
+def skip_id3v2(data: bytes) -> int:
+    """跳过文件开头的 ID3v2 标签，返回音频数据的起始偏移"""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+def is_info_frame(data: bytes, frame: Frame) -> bool:
+    """判断是否为 Xing/Info 信息帧（只记录元数据，不含音频）"""
+    head = data[frame.offset:frame.offset + min(frame.length, 64)]
+    return b'Xing' in head or b'Info' in head
+
+def audio_range(data: bytes):
+    """去掉 ID3v2 和 ID3v1 标签后的音频数据范围 (start, end)"""
+    start = skip_id3v2(data)
+    end = len(data)
+    if end >= 128 and data[-128:-125] == b'TAG':
+        end -= 128
+    return start, end
+
+def embedded_tag_length(data: bytes, offset: int) -> int:
+    """offset 处 ID3v2 标签的长度，不是标签时返回 0（逐段编码后拼接的文件中间会有标签）"""
+    if data[offset:offset + 3] != b'ID3':
+        return 0
+    return skip_id3v2(data[offset:offset + 10])
+
+def iter_frames(data: bytes) -> Iterator[Frame]:
+    """依次返回数据中的音频帧，遇到无法解析的字节时向后查找下一个帧头"""
+    offset, end = audio_range(data)
+    first = True
+    while offset + 4 <= end:
+        frame = parse_header(data, offset)
+        if frame is None and embedded_tag_length(data, offset):
+            offset += embedded_tag_length(data, offset)
+            continue
+        if frame is None or offset + frame.length > end:
+            offset += 1
+            continue
+        if not (first and is_info_frame(data, frame)):
+            yield frame
+        first = False
+        offset += frame.length
+
+def split_frames(data: bytes, times: List[float]) -> List[bytes]:
+    """在帧边界处把音频切分为 len(times) + 1 段
+
+    times 为递增的切分时间（秒），每段从开始时间不早于切分时间的第一帧开始；
+    标签、信息帧和无法解析的数据不包含在结果中，某段没有帧时为空字节串。
+    """
+    pieces = [[]]
+    elapsed = 0.0
+    for frame in iter_frames(data):
+        while len(pieces) <= len(times) and elapsed >= times[len(pieces) - 1]:
+            pieces.append([])
+        pieces[-1].append(data[frame.offset:frame.offset + frame.length])
+        elapsed += frame.duration
+    pieces.extend([] for _ in range(len(times) + 1 - len(pieces)))
+    return [b''.join(piece) for piece in pieces]
+
+def mp3_duration(path: str) -> float:
+    """按帧计算 MP3 文件的时长（秒）"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return scan_mp3(data)['duration']
+
+def _scan_constant(data: bytes, first: Frame, end: int) -> Optional[Dict]:
+    """按固定帧长检查全部帧头（Edge TTS 输出的 CBR 且无填充的文件）
+
+    用步长切片一次取出所有帧头的前三个字节并与第一帧比较，不逐帧循环；
+    有任何一帧不同（如 VBR、含填充位或数据损坏）时返回 None，改为逐帧扫描。
+    """
+    length = first.length
+    if data[first.offset + 2] & 0x02:
+        return None
+    count = (end - first.offset) // length
+    for i in range(3):
+        column = data[first.offset + i:first.offset + count * length:length]
+        if column.count(data[first.offset + i]) != count:
+            return None
+    frames = count - (1 if is_info_frame(data, first) else 0)
+    return {
+        'frames': frames,
+        'duration': frames * first.samples / first.sample_rate,
+        'junk': 0,
+        'truncated': end - first.offset - count * length
+    }
+
+def scan_mp3(data: bytes) -> Dict:
+    """不解码地检查 MP3 数据的帧结构
+
+    返回帧数 frames、时长 duration（秒）、帧之间无法解析的字节数 junk（包括开头的非帧数据，
+    不包括中间的 ID3v2 标签）和结尾不完整帧的字节数 truncated。固定帧长的文件只比较帧头，其余文件逐帧扫描。
+    """
+    start, end = audio_range(data)
+    first = parse_header(data, start)
+    if first is not None:
+        result = _scan_constant(data, first, end)
+        if result is not None:
+            return result
+
+    frames = 0
+    duration = 0.0
+    expected = start
+    junk = 0
+    for frame in iter_frames(data):
+        gap = frame.offset - expected
+        if gap:
+            gap -= min(gap, embedded_tag_length(data, expected))
+        junk += gap
+        expected = frame.offset + frame.length
+        frames += 1
+        duration += frame.duration
+    if frames == 0:
+        return {'frames': 0, 'duration': 0.0, 'junk': end - start, 'truncated': 0}
+    # 信息帧不计入帧数，但占用的字节不算作无法解析的数据
+    if first is not None and is_info_frame(data, first):
+        junk -= first.length
+    return {'frames': frames, 'duration': duration, 'junk': max(0, junk), 'truncated': end - expected}
@@ -1,8 +1,58 @@
 import os
 import re
 import json
+import time
+import codecs
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import repeat
+from functools import lru_cache
 from typing import List, Tuple, Dict, Optional
 
+from chapter_store import (
+    STORE_FILES, STORE_PACKED, ChapterFileWriter, chapter_name, is_packed,
+    open_chapter_writer, remove_packed, remove_chapter_files
+)
+from speech_text import DEFAULT_SEGMENT_CHARS, SpeechNormalizer, update_segment_plans
+from subtitles import DEFAULT_CUE_CHARS, SUBTITLE_FORMATS
+
+try:
+    import chardet
+except ImportError:  # chardet 不可用时退回到逐个尝试候选编码
+    chardet = None
+
+# 单个文件（待分割部分）超过该大小时，才按字节范围分块并行扫描
+PARALLEL_SPLIT_MIN_SIZE = 64 * 1024 * 1024
+# 编码检测时读取的文件头部字节数
+ENCODING_SAMPLE_SIZE = 64 * 1024
+# 分割时允许的解码错误数（替换字符数），超过时认为按头部样本检测的编码有误
+DECODE_ERROR_LIMIT = 16
+# 重新检测编码时从第一处解码错误所在行开始读取的字节数
+ENCODING_RETRY_SAMPLE_SIZE = 1024 * 1024
+# 候选编码（GB18030 兼容 GBK/GB2312）
+ENCODING_CANDIDATES = ['utf-8', 'gb18030', 'big5', 'utf-16']
+# 按字节逐行切分后可直接逐行解码的编码（换行符不会出现在多字节字符中）
+ASCII_COMPATIBLE_ENCODINGS = {
+    'ascii', 'utf-8', 'utf-8-sig', 'gb18030', 'gbk', 'gb2312', 'big5', 'big5hkscs'
+}
+# 文件指纹的块大小，续读位置之前内容的指纹由各块的哈希组成
+FINGERPRINT_BLOCK_SIZE = 1024 * 1024
+# chardet 检测结果到实际解码所用编码的映射
+CHARDET_ENCODING_MAP = {
+    'ascii': 'utf-8',
+    'utf-8': 'utf-8',
+    'utf-8-sig': 'utf-8-sig',
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+    'gb18030': 'gb18030',
+    'big5': 'big5',
+    'big5hkscs': 'big5hkscs',
+    'cp950': 'big5',
+    'utf-16': 'utf-16',
+    'utf-16le': 'utf-16',
+    'utf-16be': 'utf-16',
+}
+
 def get_base_path() -> str:
     """获取项目根目录"""
     return os.path.dirname(os.path.abspath(__file__))
@@ -61,9 +111,52 @@ def traditional_to_arabic(traditional_str: str) -> int:
         
     return result
 
-def load_chapter_patterns() -> List[Tuple[str, str]]:
+def get_config_path() -> str:
+    """获取配置文件路径"""
+    return os.path.join(get_base_path(), "data", "config", "config.json")
+
+def load_config(config_path: Optional[str] = None) -> Dict:
+    """读取配置文件，读取失败时返回空配置"""
+    try:
+        with open(config_path or get_config_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def get_chapter_store_format() -> str:
+    """章节存储格式：files（每章一个文件，默认）或 packed（每本小说一个数据文件加索引）"""
+    store_format = load_config().get('chapter_store', STORE_FILES)
+    return store_format if store_format in (STORE_FILES, STORE_PACKED) else STORE_FILES
+
+def get_segment_max_chars() -> int:
+    """语音合成分段的最大字符数"""
+    try:
+        return max(1, int(load_config().get('segment_max_chars', DEFAULT_SEGMENT_CHARS)))
+    except (TypeError, ValueError):
+        return DEFAULT_SEGMENT_CHARS
+
+def get_speech_normalizer() -> SpeechNormalizer:
+    """按配置文件中的 speech_normalize 选项创建朗读文本规范化器"""
+    options = load_config().get('speech_normalize')
+    return SpeechNormalizer(options if isinstance(options, dict) else None)
+
+def speech_options_signature(max_chars: int, normalizer: SpeechNormalizer) -> str:
+    """分段字数和朗读文本规范化选项的签名，变化后需要重新生成朗读文本和分段计划"""
+    return hashlib.sha1(f"{max_chars}\n{normalizer.signature}".encode('utf-8')).hexdigest()
+
+def get_subtitle_options() -> Dict:
+    """按配置文件中的 subtitles 选项返回是否生成字幕、字幕格式和每条字幕的最大字数"""
+    options = load_config().get('subtitles', {})
+    formats = [fmt for fmt in options.get('formats', ['srt']) if fmt in SUBTITLE_FORMATS]
+    return {
+        'enabled': bool(options.get('enabled', True)),
+        'formats': formats or ['srt'],
+        'max_chars': max(1, int(options.get('max_chars', DEFAULT_CUE_CHARS)))
+    }
+
+def load_chapter_patterns(config_path: Optional[str] = None) -> List[Tuple[str, str]]:
     """从配置文件加载章节识别模式"""
-    config_path = os.path.join(get_base_path(), "data", "config", "config.json")
+    config_path = config_path or get_config_path()
     try:
         with open(config_path, 'r', encoding='utf-8') as f:
             config = json.load(f)
@@ -77,23 +170,129 @@ def load_chapter_patterns() -> List[Tuple[str, str]]:
             (r'^第([壹贰叁肆伍陆柒捌玖拾佰仟萬]+)章.*', '繁体数字')
         ]
 
+@lru_cache(maxsize=65536)
+def parse_chapter_number(num_str: str) -> int:
+    """将章节号字符串转换为阿拉伯数字（带缓存）"""
+    # 转换中文数字为阿拉伯数字
+    if any(c in num_str for c in '零一二三四五六七八九十百千万'):
+        return chinese_to_arabic(num_str)
+    # 转换繁体数字为阿拉伯数字
+    elif any(c in num_str for c in '壹贰叁肆伍陆柒捌玖拾佰仟萬'):
+        return traditional_to_arabic(num_str)
+    # 直接返回阿拉伯数字
+    else:
+        return int(num_str)
+
+def _literal_prefix(pattern: str) -> str:
+    """提取模式开头必须出现的固定字符，用于快速预筛选"""
+    # 含有分支的模式无法确定固定前缀
+    if '|' in pattern:
+        return ''
+    if pattern.startswith('^'):
+        pattern = pattern[1:]
+    prefix = []
+    for char in pattern:
+        if char in '.^$*+?{}[]\\|()':
+            # 量词作用于前一个字符时，该字符不是必需的
+            if char in '*?{' and prefix:
+                prefix.pop()
+            break
+        prefix.append(char)
+    return ''.join(prefix)
+
+class ChapterMatcher:
+    """章节标题识别器
+
+    一次性编译配置中的所有章节模式，并用固定前缀预筛选，
+    普通正文行不会进入正则匹配。配置文件修改时间变化后自动重新加载。
+    """
+
+    def __init__(self, config_path: Optional[str] = None, check_interval: float = 1.0):
+        self.config_path = config_path or get_config_path()
+        self.check_interval = check_interval
+        self._config_mtime = None
+        self._last_check = 0.0
+        self._patterns = []
+        self._prefixes = None
+        self.reload()
+        self.reset_stats()
+
+    def _get_config_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.config_path)
+        except OSError:
+            return None
+
+    def reload(self):
+        """重新加载并编译章节识别模式"""
+        self._config_mtime = self._get_config_mtime()
+        self._last_check = time.monotonic()
+        patterns = load_chapter_patterns(self.config_path)
+        # 模式签名，模式变化后需要完整重新分割
+        self.signature = hashlib.sha1(
+            json.dumps([p for p, _ in patterns], ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+        self._patterns = [(re.compile(pattern), _literal_prefix(pattern))
+                          for pattern, _ in patterns]
+        prefixes = tuple(prefix for _, prefix in self._patterns)
+        # 只要有一个模式没有固定前缀，就不能整体预筛选
+        self._prefixes = prefixes if prefixes and all(prefixes) else None
+
+    def refresh(self, force: bool = False) -> bool:
+        """配置文件修改时间变化时重新加载，返回是否发生了重新加载"""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        if self._get_config_mtime() != self._config_mtime:
+            self.reload()
+            return True
+        return False
+
+    def match(self, line: str) -> Optional[int]:
+        """识别章节标题，返回章节号，不是章节标题时返回None"""
+        self.lines += 1
+        if self._prefixes is not None and not line.startswith(self._prefixes):
+            return None
+        for regex, prefix in self._patterns:
+            if prefix and not line.startswith(prefix):
+                continue
+            match = regex.match(line)
+            if match:
+                self.matched += 1
+                return parse_chapter_number(match.group(1))
+        return None
+
+    def reset_stats(self):
+        """重置统计信息"""
+        self.lines = 0
+        self.matched = 0
+        self._stats_start = time.perf_counter()
+
+    def stats(self) -> Dict[str, float]:
+        """返回识别统计信息（行数、章节标题数、每秒处理行数）"""
+        elapsed = time.perf_counter() - self._stats_start
+        return {
+            'lines': self.lines,
+            'matched': self.matched,
+            'elapsed': elapsed,
+            'lines_per_sec': self.lines / elapsed if elapsed > 0 else 0.0
+        }
+
+_chapter_matcher = None
+
+def get_chapter_matcher() -> ChapterMatcher:
+    """获取共享的章节识别器，配置文件变化时自动重新加载"""
+    global _chapter_matcher
+    if _chapter_matcher is None:
+        _chapter_matcher = ChapterMatcher()
+    else:
+        _chapter_matcher.refresh()
+    return _chapter_matcher
+
 def extract_chapter_number(title: str) -> Optional[int]:
     """从章节标题中提取章节号"""
-    patterns = load_chapter_patterns()
-    for pattern, _ in patterns:
-        match = re.match(pattern, title)
-        if match:
-            num_str = match.group(1)
-            # 转换中文数字为阿拉伯数字
-            if any(c in num_str for c in '零一二三四五六七八九十百千万'):
-                return chinese_to_arabic(num_str)
-            # 转换繁体数字为阿拉伯数字
-            elif any(c in num_str for c in '壹贰叁肆伍陆柒捌玖拾佰仟萬'):
-                return traditional_to_arabic(num_str)
-            # 直接返回阿拉伯数字
-            else:
-                return int(num_str)
-    return None
+    return get_chapter_matcher().match(title)
 
 def get_novel_files():
     """获取导入目录下的所有txt文件"""
@@ -107,38 +306,222 @@ def get_novel_files():
             })
     return novel_files
 
+def get_novel_output_dir(novel_name: str) -> str:
+    """获取小说章节输出目录"""
+    return os.path.join(get_base_path(), "data", "out_text", novel_name.replace('.txt', ''))
+
+def load_novel_meta(novel_name: str) -> Dict:
+    """读取小说的导入记录（编码等信息）"""
+    meta_path = os.path.join(get_novel_output_dir(novel_name), ".novel.json")
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_novel_meta(novel_name: str, meta: Dict):
+    """保存小说的导入记录"""
+    output_dir = get_novel_output_dir(novel_name)
+    os.makedirs(output_dir, exist_ok=True)
+    meta_path = os.path.join(output_dir, ".novel.json")
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, meta_path)
+
+def read_encoding_sample(file_path: str) -> Tuple[bytes, bool]:
+    """读取文件头部用于编码检测，返回(样本, 是否已读到文件末尾)"""
+    with open(file_path, 'rb') as f:
+        sample = f.read(ENCODING_SAMPLE_SIZE + 1)
+    if len(sample) > ENCODING_SAMPLE_SIZE:
+        return sample[:ENCODING_SAMPLE_SIZE], False
+    return sample, True
+
+def sample_decodes(sample: bytes, encoding: str, complete: bool) -> bool:
+    """检查样本能否用指定编码解码（样本末尾被截断的多字节字符不算错误）"""
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        decoder.decode(sample, final=complete)
+        return True
+    except (UnicodeDecodeError, LookupError):
+        return False
+
+def detect_encoding_info(file_path: str) -> Optional[Dict]:
+    """根据文件头部样本检测编码，返回编码、置信度和检测方式"""
+    sample, complete = read_encoding_sample(file_path)
+    return detect_sample_encoding(sample, complete)
+
+def detect_sample_encoding(sample: bytes, complete: bool) -> Optional[Dict]:
+    """检测字节样本的编码，complete 为样本是否已到文件末尾"""
+    # 1. 字节顺序标记
+    if sample.startswith(codecs.BOM_UTF8):
+        return {'encoding': 'utf-8-sig', 'confidence': 1.0, 'method': 'bom'}
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return {'encoding': 'utf-16', 'confidence': 1.0, 'method': 'bom'}
+
+    # 2. 能按 UTF-8 解码的文本几乎不会是其他编码
+    if sample_decodes(sample, 'utf-8', complete):
+        return {'encoding': 'utf-8', 'confidence': 0.99, 'method': 'utf-8'}
+
+    # 3. 使用 chardet 检测
+    if chardet is not None:
+        result = chardet.detect(sample)
+        detected = (result.get('encoding') or '').lower()
+        encoding = CHARDET_ENCODING_MAP.get(detected)
+        if encoding and sample_decodes(sample, encoding, complete):
+            return {
+                'encoding': encoding,
+                'confidence': round(result.get('confidence') or 0.0, 4),
+                'method': 'chardet'
+            }
+
+    # 4. 逐个尝试候选编码
+    for encoding in ENCODING_CANDIDATES:
+        if sample_decodes(sample, encoding, complete):
+            return {'encoding': encoding, 'confidence': 0.0, 'method': 'fallback'}
+    return None
+
 def detect_encoding(file_path):
     """检测文件编码"""
-    encodings = ['utf-8', 'gbk', 'gb2312', 'utf-16']
-    for encoding in encodings:
-        try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                f.read()
-            return encoding
-        except UnicodeDecodeError:
+    info = detect_encoding_info(file_path)
+    return info['encoding'] if info else None
+
+def resolve_encoding(novel: Dict, meta: Dict) -> Optional[Dict]:
+    """确定小说编码：优先使用上次导入记录的编码，样本校验失败时重新检测"""
+    recorded = meta.get('encoding')
+    if recorded:
+        sample, complete = read_encoding_sample(novel['path'])
+        if sample_decodes(sample, recorded, complete):
+            return {
+                'encoding': recorded,
+                'confidence': meta.get('encoding_confidence', 0.0),
+                'method': meta.get('encoding_method', 'recorded'),
+                'recorded': True
+            }
+    return detect_encoding_info(novel['path'])
+
+class DecodeErrorLimitExceeded(ValueError):
+    """解码错误超过上限，按头部样本检测的编码可能有误"""
+
+    def __init__(self, count: int, first: Optional[int]):
+        super().__init__(f"有超过 {DECODE_ERROR_LIMIT} 处字节无法解码")
+        self.count = count
+        self.first = first
+
+class DecodeErrorCounter:
+    """统计按 errors='replace' 解码时产生的替换字符
+
+    每次解码各自创建计数器，多个线程或进程同时解码时互不影响。原文中本来就有的 U+FFFD
+    不算作错误。limit 不为 None 时，错误数超过 limit 立即抛出 DecodeErrorLimitExceeded。
+    """
+
+    def __init__(self, encoding: str, limit: Optional[int] = None):
+        codec = codecs.lookup(encoding).name
+        self.marker = None
+        if codec in ASCII_COMPATIBLE_ENCODINGS:
+            try:
+                self.marker = '\ufffd'.encode('utf-8' if codec == 'utf-8-sig' else codec)
+            except UnicodeEncodeError:  # Big5 等编码中没有 U+FFFD
+                pass
+        self.limit = limit
+        self.count = 0
+        self.first = None  # 第一处错误所在行（或数据块）的字节偏移
+
+    def add(self, text: str, raw: Optional[bytes] = None, offset: Optional[int] = None):
+        """统计一段解码结果，raw 为对应的原始字节，offset 为其字节偏移"""
+        if '\ufffd' not in text:
+            return
+        errors = text.count('\ufffd')
+        if raw is not None and self.marker:
+            errors -= raw.count(self.marker)
+        if errors <= 0:
+            return
+        if not self.count:
+            self.first = offset
+        self.count += errors
+        if self.limit is not None and self.count > self.limit:
+            raise DecodeErrorLimitExceeded(self.count, self.first)
+
+def scan_decode_errors(file_path: str, encoding: str, limit: Optional[int] = None) -> int:
+    """按指定编码解码整个文件，返回替换字符数
+
+    错误数超过 limit（默认为 DECODE_ERROR_LIMIT）时提前结束；编码本身无法解码该文件
+    （如 UTF-16 缺少字节顺序标记）时视为超过。
+    """
+    limit = DECODE_ERROR_LIMIT if limit is None else limit
+    decoder = codecs.getincrementaldecoder(encoding)('replace')
+    counter = DecodeErrorCounter(encoding, limit)
+    try:
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                counter.add(decoder.decode(block), block)
+            counter.add(decoder.decode(b'', final=True))
+    except DecodeErrorLimitExceeded as e:
+        return e.count
+    except UnicodeError:
+        return limit + 1
+    return counter.count
+
+def read_retry_sample(file_path: str, position: int) -> Tuple[bytes, bool]:
+    """从 position 所在行的开头读取重新检测编码用的样本，返回(样本, 是否已读到文件末尾)"""
+    with open(file_path, 'rb') as f:
+        start = max(0, position - 4096)
+        f.seek(start)
+        head = f.read(position - start)
+        start += head.rfind(b'\n') + 1
+        f.seek(start)
+        sample = f.read(ENCODING_RETRY_SAMPLE_SIZE + 1)
+    if len(sample) > ENCODING_RETRY_SAMPLE_SIZE:
+        return sample[:ENCODING_RETRY_SAMPLE_SIZE], False
+    return sample, True
+
+def redetect_encoding(file_path: str, encoding: str, position: Optional[int]) -> Dict:
+    """按头部样本检测的编码分割时解码错误过多，重新检测编码
+
+    头部样本只有 ASCII 等情况下可能检测错误：从第一处解码错误所在行（position）开始取更大的样本
+    重新检测，再逐个尝试候选编码，按整个文件校验；仍然无法正确解码时抛出 ValueError，
+    不写出损坏的章节。
+    """
+    sample, complete = read_retry_sample(file_path, position or 0)
+    detected = detect_sample_encoding(sample, complete)
+    candidates = [detected['encoding']] if detected else []
+    candidates += [name for name in ENCODING_CANDIDATES if name not in candidates]
+    for candidate in candidates:
+        if candidate == encoding or scan_decode_errors(file_path, candidate) > DECODE_ERROR_LIMIT:
             continue
-    return None
+        same = detected is not None and candidate == detected['encoding']
+        return {
+            'encoding': candidate,
+            'confidence': detected['confidence'] if same else 0.0,
+            'method': 'rescan'
+        }
+    raise ValueError(f"无法识别文件编码：按 {encoding} 解码有超过 {DECODE_ERROR_LIMIT} 处无法识别的字节，"
+                     f"其他候选编码同样无法正确解码")
+
+SEPARATOR_MARKS = frozenset('-=*~#@$%^&_+<>.,;:!?/\\|')
+
+def clean_line(line: str) -> Optional[str]:
+    """处理单行文本：空行返回None，分隔符行返回空字符串"""
+    line = line.strip()
+    if not line:
+        return None
+    # 检查是否是分隔符行
+    first_char = line[0]
+    if (first_char in SEPARATOR_MARKS and
+        len(line) >= 5 and
+        all(c == first_char for c in line)):
+        # 遇到分隔符行时返回空字符串，join时会转换为单个回车
+        return ''
+    return line
 
 def process_content(content):
     """处理文本内容"""
-    # 1. 去除空行
-    lines = [line.strip() for line in content.split('\n') if line.strip()]
-    
-    # 2. 清理分隔符行，替换为单个回车
+    # 去除空行，并将分隔符行替换为单个回车
     cleaned_lines = []
-    punctuation_marks = set('-=*~#@$%^&_+<>.,;:!?/\\|')
-    
-    for line in lines:
-        # 检查是否是分隔符行
-        first_char = line[0]
-        if (first_char in punctuation_marks and 
-            len(line) >= 5 and 
-            all(c == first_char for c in line)):
-            # 遇到分隔符行时添加一个空字符串，join时会转换为单个回车
-            cleaned_lines.append('')
-            continue
-        cleaned_lines.append(line)
-    
+    for line in content.split('\n'):
+        line = clean_line(line)
+        if line is not None:
+            cleaned_lines.append(line)
     return cleaned_lines
 
 def get_chapter_info(line):
@@ -149,136 +532,734 @@ def get_chapter_info(line):
     
     return None, None
 
-def split_chapters(content):
-    """分割章节内容"""
-    # 处理文本内容（去除空行和分隔符）
-    cleaned_lines = process_content(content)
-    
-    # 查找所有章节标题
-    chapters = []
-    current_content = []
-    current_title = None
-    current_number = None
-    intro_content = []
-    used_numbers = set()  # 用于记录已使用的章节号
-    duplicate_chapters = []  # 用于记录重复的章节信息
-    
-    for line in cleaned_lines:
+class ChapterSplitter:
+    """流式章节分割器
+
+    逐行输入原始文本，某一章节结束时立即返回该章节，
+    内存中只保留当前正在读取的章节内容。
+    """
+
+    def __init__(self, matcher: Optional[ChapterMatcher] = None):
+        self.matcher = matcher or get_chapter_matcher()
+        self.used_numbers = set()  # 用于记录已使用的章节号
+        self.duplicate_chapters = []  # 用于记录重复的章节信息
+        self.intro_content = []
+        self.current_title = None
+        self.current_number = None
+        self.current_content = []
+        self.chapter_count = 0  # 已输出的章节数
+        self.line_number = 0  # 当前处理到的原始行号
+        self.current_offset = None  # 当前章节标题行的字节偏移
+        self.current_start_line = 0  # 当前章节标题行之前的行数
+        self.resume_point = None  # 最后一章的续读位置，finish() 后可用
+
+    def resume(self, checkpoint: Dict):
+        """从上次导入记录的最后一章开头继续分割"""
+        self.used_numbers = set(checkpoint['used_numbers'])
+        self.chapter_count = checkpoint['chapter_count']
+        self.line_number = checkpoint['line_number']
+
+    def feed(self, raw_line: str, offset: Optional[int] = None) -> List[Dict]:
+        """输入一行原始文本（可附带该行的字节偏移），返回因此完成的章节列表"""
+        self.line_number += 1
+        line = clean_line(raw_line)
+        if line is None:
+            return []
+
         # 查找章节标题
-        number, title = get_chapter_info(line)
-        if number is not None:
-            # 检查章节号是否已使用
-            if number in used_numbers:
-                # 记录重复章节信息
-                duplicate_chapters.append({
-                    'number': number,
-                    'title': title,
-                    'line_number': len(cleaned_lines[:cleaned_lines.index(line)]) + 1
-                })
-                # 如果章节号已使用，将内容添加到当前章节
-                if current_title:
-                    current_content.append(line)
-                continue
-                
-            used_numbers.add(number)  # 记录已使用的章节号
-            
-            # 如果有内容简介，先保存为第一章
-            if intro_content and not chapters:
-                chapters.append({
-                    'number': 0,
-                    'title': '内容简介',
-                    'content': '\n'.join(intro_content)
-                })
-            
-            # 如果已有章节内容，保存前一章节
-            if current_title and current_content:
-                chapters.append({
-                    'number': current_number,
-                    'title': current_title,
-                    'content': '\n'.join(current_content)
-                })
-            
-            # 开始新章节
-            current_title = title
-            current_number = number
-            current_content = [line]
-        else:
+        number = self.matcher.match(line)
+        if number is None:
             # 如果还没遇到第一个章节标题，就是内容简介
-            if not current_title:
-                if line.strip():  # 只添加非空行
-                    intro_content.append(line)
+            if not self.current_title:
+                if line:  # 只添加非空行
+                    self.intro_content.append(line)
             else:
-                current_content.append(line)
-    
-    # 保存最后一章
-    if current_title and current_content:
-        chapters.append({
-            'number': current_number,
-            'title': current_title,
-            'content': '\n'.join(current_content)
-        })
-    
-    # 如果有重复章节，打印提示信息
+                self.current_content.append(line)
+            return []
+
+        # 检查章节号是否已使用
+        if number in self.used_numbers:
+            # 记录重复章节信息
+            self.duplicate_chapters.append({
+                'number': number,
+                'title': line,
+                'line_number': self.line_number
+            })
+            # 如果章节号已使用，将内容添加到当前章节
+            if self.current_title:
+                self.current_content.append(line)
+            return []
+
+        self.used_numbers.add(number)  # 记录已使用的章节号
+        finished = []
+
+        # 如果有内容简介，先保存为第一章
+        if self.intro_content and not self.chapter_count:
+            finished.append({
+                'number': 0,
+                'title': '内容简介',
+                'content': '\n'.join(self.intro_content)
+            })
+            self.intro_content = []
+
+        # 如果已有章节内容，保存前一章节
+        if self.current_title and self.current_content:
+            finished.append(self._current_chapter())
+
+        # 开始新章节
+        self.current_title = line
+        self.current_number = number
+        self.current_content = [line]
+        self.current_offset = offset
+        self.current_start_line = self.line_number - 1
+        self.chapter_count += len(finished)
+        return finished
+
+    def finish(self) -> List[Dict]:
+        """输入结束，返回最后一章"""
+        finished = []
+        if self.current_title and self.current_content:
+            finished.append(self._current_chapter())
+            if self.current_offset is not None:
+                self.resume_point = {
+                    'offset': self.current_offset,
+                    'line_number': self.current_start_line,
+                    'chapter_count': self.chapter_count,
+                    'used_numbers': sorted(self.used_numbers - {self.current_number})
+                }
+            self.chapter_count += 1
+        self.current_title = None
+        self.current_content = []
+        return finished
+
+    def _current_chapter(self) -> Dict:
+        return {
+            'number': self.current_number,
+            'title': self.current_title,
+            'content': '\n'.join(self.current_content)
+        }
+
+def iter_chapters(lines, splitter: Optional[ChapterSplitter] = None):
+    """逐行读取文本，按顺序逐个产出分割好的章节"""
+    splitter = splitter or ChapterSplitter()
+    for line in lines:
+        chapters = splitter.feed(line)
+        if chapters:
+            yield from chapters
+    yield from splitter.finish()
+
+def iter_novel_lines(file_path: str, encoding: str, start_offset: int = 0,
+                     errors: Optional[DecodeErrorCounter] = None):
+    """逐行读取小说，产出(字节偏移, 文本行)，无法确定偏移的行偏移为None
+
+    无法解码的字节用替换字符代替，传入 errors 时由其统计解码错误。
+    """
+    codec = codecs.lookup(encoding).name
+    errors = errors or DecodeErrorCounter(encoding)
+    if codec not in ASCII_COMPATIBLE_ENCODINGS:
+        if start_offset:
+            raise ValueError(f"编码 {encoding} 不支持从指定位置继续读取")
+        with open(file_path, 'r', encoding=encoding, errors='replace') as f:
+            for line in f:
+                errors.add(line)
+                yield None, line
+        return
+
+    line_codec = 'utf-8' if codec == 'utf-8-sig' else codec
+    offset = start_offset
+    with open(file_path, 'rb') as f:
+        f.seek(start_offset)
+        for raw in f:
+            # 只有文件开头需要处理 BOM
+            text = raw.decode(codec if offset == 0 else line_codec, 'replace')
+            errors.add(text, raw, offset)
+            if '\r' in text:
+                # 与文本模式一致：\r\n 和单独的 \r 都视为换行
+                text = text.rstrip('\n')
+                if text.endswith('\r'):
+                    text = text[:-1]
+                parts = text.split('\r')
+                yield offset, parts[0]
+                for part in parts[1:]:
+                    yield None, part
+            else:
+                yield offset, text
+            offset += len(raw)
+
+def iter_novel_chapters(file_path: str, encoding: str, splitter: ChapterSplitter,
+                        start_offset: int = 0, errors: Optional[DecodeErrorCounter] = None):
+    """边解码边分割，按顺序逐个产出章节"""
+    for offset, line in iter_novel_lines(file_path, encoding, start_offset, errors):
+        chapters = splitter.feed(line, offset)
+        if chapters:
+            yield from chapters
+    yield from splitter.finish()
+
+def fingerprint_file(file_path: str) -> Tuple[str, List[bytes]]:
+    """一次读取计算整个文件的哈希和每个块的哈希，块哈希用于计算任意前缀的指纹"""
+    full_hash = hashlib.sha1()
+    blocks = []
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(FINGERPRINT_BLOCK_SIZE), b''):
+            full_hash.update(chunk)
+            blocks.append(hashlib.sha1(chunk).digest())
+    return full_hash.hexdigest(), blocks
+
+def prefix_fingerprint(file_path: str, blocks: List[bytes], length: int) -> Optional[str]:
+    """文件前 length 字节的指纹，文件比前缀短时为None
+
+    由前缀中完整块的哈希（fingerprint_file 已计算）和最后不完整的一块组成，最多再读取一块。
+    """
+    count, rest = divmod(length, FINGERPRINT_BLOCK_SIZE)
+    if count > len(blocks) or (rest and count >= len(blocks)):
+        return None
+    digest = hashlib.sha1(b''.join(blocks[:count]))
+    if rest:
+        with open(file_path, 'rb') as f:
+            f.seek(count * FINGERPRINT_BLOCK_SIZE)
+            tail = f.read(rest)
+        if len(tail) < rest:
+            return None
+        digest.update(hashlib.sha1(tail).digest())
+    return digest.hexdigest()
+
+def report_duplicate_chapters(duplicate_chapters):
+    """打印重复章节提示信息"""
     if duplicate_chapters:
         print("\n检测到重复章节：")
         for dup in duplicate_chapters:
             print(f"章节号 {dup['number']} 在第 {dup['line_number']} 行重复出现")
             print(f"重复章节标题：{dup['title']}")
         print("重复章节的内容已合并到原章节中\n")
+
+def split_chapters(content):
+    """分割章节内容"""
+    splitter = ChapterSplitter()
+    chapters = list(iter_chapters(content.split('\n'), splitter))
+    
+    # 如果有重复章节，打印提示信息
+    report_duplicate_chapters(splitter.duplicate_chapters)
     
     return chapters
 
-def process_novel():
-    """处理小说文件的主函数"""
-    novels = get_novel_files()
-    processed_count = 0
-    
-    for novel in novels:
-        try:
-            print(f"\n正在处理小说：{novel['name']}")
-            # 检测文件编码
-            encoding = detect_encoding(novel['path'])
-            if not encoding:
-                print(f"无法识别文件编码: {novel['name']}")
+def split_novel_serial(novel: Dict, encoding: str, checkpoint: Optional[Dict], old_hashes: Dict,
+                       chapter_hashes: Dict, changes: Dict, writer,
+                       error_limit: Optional[int] = None) -> Dict:
+    """逐行分割小说，分割出的章节立即保存
+
+    error_limit 不为 None 时，解码错误超过该数量立即抛出 DecodeErrorLimitExceeded。
+    """
+    matcher = get_chapter_matcher()
+    matcher.reset_stats()
+    errors = DecodeErrorCounter(encoding, error_limit)
+    splitter = ChapterSplitter(matcher)
+    start_offset = 0
+    if checkpoint:
+        splitter.resume(checkpoint)
+        start_offset = checkpoint['offset']
+    chapters = iter_novel_chapters(novel['path'], encoding, splitter, start_offset, errors)
+    save_chapters(novel['name'], chapters, chapter_hashes, old_hashes, changes, writer)
+    return {
+        'stats': matcher.stats(),
+        'decode_errors': errors.count,
+        'duplicates': splitter.duplicate_chapters,
+        'chapter_count': splitter.chapter_count,
+        'resume_point': splitter.resume_point
+    }
+
+def plan_line_ranges(file_path: str, parts: int, start_offset: int = 0) -> List[Tuple[int, int]]:
+    """把文件从 start_offset 开始切分为约 parts 段按行对齐的字节范围"""
+    size = os.path.getsize(file_path)
+    step = max(1, (size - start_offset) // parts)
+    bounds = [start_offset]
+    with open(file_path, 'rb') as f:
+        for i in range(1, parts):
+            # 从目标位置的前一个字节读到行尾，使分界点落在下一行的开头
+            f.seek(start_offset + i * step - 1)
+            f.readline()
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _iter_range_lines(f, codec: str, start: int, end: int):
+    """逐行读取文件中 [start, end) 字节范围，产出(字节偏移, 去掉换行符的文本行)"""
+    line_codec = 'utf-8' if codec == 'utf-8-sig' else codec
+    f.seek(start)
+    offset = start
+    while offset < end:
+        raw = f.readline()
+        if not raw:
+            break
+        text = raw.decode(codec if offset == 0 else line_codec, 'replace').rstrip('\n')
+        if text.endswith('\r'):
+            text = text[:-1]
+        yield offset, text
+        offset += len(raw)
+
+def _scan_range_headings(file_path: str, encoding: str, start: int, end: int,
+                         config_path: str) -> Dict:
+    """扫描一段字节范围内的章节标题候选行（在子进程中运行）"""
+    matcher = ChapterMatcher(config_path)
+    codec = codecs.lookup(encoding).name
+    headings = []
+    lines = 0
+    with open(file_path, 'rb') as f:
+        for offset, text in _iter_range_lines(f, codec, start, end):
+            if '\r' in text:
+                # 单独的 \r 换行无法按字节偏移定位，交给逐行分割处理
+                return {'headings': [], 'lines': 0, 'bare_cr': True}
+            lines += 1
+            line = clean_line(text)
+            if not line:
                 continue
-                
-            # 读取小说内容
-            with open(novel['path'], 'r', encoding=encoding) as f:
-                content = f.read()
-            
-            # 分割章节
-            chapters = split_chapters(content)
-            
-            # 保存章节
-            save_chapters(novel['name'], chapters)
-            processed_count += 1
-            print(f"小说 {novel['name']} 处理完成，共分割 {len(chapters)} 个章节")
-            
-        except Exception as e:
-            print(f"处理文件失败 {novel['name']}: {str(e)}")
+            number = matcher.match(line)
+            if number is not None:
+                headings.append((offset, lines, number, line))
+    return {'headings': headings, 'lines': lines, 'bare_cr': False}
+
+def _write_range_chapters(file_path: str, encoding: str, output_dir: Optional[str],
+                          specs: List[Tuple], old_hashes: Dict) -> Dict:
+    """读取每个章节的字节范围，清理后保存（在子进程中运行）
+
+    output_dir 为None时不写文件，而是返回章节内容，由主进程写入打包文件。同时返回解码错误数
+    和第一处错误所在章节的字节偏移。
+    """
+    errors = DecodeErrorCounter(encoding)
+    codec = codecs.lookup(encoding).name
+    line_codec = 'utf-8' if codec == 'utf-8-sig' else codec
+    writer = open_chapter_writer(output_dir) if output_dir else None
+    written = []
+    with open(file_path, 'rb') as f:
+        for number, title, start, end, is_intro in specs:
+            f.seek(start)
+            raw = f.read(end - start)
+            text = raw.decode(codec if start == 0 else line_codec, 'replace')
+            errors.add(text, raw, start)
+            lines = []
+            for raw_line in text.split('\n'):
+                line = clean_line(raw_line)
+                # 内容简介只保留非空行
+                if line is None or (is_intro and not line):
+                    continue
+                lines.append(line)
+            if not lines:
+                continue
+            chapter = {'number': number, 'title': title, 'content': '\n'.join(lines)}
+            if output_dir is None:
+                written.append(chapter)
+            else:
+                old_hash = old_hashes.get(chapter_filename(chapter))
+                written.append(writer.write(chapter, old_hash))
+    return {'written': written, 'decode_errors': errors.count, 'first_error': errors.first}
+
+def split_novel_parallel(novel: Dict, encoding: str, output_dir: str,
+                         checkpoint: Optional[Dict], old_hashes: Dict,
+                         chapter_hashes: Dict, changes: Dict, workers: int,
+                         writer, error_limit: Optional[int] = None) -> Optional[Dict]:
+    """按行对齐的字节范围并行扫描章节标题，按顺序拼接后再并行写出章节
+
+    重复章节号和内容简介的处理与逐行分割完全一致。文件中存在单独的 \\r 换行时返回None，
+    由调用方改用逐行分割。error_limit 不为 None 时，解码错误超过该数量抛出 DecodeErrorLimitExceeded。
+    """
+    started = time.perf_counter()
+    path = novel['path']
+    size = os.path.getsize(path)
+    start_offset = checkpoint['offset'] if checkpoint else 0
+    ranges = plan_line_ranges(path, workers * 4, start_offset)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # 第一步：并行扫描章节标题候选行
+        scans = list(executor.map(
+            _scan_range_headings, repeat(path), repeat(encoding),
+            [start for start, _ in ranges], [end for _, end in ranges],
+            repeat(get_chapter_matcher().config_path)
+        ))
+        if any(scan['bare_cr'] for scan in scans):
+            return None
+
+        # 第二步：按顺序拼接，处理重复章节号
+        used_numbers = set(checkpoint['used_numbers']) if checkpoint else set()
+        line_base = checkpoint['line_number'] if checkpoint else 0
+        chapter_count = checkpoint['chapter_count'] if checkpoint else 0
+        boundaries = []
+        duplicates = []
+        for scan in scans:
+            for offset, index, number, title in scan['headings']:
+                line_number = line_base + index
+                if number in used_numbers:
+                    duplicates.append({'number': number, 'title': title, 'line_number': line_number})
+                    continue
+                used_numbers.add(number)
+                boundaries.append((offset, number, title, line_number))
+            line_base += scan['lines']
+
+        specs = []
+        if boundaries:
+            # 第一个章节标题之前的内容作为内容简介
+            if not chapter_count and boundaries[0][0] > start_offset:
+                specs.append((0, '内容简介', start_offset, boundaries[0][0], True))
+            for i, (offset, number, title, _) in enumerate(boundaries):
+                end = boundaries[i + 1][0] if i + 1 < len(boundaries) else size
+                specs.append((number, title, offset, end, False))
+
+        # 第三步：按字节量均分成批，并行读取、清理并保存章节
+        batches = []
+        batch_size = max(1, (size - start_offset) // (workers * 4))
+        current, current_bytes = [], 0
+        for spec in specs:
+            current.append(spec)
+            current_bytes += spec[3] - spec[2]
+            if current_bytes >= batch_size:
+                batches.append(current)
+                current, current_bytes = [], 0
+        if current:
+            batches.append(current)
+
+        # 打包格式只能由主进程顺序写入，子进程只负责读取和清理
+        packed = not isinstance(writer, ChapterFileWriter)
+        decode_errors = 0
+        first_error = None
+        for output in executor.map(
+                _write_range_chapters, repeat(path), repeat(encoding),
+                repeat(None if packed else output_dir), batches, repeat(old_hashes)):
+            if output['decode_errors'] and not decode_errors:
+                first_error = output['first_error']
+            decode_errors += output['decode_errors']
+            written = output['written']
+            if packed:
+                written = [writer.write(chapter, old_hashes.get(chapter_filename(chapter)))
+                           for chapter in written]
+            for filename, content_hash, status in written:
+                chapter_count += 1
+                chapter_hashes[filename] = content_hash
+                if status != 'unchanged':
+                    changes[filename[:-4]] = status
+            if error_limit is not None and decode_errors > error_limit:
+                raise DecodeErrorLimitExceeded(decode_errors, first_error)
+
+    resume_point = None
+    if boundaries:
+        offset, number, _, line_number = boundaries[-1]
+        resume_point = {
+            'offset': offset,
+            'line_number': line_number - 1,
+            'chapter_count': chapter_count - 1,
+            'used_numbers': sorted(used_numbers - {number})
+        }
+
+    elapsed = time.perf_counter() - started
+    lines = line_base - (checkpoint['line_number'] if checkpoint else 0)
+    return {
+        'stats': {
+            'lines': lines,
+            'matched': sum(len(scan['headings']) for scan in scans),
+            'elapsed': elapsed,
+            'lines_per_sec': lines / elapsed if elapsed > 0 else 0.0
+        },
+        'decode_errors': decode_errors,
+        'duplicates': duplicates,
+        'chapter_count': chapter_count,
+        'resume_point': resume_point
+    }
+
+def invalidate_chapter_audio(novel_name: str, chapter_names: List[str]) -> int:
+    """删除内容已变化章节的旧音频，使语音转换重新合成这些章节"""
+    mp3_dir = os.path.join(get_base_path(), "data", "out_mp3", novel_name.replace('.txt', ''))
+    removed = 0
+    for chapter_name in chapter_names:
+        mp3_path = os.path.join(mp3_dir, f"{chapter_name}.mp3")
+        if os.path.exists(mp3_path):
+            os.remove(mp3_path)
+            removed += 1
+    return removed
+
+def import_novel(novel: Dict, chunk_workers: int = 1) -> Dict:
+    """导入单本小说
+
+    未变化的文件直接跳过，朗读文本规范化或分段选项变化时只重新生成分段计划；
+    文件只在末尾追加了内容时，只从上次最后一章开头
+    继续分割；只重写内容有变化的章节文件。chunk_workers 大于1时，
+    超大文件按字节范围分块并行分割。
+    """
+    result = {
+        'name': novel['name'],
+        'status': 'unchanged',
+        'chapters': 0,
+        'new': [],
+        'changed': [],
+        'duplicates': []
+    }
+    meta = load_novel_meta(novel['name'])
+    matcher = get_chapter_matcher()
+    source = meta.get('source', {})
+    checkpoint = meta.get('checkpoint')
+    stat = os.stat(novel['path'])
+    store_format = get_chapter_store_format()
+    # 章节模式或存储格式变化后都需要完整重新分割
+    same_patterns = (meta.get('patterns') == matcher.signature and
+                     meta.get('store', STORE_FILES) == store_format)
+    max_chars = get_segment_max_chars()
+    normalizer = get_speech_normalizer()
+    speech_signature = speech_options_signature(max_chars, normalizer)
+    output_dir = get_novel_output_dir(novel['name'])
+
+    def skip_unchanged(meta_changed: bool) -> Dict:
+        """文本内容未变化时不重新分割，只在朗读文本或分段选项变化后重新规划"""
+        result['chapters'] = meta.get('chapter_count', 0)
+        if meta.get('speech') != speech_signature:
+            result['speech'] = update_segment_plans(
+                output_dir, {name[:-4]: value for name, value in meta.get('chapters', {}).items()},
+                max_chars, normalizer)
+            meta['speech'] = speech_signature
+            meta_changed = True
+        if meta_changed:
+            save_novel_meta(novel['name'], meta)
+        return result
+
+    # 大小和修改时间都没变，直接跳过
+    if (same_patterns and source.get('size') == stat.st_size and
+            source.get('mtime_ns') == stat.st_mtime_ns):
+        return skip_unchanged(False)
+
+    full_hash, blocks = fingerprint_file(novel['path'])
+    source = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': full_hash}
+
+    # 内容完全相同（只是修改时间变化），同样跳过
+    if same_patterns and meta.get('source', {}).get('sha1') == full_hash:
+        meta['source'] = source
+        return skip_unchanged(True)
+
+    # 检测文件编码（只读取文件头部样本）
+    encoding_info = resolve_encoding(novel, meta)
+    if not encoding_info:
+        raise ValueError("无法识别文件编码")
+    encoding = encoding_info['encoding']
+
+    chapter_hashes = {}
+    resume_from = None
+    # 前缀与上次最后一章开头之前的内容一致，说明只是在末尾追加了新章节
+    if (same_patterns and checkpoint and encoding_info.get('recorded') and
+            checkpoint.get('prefix_fingerprint') == prefix_fingerprint(novel['path'], blocks, checkpoint['offset']) and
+            (store_format != STORE_PACKED or is_packed(output_dir))):
+        resume_from = checkpoint
+        chapter_hashes = meta.get('chapters', {})
+        result['status'] = 'appended'
+    else:
+        result['status'] = 'full'
+
+    # 分割并保存章节，超大文件可按字节范围分块并行处理
+    os.makedirs(output_dir, exist_ok=True)
+    changes = {}
+    old_hashes = meta.get('chapters', {})
+    start_offset = resume_from['offset'] if resume_from else 0
+    if not resume_from:
+        # 完整分割时清除另一种存储格式留下的章节
+        if store_format == STORE_PACKED:
+            remove_chapter_files(output_dir)
+        else:
+            remove_packed(output_dir)
+    # 使用记录的编码时不再校验；按头部样本新检测的编码在分割的同时统计解码错误，
+    # 错误过多时放弃已写出的章节，重新检测编码后再分割一次
+    error_limit = None if encoding_info.get('recorded') else DECODE_ERROR_LIMIT
+    while True:
+        writer = open_chapter_writer(output_dir, store_format, append=resume_from is not None)
+        try:
+            outcome = None
+            if (chunk_workers > 1 and stat.st_size - start_offset >= PARALLEL_SPLIT_MIN_SIZE and
+                    codecs.lookup(encoding).name in ASCII_COMPATIBLE_ENCODINGS):
+                outcome = split_novel_parallel(novel, encoding, output_dir, resume_from, old_hashes,
+                                               chapter_hashes, changes, chunk_workers, writer, error_limit)
+            if outcome is None:
+                outcome = split_novel_serial(novel, encoding, resume_from, old_hashes,
+                                             chapter_hashes, changes, writer, error_limit)
+        except DecodeErrorLimitExceeded as e:
+            writer.abort()
+            # 每章一个文件的格式已经写出了部分章节：删除新建的文件，改写过的文件重新分割时与磁盘内容比较
+            if store_format == STORE_FILES:
+                for name, status in changes.items():
+                    if status == 'new':
+                        os.remove(os.path.join(output_dir, f"{name}.txt"))
+                old_hashes = {name: value for name, value in old_hashes.items() if name[:-4] not in changes}
+            encoding_info = redetect_encoding(novel['path'], encoding, e.first)
+            encoding = encoding_info['encoding']
+            error_limit = None
+            chapter_hashes = {}
+            changes = {}
             continue
-    
-    return processed_count
+        except Exception:
+            writer.abort()
+            raise
+        writer.close()
+        break
+    result['encoding'] = encoding_info
+    result['stats'] = outcome['stats']
+    result['decode_errors'] = outcome['decode_errors']
+    result['duplicates'] = outcome['duplicates']
+    result['chapters'] = outcome['chapter_count']
+    result['new'] = [name for name, status in changes.items() if status == 'new']
+    result['changed'] = [name for name, status in changes.items() if status == 'changed']
+
+    # 为新增或变化的章节生成朗读文本和语音合成分段计划
+    result['speech'] = update_segment_plans(
+        output_dir, {name[:-4]: value for name, value in chapter_hashes.items()}, max_chars, normalizer)
+
+    # 记录新的续读位置及其前缀指纹（块哈希已在计算整个文件的哈希时得到）
+    resume_point = outcome['resume_point']
+    if resume_point:
+        resume_point['prefix_fingerprint'] = prefix_fingerprint(novel['path'], blocks, resume_point['offset'])
+
+    # 记录编码和指纹，再次导入时跳过检测
+    meta.update({
+        'encoding': encoding,
+        'encoding_confidence': encoding_info['confidence'],
+        'encoding_method': encoding_info['method'],
+        'decode_errors': outcome['decode_errors'],
+        'patterns': matcher.signature,
+        'store': store_format,
+        'speech': speech_signature,
+        'source': source,
+        'checkpoint': resume_point,
+        'chapter_count': outcome['chapter_count'],
+        'chapters': chapter_hashes,
+        'changed_chapters': result['changed']
+    })
+    save_novel_meta(novel['name'], meta)
+    return result
 
-def save_chapters(novel_name, chapters):
-    """保存分割后的章节"""
-    # 使用绝对路径
-    base_path = get_base_path()
-    output_dir = os.path.join(base_path, "data", "out_text", novel_name.replace('.txt', ''))
+def report_import_result(result: Dict):
+    """打印单本小说的导入结果"""
+    name = result['name']
+    if result['status'] == 'unchanged':
+        print(f"小说 {name} 内容未变化，跳过处理")
+        if 'speech' in result:
+            print(f"朗读文本或分段选项已变化，已为 {result['speech']['planned']} 个章节重新生成朗读文本和分段计划")
+        return
+
+    encoding_info = result['encoding']
+    if encoding_info['method'] == 'rescan':
+        print(f"按文件头部检测的编码无法正确解码全文，重新检测为: {encoding_info['encoding']}")
+    elif not encoding_info.get('recorded'):
+        print(f"检测到文件编码: {encoding_info['encoding']}（置信度 {encoding_info['confidence']:.2f}）")
+    if result['status'] == 'appended':
+        print("检测到文件末尾追加了内容，从上次最后一章继续分割")
+    report_duplicate_chapters(result['duplicates'])
+    if result['decode_errors']:
+        print(f"警告：有 {result['decode_errors']} 处字节无法按 {encoding_info['encoding']} 解码，已使用替换字符代替")
+    stats = result['stats']
+    print(f"章节识别：{stats['lines']} 行，{stats['lines_per_sec']:.0f} 行/秒")
+    if result['changed']:
+        print(f"有 {len(result['changed'])} 个章节内容发生变化，已删除 {result['removed_audio']} 个过期音频")
+    speech = result['speech']
+    if speech['planned']:
+        print(f"已为 {speech['planned']} 个章节生成朗读文本和分段计划")
+    if speech['removed'] or speech['added']:
+        print(f"朗读文本规范化：本次处理的章节删除 {speech['removed']} 个字符，"
+              f"新增 {speech['added']} 个字符（数字读法等）")
+    print(f"小说 {name} 处理完成，共 {result['chapters']} 个章节，"
+          f"新增 {len(result['new'])} 个，更新 {len(result['changed'])} 个")
+
+def _import_novel_safely(novel: Dict, chunk_workers: int = 1) -> Dict:
+    """导入单本小说并捕获异常，供进程池调用"""
+    try:
+        result = import_novel(novel, chunk_workers)
+        # 内容有变化的章节需要重新转换语音
+        result['removed_audio'] = invalidate_chapter_audio(novel['name'], result['changed'])
+        return result
+    except Exception as e:
+        return {'name': novel['name'], 'status': 'error', 'error': str(e)}
+
+def process_novel(workers: int = 1):
+    """处理小说文件的主函数
+
+    workers 大于1时使用进程池并行导入多本小说，0 表示使用全部CPU核心；
+    超大的单个文件改为按字节范围分块，由同样数量的进程并行分割。
+    """
+    novels = get_novel_files()
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    workers = max(1, workers)
+    results = []
+
+    def report(result):
+        if result['status'] == 'error':
+            print(f"处理文件失败 {result['name']}: {result['error']}")
+        else:
+            report_import_result(result)
+        results.append(result)
+
+    if workers == 1:
+        for novel in novels:
+            print(f"\n正在处理小说：{novel['name']}")
+            report(_import_novel_safely(novel))
+    else:
+        # 超大文件逐本分块并行分割，其余文件整本分配给进程池
+        for novel in novels:
+            novel['size'] = os.path.getsize(novel['path'])
+        large_novels = [n for n in novels if n['size'] >= PARALLEL_SPLIT_MIN_SIZE]
+        small_novels = [n for n in novels if n['size'] < PARALLEL_SPLIT_MIN_SIZE]
+
+        for novel in large_novels:
+            print(f"\n正在分块并行处理小说：{novel['name']}")
+            report(_import_novel_safely(novel, workers))
+
+        if small_novels:
+            # 按文件大小从大到小提交，空闲进程总是领取剩余最大的文件，使各进程工作量均衡
+            small_novels.sort(key=lambda novel: novel['size'], reverse=True)
+            pool_size = min(workers, len(small_novels))
+            print(f"\n使用 {pool_size} 个进程并行处理 {len(small_novels)} 本小说")
+            with ProcessPoolExecutor(max_workers=pool_size) as executor:
+                futures = [executor.submit(_import_novel_safely, novel) for novel in small_novels]
+                for future in as_completed(futures):
+                    result = future.result()
+                    print(f"\n小说：{result['name']}")
+                    report(result)
+
+    processed = [r for r in results if r['status'] != 'error']
+    errors = [r for r in results if r['status'] == 'error']
+    if workers > 1 or len(results) > 1:
+        total_chapters = sum(r['chapters'] for r in processed)
+        total_duplicates = sum(len(r['duplicates']) for r in processed)
+        print(f"\n共处理 {len(processed)} 本小说，{total_chapters} 个章节，"
+              f"重复章节 {total_duplicates} 处，失败 {len(errors)} 本")
+        for error in errors:
+            print(f"  失败：{error['name']}：{error['error']}")
     
-    # 确保目录存在
-    os.makedirs(output_dir, exist_ok=True)
+    return len(processed)
+
+def chapter_filename(chapter: Dict) -> str:
+    """生成章节文件名"""
+    # 使用五位数字格式化章节号
+    return chapter_name(chapter['number'], chapter['title']) + '.txt'
+
+def save_chapters(novel_name, chapters, chapter_hashes: Optional[Dict] = None,
+                  old_hashes: Optional[Dict] = None, changes: Optional[Dict] = None,
+                  writer=None) -> int:
+    """保存分割后的章节，返回处理的章节数
+
+    chapters 可以是逐个产出章节的迭代器，内容未变化的章节不重写。传入 chapter_hashes 时
+    把每章的内容哈希写入其中；old_hashes 为上次导入的哈希，changes 记录每个写入章节
+    是新增(new)还是更新(changed)。writer 默认为每章一个文件的写入器。
+    """
+    old_hashes = old_hashes or {}
+    own_writer = writer is None
+    if own_writer:
+        writer = open_chapter_writer(get_novel_output_dir(novel_name))
     
     # 保存每个章节
+    count = 0
     for chapter in chapters:
-        # 清理文件名中的非法字符
-        title = re.sub(r'[<>:"/\\|?*]', '_', chapter['title'])
-        # 使用五位数字格式化章节号
-        filename = f"{chapter['number']:05d}.{title}.txt"
-        filepath = os.path.join(output_dir, filename)
-        
-        # 确保父目录存在
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(chapter['content'])
\ No newline at end of file
+        count += 1
+        filename, content_hash, status = writer.write(
+            chapter, old_hashes.get(chapter_filename(chapter)))
+        if chapter_hashes is not None:
+            chapter_hashes[filename] = content_hash
+        if status != 'unchanged' and changes is not None:
+            changes[filename[:-4]] = status
+    
+    if own_writer:
+        writer.close()
+    return count
@@ -0,0 +1,245 @@
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from audio_cache import link_or_copy
+from subtitles import load_cues, subtitle_path, write_subtitles
+from tts_process import get_ffmpeg_path, load_synthesis_record, open_audio_cache, parse_rate
+
+# 单个 atempo 滤镜支持的倍数范围，超出时串联多个滤镜
+ATEMPO_MIN = 0.5
+ATEMPO_MAX = 2.0
+# 语速版本目录中记录各章节由哪个原音频、按多少倍变速生成的文件
+VARIANT_RECORD_NAME = ".variants.json"
+
+def get_base_path() -> str:
+    """获取项目根目录"""
+    return os.path.dirname(os.path.abspath(__file__))
+
+def get_variant_dir(rate: str) -> str:
+    """语速版本的输出目录，其中按小说分目录，与 data/out_mp3 的结构相同"""
+    return os.path.join(get_base_path(), "data", "out_mp3_rate", rate)
+
+def load_variant_record(novel_dir: str) -> Dict:
+    """读取语速版本的生成记录 {章节名: {'size', 'mtime_ns', 'factor'}}"""
+    try:
+        with open(os.path.join(novel_dir, VARIANT_RECORD_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_variant_record(novel_dir: str, record: Dict):
+    record_path = os.path.join(novel_dir, VARIANT_RECORD_NAME)
+    tmp_path = f"{record_path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, record_path)
+
+def rate_factor(rate: str, source_rate: str = "+0%") -> float:
+    """把 source_rate 合成的音频变为 rate 语速时的播放速度倍数"""
+    return (100 + parse_rate(rate)) / (100 + parse_rate(source_rate))
+
+def tempo_filters(factor: float) -> str:
+    """按倍数生成 ffmpeg 的 atempo 滤镜链（变速不变调）"""
+    filters = []
+    while factor > ATEMPO_MAX:
+        filters.append(f"atempo={ATEMPO_MAX}")
+        factor /= ATEMPO_MAX
+    while factor < ATEMPO_MIN:
+        filters.append(f"atempo={ATEMPO_MIN}")
+        factor /= ATEMPO_MIN
+    filters.append(f"atempo={factor:.6f}")
+    return ','.join(filters)
+
+def file_hash(path: str) -> str:
+    """计算文件内容哈希"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def variant_key(audio_hash: str, factor: float) -> str:
+    """由章节音频内容和变速倍数决定的缓存键"""
+    return hashlib.sha1(f"rate-variant\n{factor:.6f}\n{audio_hash}".encode('utf-8')).hexdigest()
+
+def stretch_audio(src: str, dst: str, factor: float) -> Optional[str]:
+    """用 ffmpeg 把音频变速为 factor 倍，输出与 Edge TTS 相同规格的 MP3，失败时返回错误信息
+
+    在进程池中运行，先写入临时文件，完成后再改名。
+    """
+    tmp_path = dst + '.part'
+    try:
+        result = subprocess.run(
+            [get_ffmpeg_path(), '-y', '-loglevel', 'error', '-i', src, '-filter:a', tempo_filters(factor),
+             '-ac', '1', '-ar', '24000', '-b:a', '48k', '-f', 'mp3', tmp_path],
+            capture_output=True
+        )
+    except OSError as e:
+        return f"无法运行 ffmpeg: {str(e)}"
+    if result.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return result.stderr.decode('utf-8', errors='replace').strip() or f"ffmpeg 退出码 {result.returncode}"
+    os.replace(tmp_path, dst)
+    return None
+
+def scale_subtitles(src_audio: str, dst_audio: str, factor: float) -> bool:
+    """按变速倍数缩放章节字幕的时间，返回是否生成"""
+    cues = load_cues(subtitle_path(src_audio))
+    if cues is None:
+        return False
+    write_subtitles(dst_audio, [(start / factor, end / factor, content) for start, end, content in cues])
+    return True
+
+def source_state(path: str, factor: float) -> Dict:
+    """原音频的大小、修改时间和变速倍数，与生成记录一致时语速版本已是最新"""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'factor': round(factor, 6)}
+
+def collect_chapters(mp3_root: str, output_root: str, rate: str, source_rate: Optional[str] = None,
+                     novels: Optional[List[str]] = None) -> Tuple[List[Tuple[str, str, float]], Dict[str, int]]:
+    """收集需要生成语速版本的章节，返回 ([(原音频, 输出音频, 变速倍数)], 跳过的章节数)
+
+    变速倍数按转换时记录的合成语速计算（source_rate 不为空时统一使用 source_rate）；
+    没有记录（在记录合成语速之前转换）或记录与音频不符的章节跳过。输出已按相同的原音频
+    和倍数生成过的章节同样跳过，原音频重新合成后会重新生成。
+    """
+    chapters = []
+    skipped = {'up_to_date': 0, 'unknown_rate': 0}
+    for novel in sorted(os.listdir(mp3_root)):
+        novel_dir = os.path.join(mp3_root, novel)
+        if not os.path.isdir(novel_dir) or (novels and novel not in novels):
+            continue
+        synthesis = load_synthesis_record(novel_dir)
+        variants = load_variant_record(os.path.join(output_root, novel))
+        for file in sorted(os.listdir(novel_dir)):
+            src = os.path.join(novel_dir, file)
+            if not file.endswith('.mp3') or not os.path.isfile(src):
+                continue
+            name = file[:-4]
+            chapter_rate = source_rate
+            if chapter_rate is None:
+                entry = synthesis.get(name)
+                if entry is None or entry.get('size') != os.path.getsize(src):
+                    skipped['unknown_rate'] += 1
+                    continue
+                chapter_rate = entry['rate']
+            factor = rate_factor(rate, chapter_rate)
+            dst = os.path.join(output_root, novel, file)
+            if os.path.exists(dst) and variants.get(name) == source_state(src, factor):
+                skipped['up_to_date'] += 1
+                continue
+            chapters.append((src, dst, factor))
+    return chapters, skipped
+
+def create_rate_variants(rate: str, source_rate: Optional[str] = None, novels: Optional[List[str]] = None,
+                         workers: int = 0) -> Dict[str, int]:
+    """由 data/out_mp3 中已转换的章节生成另一种语速的版本，不重新合成
+
+    rate 为目标语速，与各章节转换时记录的合成语速的比值即变速倍数；source_rate 不为空时
+    忽略记录，把所有章节视为按 source_rate 合成。结果按（章节音频哈希, 变速倍数）缓存在
+    音频缓存中，多个进程并行调用 ffmpeg 变速；workers 为进程数，0 表示使用全部CPU核心。
+    返回各结果的章节数。
+    """
+    mp3_root = os.path.join(get_base_path(), "data", "out_mp3")
+    output_root = get_variant_dir(rate)
+    counts = {'converted': 0, 'cached': 0, 'up_to_date': 0, 'unknown_rate': 0, 'failed': 0}
+    if not os.path.isdir(mp3_root):
+        print("没有已转换的章节")
+        return counts
+
+    chapters, skipped = collect_chapters(mp3_root, output_root, rate, source_rate, novels)
+    counts.update(skipped)
+    source = f"原音频语速 {source_rate}" if source_rate else "按记录的合成语速"
+    print(f"生成语速 {rate} 的版本（{source}）：需要处理 {len(chapters)} 章，已是最新 {counts['up_to_date']} 章")
+    if counts['unknown_rate']:
+        print(f"有 {counts['unknown_rate']} 章没有记录合成语速（在记录语速之前转换），已跳过；"
+              f"确认这些音频的语速后可用 --source-rate 指定")
+    if not chapters:
+        return counts
+
+    cache = open_audio_cache()
+    start = time.monotonic()
+    records = {}
+
+    def finish(src, dst, factor):
+        novel_dir = os.path.dirname(dst)
+        if novel_dir not in records:
+            records[novel_dir] = load_variant_record(novel_dir)
+        records[novel_dir][os.path.basename(dst)[:-4]] = source_state(src, factor)
+
+    pending = []
+    for src, dst, factor in chapters:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        key = variant_key(file_hash(src), factor)
+        if cache is not None and cache.get(key, dst, ('.srt',)):
+            counts['cached'] += 1
+            finish(src, dst, factor)
+            continue
+        if cache is not None and cache.get(key, dst):
+            # 缓存时原音频还没有字幕
+            scale_subtitles(src, dst, factor)
+            counts['cached'] += 1
+            finish(src, dst, factor)
+            continue
+        if abs(factor - 1) < 1e-6:
+            link_or_copy(src, dst)
+            scale_subtitles(src, dst, factor)
+            counts['converted'] += 1
+            finish(src, dst, factor)
+            continue
+        pending.append((src, dst, factor, key))
+
+    try:
+        if pending:
+            workers = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+                futures = {executor.submit(stretch_audio, src, dst, factor): (src, dst, factor, key)
+                           for src, dst, factor, key in pending}
+                for future in as_completed(futures):
+                    src, dst, factor, key = futures[future]
+                    error = future.result()
+                    if error:
+                        counts['failed'] += 1
+                        print(f"变速失败: {os.path.basename(src)}，错误: {error}")
+                        continue
+                    has_subtitles = scale_subtitles(src, dst, factor)
+                    if cache is not None:
+                        cache.put(key, dst, ('.srt',) if has_subtitles else ())
+                    counts['converted'] += 1
+                    finish(src, dst, factor)
+                    print(f"已完成: {os.path.relpath(dst, output_root)}")
+    finally:
+        for novel_dir, record in records.items():
+            save_variant_record(novel_dir, record)
+        if cache is not None:
+            cache.save()
+
+    print(f"语速版本生成完成：新生成 {counts['converted']} 章，使用缓存 {counts['cached']} 章，"
+          f"失败 {counts['failed']} 章，用时 {time.monotonic() - start:.1f} 秒，输出目录 {output_root}")
+    return counts
+
+if __name__ == "__main__":
+    # 位置参数：语速；语速可能以“-”开头，因此位置参数不交给 argparse 解析
+    parser = argparse.ArgumentParser(
+        description="由已转换的章节音频变速生成另一种语速的版本（不重新合成）",
+        usage="%(prog)s 语速 [--source-rate=语速] [--novel 小说] [--workers N]",
+        allow_abbrev=False
+    )
+    parser.add_argument('--source-rate',
+                        help="忽略转换时记录的合成语速，把已转换的音频都视为按该语速合成；负数写作 --source-rate=-10%%")
+    parser.add_argument('--novel', action='append', help="只处理指定的小说，可重复指定")
+    parser.add_argument('--workers', type=int, default=0, help="并行的 ffmpeg 进程数，0 表示使用全部CPU核心")
+    args, positional = parser.parse_known_args()
+    if len(positional) != 1:
+        parser.error("需要提供语速参数")
+    result = create_rate_variants(positional[0], args.source_rate, args.novel, max(0, args.workers))
+    sys.exit(1 if result['failed'] else 0)
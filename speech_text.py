@@ -0,0 +1,385 @@
+import os
+import re
+import json
+import uuid
+import bisect
+import hashlib
+from collections import Counter
+from typing import List, Tuple, Dict, Optional
+
+from chapter_store import open_chapter_reader
+
+# 每个语音合成分段的默认最大字符数
+DEFAULT_SEGMENT_CHARS = 2000
+# 引号内的整句超出预算时，允许分段超出预算的比例，以免从引号中间断开
+QUOTE_OVERFLOW_RATIO = 1.5
+# 分段计划文件名，与章节保存在同一目录
+SEGMENT_PLAN_NAME = 'segments.json'
+# 规范化后的朗读文本缓存目录，位于章节目录下
+SPEECH_CACHE_DIR = '.speech'
+# 规范化规则变化时递增，使旧缓存失效
+NORMALIZER_VERSION = 2
+
+# 默认的规范化选项，可在 config.json 的 speech_normalize 中覆盖
+DEFAULT_NORMALIZE_OPTIONS = {
+    'boilerplate': [],           # 需要删除的广告、水印等固定文字
+    'boilerplate_patterns': [],  # 需要删除的文字（正则表达式）
+    'strip_urls': True,
+    'strip_symbols': True,
+    'expand_numbers': True
+}
+
+SENTENCE_ENDINGS = '。！？!?…'
+OPENING_QUOTES = '“‘「『'
+CLOSING_QUOTES = '”’」』'
+# 找不到句末断点时退而使用的断点
+CLAUSE_BREAKS = '，；：,;:、'
+
+_SPECIAL_CHARS = re.compile(
+    '[\n"' + re.escape(SENTENCE_ENDINGS + OPENING_QUOTES + CLOSING_QUOTES) + ']'
+)
+_CLAUSE_CHARS = re.compile('[' + re.escape(CLAUSE_BREAKS) + ']')
+
+def find_sentence_breaks(text: str) -> Tuple[List[int], List[int]]:
+    """查找句末断点，返回(引号外的断点, 引号内的断点)
+
+    断点是分段结束位置（不含），句末标点后紧跟的其他句末标点和闭合引号归入本句。
+    换行视为段落结束，同时重置引号状态，避免个别引号不配对影响整章。
+    """
+    outside, inside = [], []
+    depth = 0
+    ascii_quote = False
+    length = len(text)
+    skip_until = 0
+    for match in _SPECIAL_CHARS.finditer(text):
+        i = match.start()
+        if i < skip_until:
+            continue
+        char = text[i]
+        if char == '\n':
+            depth = 0
+            ascii_quote = False
+            outside.append(i + 1)
+        elif char in OPENING_QUOTES:
+            depth += 1
+        elif char in CLOSING_QUOTES:
+            depth = max(0, depth - 1)
+        elif char == '"':
+            ascii_quote = not ascii_quote
+        else:
+            # 连续的句末标点（如……、？！）作为一个整体
+            end = i + 1
+            while end < length and text[end] in SENTENCE_ENDINGS:
+                end += 1
+            # 句末标点后的闭合引号属于本句
+            while end < length and (text[end] in CLOSING_QUOTES or text[end] == '"'):
+                if text[end] == '"':
+                    ascii_quote = not ascii_quote
+                else:
+                    depth = max(0, depth - 1)
+                end += 1
+            skip_until = end
+            if depth == 0 and not ascii_quote:
+                outside.append(end)
+            else:
+                inside.append(end)
+    return outside, inside
+
+def _last_break(breaks: List[int], start: int, limit: int) -> Optional[int]:
+    """返回 (start, limit] 内最后一个断点"""
+    index = bisect.bisect_right(breaks, limit) - 1
+    if index >= 0 and breaks[index] > start:
+        return breaks[index]
+    return None
+
+def _first_break(breaks: List[int], start: int, limit: int) -> Optional[int]:
+    """返回 (start, limit] 内第一个断点"""
+    index = bisect.bisect_right(breaks, start)
+    if index < len(breaks) and breaks[index] <= limit:
+        return breaks[index]
+    return None
+
+def plan_segments(text: str, max_chars: int = DEFAULT_SEGMENT_CHARS) -> List[Tuple[int, int]]:
+    """把章节文本切分为适合一次语音合成请求的分段，返回 [(起始, 结束), ...]
+
+    优先在引号外的句末标点（。！？…）或段落结尾处断开，不从引号中间断开；
+    引号内的长句超出预算时最多允许超出 QUOTE_OVERFLOW_RATIO 倍，
+    再长才依次退而在引号内句末、逗号等子句标点处断开，最后才硬切。
+    各分段首尾相接，拼接后与原文完全一致。
+    """
+    length = len(text)
+    if length <= max_chars:
+        return [(0, length)]
+
+    outside, inside = find_sentence_breaks(text)
+    clauses = None
+    segments = []
+    start = 0
+    while length - start > max_chars:
+        limit = start + max_chars
+        end = _last_break(outside, start, limit)
+        if end is None:
+            end = _first_break(outside, start, start + int(max_chars * QUOTE_OVERFLOW_RATIO))
+        if end is None:
+            end = _last_break(inside, start, limit)
+        if end is None:
+            if clauses is None:
+                clauses = [m.end() for m in _CLAUSE_CHARS.finditer(text)]
+            end = _last_break(clauses, start, limit)
+        if end is None:
+            end = limit
+        segments.append((start, end))
+        start = end
+    if start < length:
+        segments.append((start, length))
+    return segments
+
+_FULLWIDTH_ALNUM = str.maketrans(
+    {chr(c): chr(c - 0xFEE0) for c in list(range(0xFF10, 0xFF1A)) + list(range(0xFF21, 0xFF3B)) +
+     list(range(0xFF41, 0xFF5B)) + [0xFF0E]}
+)
+_URL_PATTERN = re.compile(
+    r'(?:https?://|www\.)[^\s\u4e00-\u9fff，。！？“”]+'
+    r'|[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.(?:com|net|org|cn|cc|info|me|io|tv|la|xyz|top|vip)\b'
+    r'(?:/[^\s\u4e00-\u9fff，。！？“”]*)?',
+    re.IGNORECASE
+)
+# emoji、方框绘制符、几何图形、箭头、装饰性符号等无法朗读的字符
+_SYMBOL_PATTERN = re.compile(
+    '[\u2190-\u21ff\u2500-\u27bf\u2b00-\u2bff\ufe0f\u200b-\u200d\u2060'
+    '\U0001f000-\U0001faff※♀♂〓¤§]+'
+)
+# 连续三个及以上相同的标点只保留一个
+_REPEATED_PUNCTUATION = re.compile(r'([！？!?。，～~\-—=_*#·])\1{2,}')
+_SPACES = re.compile(r'[ \t\u3000]+')
+# 不含任何文字或数字的行（只剩标点）不需要朗读
+_SPEAKABLE = re.compile(r'[^\W_]')
+
+_CHINESE_DIGITS = '零一二三四五六七八九'
+_SMALL_UNITS = ((3, '千'), (2, '百'), (1, '十'), (0, ''))
+_LARGE_UNITS = ('', '万', '亿', '万亿')
+_NUMBER_PATTERN = re.compile(r'(\d+)(?:\.(\d+))?(%)?(年)?')
+# 两位数后的“年”后面紧跟月份或季节时是年份（如 98年3月），否则是年数（如 过了10年）
+_CALENDAR_AFTER_YEAR = re.compile(r'\d{1,2}月|[一二三四五六七八九十]{1,3}月|[春夏秋冬初底末]')
+# 达到该位数且不是整数额（后一半以上是0）的数字串按编号、电话等逐位读出
+DIGIT_STRING_MIN_LENGTH = 7
+
+def read_digits(digits: str) -> str:
+    """逐位读出数字串"""
+    return ''.join(_CHINESE_DIGITS[int(d)] for d in digits)
+
+def _read_group(number: int) -> str:
+    """读出 1~9999 的数"""
+    result = ''
+    zero = False
+    for power, unit in _SMALL_UNITS:
+        digit = number // 10 ** power % 10
+        if digit == 0:
+            zero = bool(result)
+            continue
+        if zero:
+            result += '零'
+            zero = False
+        result += _CHINESE_DIGITS[digit] + unit
+    return result
+
+def read_integer(number: int) -> str:
+    """把整数读为中文数字，如 10020 读作一万零二十"""
+    if number == 0:
+        return '零'
+    groups = []
+    while number:
+        groups.append(number % 10000)
+        number //= 10000
+
+    result = ''
+    zero = False
+    for index in range(len(groups) - 1, -1, -1):
+        group = groups[index]
+        if group == 0:
+            zero = bool(result)
+            continue
+        if result and (zero or group < 1000):
+            result += '零'
+        result += _read_group(group) + _LARGE_UNITS[index]
+        zero = False
+    # 十到十九读作“十X”而不是“一十X”
+    if result.startswith('一十'):
+        result = result[1:]
+    return result
+
+def is_digit_string(integer: str) -> bool:
+    """数字串是否应逐位读出：以0开头、超出读法范围，或位数较多而不是整数额（电话、编号等）"""
+    if len(integer) > 1 and integer[0] == '0':
+        return True
+    if len(integer) > 12:
+        return True
+    return (len(integer) >= DIGIT_STRING_MIN_LENGTH and
+            len(integer) - len(integer.rstrip('0')) < len(integer) // 2)
+
+def _is_calendar_year(match) -> bool:
+    integer = match.group(1)
+    if len(integer) == 4:
+        return True
+    return len(integer) == 2 and _CALENDAR_AFTER_YEAR.match(match.string, match.end()) is not None
+
+def _expand_number(match) -> str:
+    integer, fraction, percent, year = match.groups()
+    if year and not fraction and not percent and _is_calendar_year(match):
+        # 年份逐位读出
+        return read_digits(integer) + '年'
+    if is_digit_string(integer):
+        spoken = read_digits(integer)
+    else:
+        spoken = read_integer(int(integer))
+    if fraction:
+        spoken += '点' + read_digits(fraction)
+    if percent:
+        spoken = '百分之' + spoken
+    return spoken + (year or '')
+
+class SpeechNormalizer:
+    """把章节文本规范化为适合语音合成的朗读文本
+
+    依次删除广告水印等固定文字、网址、emoji 和装饰性符号，压缩重复标点，
+    并把阿拉伯数字展开为中文读法。所有固定文字合并为一个正则一次匹配。
+    """
+
+    def __init__(self, options: Optional[Dict] = None):
+        self.options = dict(DEFAULT_NORMALIZE_OPTIONS)
+        self.options.update(options or {})
+        self.signature = hashlib.sha1(
+            json.dumps([NORMALIZER_VERSION, self.options], ensure_ascii=False, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+        # 固定文字按长度降序排列，保证较长的文字优先匹配
+        phrases = sorted(set(self.options['boilerplate']), key=len, reverse=True)
+        alternatives = [re.escape(p) for p in phrases if p] + list(self.options['boilerplate_patterns'])
+        self._boilerplate = re.compile('|'.join(alternatives)) if alternatives else None
+
+    def normalize_line(self, line: str) -> str:
+        """规范化单行文本"""
+        # 全角字母数字转为半角，便于识别网址和数字
+        line = line.translate(_FULLWIDTH_ALNUM)
+        if self._boilerplate is not None:
+            line = self._boilerplate.sub('', line)
+        if self.options['strip_urls']:
+            line = _URL_PATTERN.sub('', line)
+        if self.options['strip_symbols']:
+            line = _SYMBOL_PATTERN.sub('', line)
+            line = _REPEATED_PUNCTUATION.sub(r'\1', line)
+        if self.options['expand_numbers']:
+            line = _NUMBER_PATTERN.sub(_expand_number, line)
+        line = _SPACES.sub(' ', line).strip()
+        return line if _SPEAKABLE.search(line) else ''
+
+    def normalize(self, text: str) -> str:
+        """规范化章节文本，删除处理后变为空的行"""
+        lines = (self.normalize_line(line) for line in text.split('\n'))
+        return '\n'.join(line for line in lines if line)
+
+def speech_cache_path(novel_dir: str, content_hash: str, normalizer: SpeechNormalizer) -> str:
+    """朗读文本的缓存路径，由章节内容哈希和规范化规则共同决定"""
+    key = hashlib.sha1(f"{content_hash}:{normalizer.signature}".encode('utf-8')).hexdigest()
+    return os.path.join(novel_dir, SPEECH_CACHE_DIR, key + '.txt')
+
+def get_speech_text(novel_dir: str, text: str, content_hash: str,
+                    normalizer: SpeechNormalizer) -> str:
+    """取得章节的朗读文本，优先使用缓存"""
+    cache_path = speech_cache_path(novel_dir, content_hash, normalizer)
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        pass
+
+    speech = normalizer.normalize(text)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # 多个转换进程可能同时写入同一缓存文件
+    tmp_path = f"{cache_path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(speech)
+    os.replace(tmp_path, cache_path)
+    return speech
+
+def load_segment_plan(novel_dir: str) -> Dict:
+    """读取小说的分段计划"""
+    try:
+        with open(os.path.join(novel_dir, SEGMENT_PLAN_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_segment_plan(novel_dir: str, plan: Dict):
+    """原子替换小说的分段计划"""
+    plan_path = os.path.join(novel_dir, SEGMENT_PLAN_NAME)
+    tmp_path = plan_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, plan_path)
+
+def update_segment_plans(novel_dir: str, chapter_hashes: Dict[str, str],
+                         max_chars: int = DEFAULT_SEGMENT_CHARS,
+                         normalizer: Optional[SpeechNormalizer] = None) -> Dict:
+    """为新增或内容变化的章节生成朗读文本和分段计划
+
+    chapter_hashes 为 {章节名: 内容哈希}，计划中记录的哈希与之一致的章节不再重新处理。
+    分段偏移指向规范化后的朗读文本。返回重新规划的章节数、规范化前后的总字数，
+    以及本次规划的章节中规范化删除（removed）和新增（added，如数字的中文读法）的字符数。
+    """
+    normalizer = normalizer or SpeechNormalizer()
+    plan = load_segment_plan(novel_dir)
+    if plan.get('max_chars') != max_chars or plan.get('normalizer') != normalizer.signature:
+        plan = {'max_chars': max_chars, 'normalizer': normalizer.signature, 'chapters': {}}
+    chapters = plan['chapters']
+
+    planned = 0
+    removed = added = 0
+    with open_chapter_reader(novel_dir) as reader:
+        for name, content_hash in chapter_hashes.items():
+            entry = chapters.get(name)
+            if entry and entry['hash'] == content_hash:
+                continue
+            text = reader.read(name)
+            speech = get_speech_text(novel_dir, text, content_hash, normalizer)
+            chapters[name] = {
+                'hash': content_hash,
+                'chars': len(text),
+                'speech_chars': len(speech),
+                'segments': plan_segments(speech, max_chars)
+            }
+            planned += 1
+            original, spoken = Counter(text), Counter(speech)
+            removed += sum((original - spoken).values())
+            added += sum((spoken - original).values())
+
+    # 删除已不存在章节的计划和朗读文本缓存
+    for name in [name for name in chapters if name not in chapter_hashes]:
+        del chapters[name]
+    cache_dir = os.path.join(novel_dir, SPEECH_CACHE_DIR)
+    if os.path.isdir(cache_dir):
+        live = {os.path.basename(speech_cache_path(novel_dir, entry['hash'], normalizer))
+                for entry in chapters.values()}
+        for file in os.listdir(cache_dir):
+            if file not in live:
+                os.remove(os.path.join(cache_dir, file))
+    save_segment_plan(novel_dir, plan)
+
+    return {
+        'planned': planned,
+        'removed': removed,
+        'added': added,
+        'chars': sum(entry['chars'] for entry in chapters.values()),
+        'speech_chars': sum(entry['speech_chars'] for entry in chapters.values())
+    }
+
+def get_chapter_segments(plan: Dict, name: str, text: str, content_hash: str,
+                         normalizer: SpeechNormalizer,
+                         max_chars: Optional[int] = None) -> List[Tuple[int, int]]:
+    """取得章节朗读文本 text 的分段，计划缺失或已过期时现场规划"""
+    max_chars = max_chars or plan.get('max_chars') or DEFAULT_SEGMENT_CHARS
+    entry = plan.get('chapters', {}).get(name)
+    if (entry and entry['hash'] == content_hash and plan.get('max_chars') == max_chars and
+            plan.get('normalizer') == normalizer.signature):
+        return [tuple(segment) for segment in entry['segments']]
+    return plan_segments(text, max_chars)
@@ -0,0 +1,159 @@
+import os
+import re
+import shutil
+from typing import List, Dict, Tuple, Iterable, Optional
+
+from mp3_frames import mp3_duration
+
+# 支持的字幕格式，srt 总是生成，供合并音频时拼接
+SUBTITLE_FORMATS = ('srt', 'vtt')
+# 每条字幕的最大字数
+DEFAULT_CUE_CHARS = 20
+# 两个词之间停顿超过该秒数时另起一条字幕
+CUE_PAUSE = 0.5
+# 在这些标点和换行处结束一条字幕
+CUE_BREAKS = '。！？!?；;，,、…：:\n'
+
+# 一条字幕：(开始秒数, 结束秒数, 文字)
+Cue = Tuple[float, float, str]
+
+def group_word_boundaries(text: str, events: List[Dict], max_chars: int = DEFAULT_CUE_CHARS) -> List[Cue]:
+    """把 Edge TTS 的 WordBoundary 事件组合成字幕
+
+    事件中的词不含标点，按顺序在原文中定位后，字幕文字取原文中对应的片段（保留句中标点）；
+    词后面是句末或分句标点、字数达到 max_chars 或词间停顿较长时结束当前字幕。
+    """
+    cues = []
+    current = []
+    position = 0
+
+    def flush():
+        if not current:
+            return
+        start_index, end_index = current[0][1], current[-1][2]
+        if start_index is not None and end_index is not None:
+            content = ' '.join(text[start_index:end_index].split())
+        else:
+            content = ''.join(word['text'] for word, _, _ in current)
+        cues.append((current[0][0]['offset'] / 1e7,
+                     (current[-1][0]['offset'] + current[-1][0]['duration']) / 1e7,
+                     content))
+        current.clear()
+
+    for i, event in enumerate(events):
+        index = text.find(event['text'], position)
+        if index < 0:
+            span = (None, None)
+        else:
+            span = (index, index + len(event['text']))
+            position = span[1]
+        if current:
+            previous = current[-1][0]
+            gap = (event['offset'] - previous['offset'] - previous['duration']) / 1e7
+            if gap >= CUE_PAUSE:
+                flush()
+        current.append((event, span[0], span[1]))
+
+        # 下一个词之前出现标点时在此处分开
+        next_index = -1
+        if span[1] is not None and i + 1 < len(events):
+            next_index = text.find(events[i + 1]['text'], span[1])
+        between = text[span[1]:next_index] if next_index >= 0 else ''
+        length = sum(len(word['text']) for word, _, _ in current)
+        if any(char in CUE_BREAKS for char in between) or length >= max_chars:
+            flush()
+    flush()
+    return cues
+
+def offset_cues(cues: Iterable[Cue], offset: float) -> List[Cue]:
+    return [(start + offset, end + offset, content) for start, end, content in cues]
+
+def format_timestamp(seconds: float, separator: str = ',') -> str:
+    milliseconds = int(round(max(0.0, seconds) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+def compose_srt(cues: List[Cue]) -> str:
+    blocks = []
+    for number, (start, end, content) in enumerate(cues, 1):
+        blocks.append(f"{number}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{content}\n")
+    return '\n'.join(blocks)
+
+def compose_vtt(cues: List[Cue]) -> str:
+    blocks = ["WEBVTT\n"]
+    for start, end, content in cues:
+        blocks.append(f"{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{content}\n")
+    return '\n'.join(blocks)
+
+TIMESTAMP_LINE = re.compile(r'(\d+):(\d\d):(\d\d)[,.](\d{3})\s*-->\s*(\d+):(\d\d):(\d\d)[,.](\d{3})')
+
+def _seconds(hours: str, minutes: str, seconds: str, milliseconds: str) -> float:
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(milliseconds) / 1000
+
+def parse_srt(content: str) -> List[Cue]:
+    """解析 SRT 字幕"""
+    cues = []
+    for block in re.split(r'\n\s*\n', content.replace('\r\n', '\n').strip()):
+        lines = block.split('\n')
+        for i, line in enumerate(lines):
+            match = TIMESTAMP_LINE.match(line.strip())
+            if match:
+                groups = match.groups()
+                cues.append((_seconds(*groups[:4]), _seconds(*groups[4:]), '\n'.join(lines[i + 1:]).strip()))
+                break
+    return cues
+
+def subtitle_path(audio_path: str, fmt: str = 'srt') -> str:
+    """音频文件对应的字幕文件路径"""
+    return os.path.splitext(audio_path)[0] + '.' + fmt
+
+def load_cues(path: str) -> Optional[List[Cue]]:
+    """读取 SRT 字幕，文件不存在时返回 None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return parse_srt(f.read())
+    except OSError:
+        return None
+
+def write_subtitles(audio_path: str, cues: List[Cue], formats: Iterable[str] = ('srt',)) -> List[str]:
+    """按指定格式写入 audio_path 对应的字幕文件（总是包含 srt），返回写入的文件列表"""
+    paths = []
+    for fmt in ['srt'] + [fmt for fmt in formats if fmt != 'srt']:
+        path = subtitle_path(audio_path, fmt)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(compose_vtt(cues) if fmt == 'vtt' else compose_srt(cues))
+        paths.append(path)
+    return paths
+
+def concatenate_cues(audio_paths: List[str]) -> Optional[List[Cue]]:
+    """按音频顺序拼接各文件的字幕，每个文件的字幕按前面音频的总时长偏移
+
+    没有字幕的音频只计入时长；所有音频都没有字幕时返回 None。
+    """
+    cues = []
+    found = False
+    offset = 0.0
+    for path in audio_paths:
+        part = load_cues(subtitle_path(path))
+        if part is not None:
+            found = True
+            cues.extend(offset_cues(part, offset))
+        offset += mp3_duration(path)
+    return cues if found else None
+
+def merge_subtitles(audio_paths: List[str], output_audio_path: str, formats: Iterable[str] = ('srt',)) -> bool:
+    """为拼接后的音频生成字幕文件，返回是否生成"""
+    cues = concatenate_cues(audio_paths)
+    if cues is None:
+        return False
+    write_subtitles(output_audio_path, cues, formats)
+    return True
+
+def move_subtitles(src_audio_path: str, dst_audio_path: str, copy: bool = False):
+    """把音频对应的字幕文件一起移动（或复制）到新位置"""
+    for fmt in SUBTITLE_FORMATS:
+        src = subtitle_path(src_audio_path, fmt)
+        if os.path.exists(src):
+            (shutil.copy2 if copy else shutil.move)(src, subtitle_path(dst_audio_path, fmt))
@@ -0,0 +1,77 @@
+import json
+import os
+
+from audio_cache import ACCESS_INDEX_NAME, AudioCache, audio_key
+
+
+def write_audio(path, size):
+    with open(path, 'wb') as f:
+        f.write(b'\xff' * size)
+    return str(path)
+
+
+def test_audio_key_depends_on_text_voice_and_rate():
+    key = audio_key('正文', 'voice', '+0%')
+    assert key == audio_key('正文', 'voice', '+0%')
+    assert len({key, audio_key('正文', 'voice', '+10%'), audio_key('正文', 'other', '+0%'),
+                audio_key('正文。', 'voice', '+0%')}) == 4
+
+
+def test_put_and_get_with_sidecar(tmp_path):
+    cache = AudioCache(str(tmp_path / 'cache'), max_size_mb=1)
+    audio = write_audio(tmp_path / 'a.mp3', 100)
+    key = audio_key('正文', 'voice', '+0%')
+    assert not cache.get(key, str(tmp_path / 'out.mp3'))
+
+    cache.put(key, audio, ('.srt',))
+    # 缓存中没有字幕时，需要字幕的读取视为未命中
+    assert not cache.get(key, str(tmp_path / 'out.mp3'), ('.srt',))
+    assert cache.get(key, str(tmp_path / 'out.mp3'))
+    assert (tmp_path / 'out.mp3').read_bytes() == b'\xff' * 100
+
+    (tmp_path / 'a.srt').write_text('字幕', encoding='utf-8')
+    cache.put(key, audio, ('.srt',))
+    assert cache.get(key, str(tmp_path / 'out2.mp3'), ('.srt',))
+    assert (tmp_path / 'out2.srt').read_text(encoding='utf-8') == '字幕'
+    assert cache.hits == 2
+
+    cache.discard(key)
+    assert cache.size == 0
+    assert not os.path.exists(cache.path(key)[:-4] + '.srt')
+    assert not cache.get(key, str(tmp_path / 'out3.mp3'))
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(str(tmp_path / 'cache'), max_size_mb=1000 / 1024 / 1024)
+    keys = [audio_key(str(i), 'voice', '+0%') for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, write_audio(tmp_path / f'{i}.mp3', 400))
+        os.utime(cache.path(key), (i, i))
+    # 第一个文件最近被使用过，淘汰第二个；使用记录在索引中，不改变与输出共用的修改时间
+    cache.get(keys[0], str(tmp_path / 'out.mp3'))
+    assert os.path.getmtime(tmp_path / 'out.mp3') == 0
+    cache.put(keys[2], write_audio(tmp_path / '2.mp3', 400))
+    assert os.path.exists(cache.path(keys[0]))
+    assert not os.path.exists(cache.path(keys[1]))
+    assert os.path.exists(cache.path(keys[2]))
+    assert cache.size == 800
+    assert AudioCache(str(tmp_path / 'cache')).size == 800
+
+
+def test_access_times_are_saved_to_the_index(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    cache = AudioCache(cache_dir, max_size_mb=1000 / 1024 / 1024)
+    keys = [audio_key(str(i), 'voice', '+0%') for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, write_audio(tmp_path / f'{i}.mp3', 400))
+        os.utime(cache.path(key), (i, i))
+    cache.get(keys[0], str(tmp_path / 'out.mp3'))
+    cache.save()
+
+    # 另一个进程淘汰时同样使用索引中的最近使用时间
+    other = AudioCache(cache_dir, max_size_mb=1000 / 1024 / 1024)
+    other.put(keys[2], write_audio(tmp_path / '2.mp3', 400))
+    assert os.path.exists(cache.path(keys[0]))
+    assert not os.path.exists(cache.path(keys[1]))
+    with open(os.path.join(cache_dir, ACCESS_INDEX_NAME), encoding='utf-8') as f:
+        assert list(json.load(f)) == [keys[0]]
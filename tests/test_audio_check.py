@@ -0,0 +1,71 @@
+import os
+
+from audio_check import AudioChecker, check_library, quarantine
+from mock_tts_server import SILENT_FRAME
+
+# 250 帧约 6 秒
+FRAMES = 250
+
+
+def write_mp3(path, data=SILENT_FRAME * FRAMES):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_check_reasons(tmp_path):
+    checker = AudioChecker(str(tmp_path / 'scan.json'))
+    good = write_mp3(tmp_path / 'good.mp3')
+    assert checker.check(good, 30) is None
+    assert '不完整' in checker.check(write_mp3(tmp_path / 'cut.mp3', SILENT_FRAME * FRAMES + SILENT_FRAME[:20]))
+    assert '无法解析' in checker.check(write_mp3(tmp_path / 'junk.mp3', SILENT_FRAME + bytes(1000) + SILENT_FRAME))
+    assert checker.check(write_mp3(tmp_path / 'empty.mp3', b'')) == '没有有效的音频帧'
+    assert '过短' in checker.check(good, 200)
+    assert '过长' in AudioChecker(str(tmp_path / 'scan.json'), max_chars_per_sec=100,
+                                min_chars_per_sec=50).check(good, 100)
+    # 字数太少时不比较时长
+    assert checker.check(good, 10) is None
+    assert checker.check(str(tmp_path / 'missing.mp3')).startswith('无法读取')
+
+
+def test_scan_results_are_cached(tmp_path):
+    path = tmp_path / 'a.mp3'
+    write_mp3(path)
+    checker = AudioChecker(str(tmp_path / 'scan.json'))
+    checker.check(str(path))
+    checker.save()
+
+    reloaded = AudioChecker(str(tmp_path / 'scan.json'))
+    assert reloaded.check(str(path)) is None
+    assert reloaded.scanned == 0
+    # 文件变化后重新扫描
+    write_mp3(path, SILENT_FRAME * 3 + SILENT_FRAME[:10])
+    os.utime(path, ns=(1, 1))
+    assert reloaded.check(str(path)) is not None
+    assert reloaded.scanned == 1
+    # 临时文件不缓存
+    reloaded.check(write_mp3(tmp_path / 'tmp.mp3'), remember=False)
+    assert os.path.abspath(tmp_path / 'tmp.mp3') not in reloaded.results
+
+
+def test_quarantine_library(tmp_path):
+    mp3_root = tmp_path / 'out_mp3'
+    write_mp3(mp3_root / '甲' / '00001.第1章.mp3')
+    bad = write_mp3(mp3_root / '甲' / '00002.第2章.mp3', SILENT_FRAME * 3 + SILENT_FRAME[:10])
+    (mp3_root / '甲' / '00002.第2章.srt').write_text('字幕', encoding='utf-8')
+    (tmp_path / 'out_text').mkdir()
+    checker = AudioChecker(str(tmp_path / 'scan.json'))
+    assert check_library(str(mp3_root), str(tmp_path / 'out_text'), checker) == {'checked': 2, 'suspicious': 1}
+    assert os.path.exists(bad)
+    assert check_library(str(mp3_root), str(tmp_path / 'out_text'), checker, move=True)['suspicious'] == 1
+    assert not os.path.exists(bad)
+    moved = sorted(os.listdir(mp3_root / '甲' / 'quarantine'))
+    assert [os.path.splitext(name)[1] for name in moved] == ['.mp3', '.srt', '.txt']
+    assert check_library(str(mp3_root), str(tmp_path / 'out_text'), checker)['suspicious'] == 0
+
+
+def test_quarantine_keeps_earlier_copies(tmp_path, monkeypatch):
+    first = quarantine(write_mp3(tmp_path / 'a.mp3'), '原因一')
+    monkeypatch.setattr('audio_check.time.strftime', lambda fmt: '20990101000000')
+    second = quarantine(write_mp3(tmp_path / 'a.mp3'), '原因二')
+    assert first != second and os.path.exists(first)
@@ -0,0 +1,36 @@
+import pytest
+
+from benchmark import STAGES, compare_results, format_heading, generate_novel, run_case
+from novel_process import split_chapters
+
+
+def test_generate_novel_is_deterministic():
+    text = generate_novel(chapters=5, chapter_chars=200, seed=1)
+    assert generate_novel(chapters=5, chapter_chars=200, seed=1) == text
+    assert generate_novel(chapters=5, chapter_chars=200, seed=2) != text
+
+
+@pytest.mark.parametrize('style', ['arabic', 'chinese', 'traditional'])
+def test_headings_are_recognized(style):
+    text = generate_novel(chapters=120, chapter_chars=50, heading_style=style)
+    assert len(split_chapters(text)) == 120
+    assert format_heading(105, style, '标题').endswith(' 标题')
+
+
+def test_run_case(tmp_path):
+    case = {'name': 'gb18030-small', 'encoding': 'gb18030', 'chapters': 20, 'chapter_chars': 300}
+    result = run_case(case, str(tmp_path), repeat=1)
+    assert result['chapters'] == 20
+    assert result['encoding'] == 'gb18030'
+    assert set(result['stages']) == set(STAGES)
+
+
+def test_compare_results():
+    def results(seconds, chapters=10):
+        stages = {stage: {'seconds': seconds, 'peak_kb': 100.0} for stage in STAGES}
+        return {'cases': {'case': {'chapters': chapters, 'stages': stages}}}
+    assert compare_results(results(0.110), results(0.100)) == []
+    assert len(compare_results(results(0.200), results(0.100))) == len(STAGES)
+    # 耗时增加不足 MIN_REGRESSION_SECONDS 时视为测量误差
+    assert compare_results(results(0.002), results(0.001)) == []
+    assert '章节数' in compare_results(results(0.100, 9), results(0.100))[0]
@@ -0,0 +1,69 @@
+import os
+
+from chapter_store import (
+    PACK_DATA_NAME,
+    STORE_PACKED,
+    compact_pack,
+    count_chapters,
+    export_chapter_files,
+    is_packed,
+    load_pack_index,
+    open_chapter_reader,
+    open_chapter_writer,
+)
+
+
+def chapter(number, content):
+    return {'number': number, 'title': f'第{number}章', 'content': content}
+
+
+def write_chapters(novel_dir, chapters, append=False):
+    writer = open_chapter_writer(str(novel_dir), STORE_PACKED, append)
+    statuses = [writer.write(c)[2] for c in chapters]
+    writer.close()
+    return statuses
+
+
+def test_packed_round_trip(tmp_path):
+    novel_dir = tmp_path / 'novel'
+    assert write_chapters(novel_dir, [chapter(1, '正文一'), chapter(2, ''), chapter(3, '正文三')]) == ['new'] * 3
+    assert is_packed(str(novel_dir))
+    assert count_chapters(str(novel_dir)) == 3
+    with open_chapter_reader(str(novel_dir)) as reader:
+        assert reader.names() == ['00001.第1章', '00002.第2章', '00003.第3章']
+        assert reader.read('00001.第1章') == '正文一'
+        assert reader.read('00002.第2章') == ''
+        assert reader.path('00003.第3章') is None
+
+
+def test_packed_append_only_rewrites_changed(tmp_path):
+    novel_dir = tmp_path / 'novel'
+    write_chapters(novel_dir, [chapter(1, '正文一'), chapter(2, '正文二')])
+    size = os.path.getsize(novel_dir / PACK_DATA_NAME)
+    statuses = write_chapters(novel_dir, [chapter(2, '正文二'), chapter(3, '正文三')], append=True)
+    assert statuses == ['unchanged', 'new']
+    assert os.path.getsize(novel_dir / PACK_DATA_NAME) == size + len('正文三'.encode('utf-8'))
+
+    write_chapters(novel_dir, [chapter(1, '改过的正文一')], append=True)
+    compact_pack(str(novel_dir))
+    entries = load_pack_index(str(novel_dir))
+    assert sum(entry[3] for entry in entries) == os.path.getsize(novel_dir / PACK_DATA_NAME)
+    with open_chapter_reader(str(novel_dir)) as reader:
+        assert [reader.read(name) for name in reader.names()] == ['改过的正文一', '正文二', '正文三']
+
+
+def test_abort_keeps_previous_pack(tmp_path):
+    novel_dir = tmp_path / 'novel'
+    write_chapters(novel_dir, [chapter(1, '正文一')])
+    writer = open_chapter_writer(str(novel_dir), STORE_PACKED)
+    writer.write(chapter(1, '不会保存'))
+    writer.abort()
+    with open_chapter_reader(str(novel_dir)) as reader:
+        assert reader.read('00001.第1章') == '正文一'
+
+
+def test_export_widens_chapter_numbers(tmp_path):
+    novel_dir = tmp_path / 'novel'
+    write_chapters(novel_dir, [chapter(9, '九'), chapter(123456, '很多')])
+    assert export_chapter_files(str(novel_dir), str(tmp_path / 'out')) == 2
+    assert sorted(os.listdir(tmp_path / 'out')) == ['000009.第9章.txt', '123456.第123456章.txt']
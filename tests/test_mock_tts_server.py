@@ -0,0 +1,84 @@
+import asyncio
+
+import aiohttp
+import edge_tts
+import pytest
+
+from mock_tts_server import (
+    FRAME_SECONDS,
+    SILENT_FRAME,
+    MockTTSServer,
+    audio_message,
+    parse_ssml,
+    parse_text_message,
+    text_message,
+    word_boundaries,
+)
+from mp3_frames import scan_mp3
+
+
+def test_parse_ssml():
+    ssml = ("<speak><voice name='zh-CN-YunxiNeural'><prosody pitch='+0Hz' rate='+25%' volume='+0%'>"
+            "他说：&lt;你好&gt; &amp; 再见</prosody></voice></speak>")
+    assert parse_ssml(ssml) == ('他说：<你好> & 再见', 1.25)
+    assert parse_ssml('<speak></speak>') == ('', 1.0)
+    assert parse_ssml("<prosody rate='-95%'>慢</prosody>")[1] == pytest.approx(0.1)
+
+
+def test_word_boundaries():
+    events, seconds = word_boundaries('你好世界 abc123。', speed=2.0)
+    assert [event['Data']['text']['Text'] for event in events] == ['你好', '世界', 'abc123']
+    # 每秒 10 个字
+    assert seconds == pytest.approx(1.2)
+    assert events[1]['Data']['Offset'] == 2_000_000
+    assert events[2]['Data']['Duration'] == 6_000_000
+
+
+def test_messages():
+    headers, body = parse_text_message(text_message('abc', 'turn.start', {'a': '中'}))
+    assert headers['X-RequestId'] == 'abc' and headers['Path'] == 'turn.start'
+    assert body == '{"a": "中"}'
+    message = audio_message('abc', SILENT_FRAME)
+    header_length = int.from_bytes(message[:2], 'big')
+    assert b'Path:audio' in message[2:2 + header_length]
+    assert message[2 + header_length:] == SILENT_FRAME
+
+
+def synthesize(server_options, text, monkeypatch):
+    """用 edge_tts 向模拟服务请求合成，返回 (音频, 逐词时间事件数, 服务统计)"""
+    monkeypatch.setattr(edge_tts.communicate, 'WSS_URL', edge_tts.communicate.WSS_URL)
+
+    async def main():
+        server = MockTTSServer(**server_options)
+        edge_tts.communicate.WSS_URL = await server.start()
+        audio, words = b'', 0
+        try:
+            communicate = edge_tts.Communicate(text, 'zh-CN-YunxiNeural', rate='+100%', boundary='WordBoundary')
+            async for chunk in communicate.stream():
+                if chunk['type'] == 'audio':
+                    audio += chunk['data']
+                elif chunk['type'] == 'WordBoundary':
+                    words += 1
+        finally:
+            await server.stop()
+        return audio, words, server.stats()
+    return asyncio.run(main())
+
+
+def test_serves_edge_tts_protocol(monkeypatch):
+    audio, words, stats = synthesize({'latency': 0, 'realtime': 0}, '第一句话。第二句话。', monkeypatch)
+    result = scan_mp3(audio)
+    assert (result['junk'], result['truncated']) == (0, 0)
+    # 10 个字，+100% 语速时每秒 10 个字
+    assert result['frames'] == round(1.0 / FRAME_SECONDS)
+    assert words == 4
+    assert stats['completed'] == 1 and stats['latency_p50'] is not None
+
+
+def test_injected_errors(monkeypatch):
+    with pytest.raises(aiohttp.WSServerHandshakeError) as error:
+        synthesize({'error_rate': 1.0}, '正文', monkeypatch)
+    assert error.value.status == 500
+    # 开始响应后断开连接，客户端收不到音频
+    with pytest.raises(edge_tts.exceptions.NoAudioReceived):
+        synthesize({'drop_rate': 1.0, 'latency': 0}, '正文', monkeypatch)
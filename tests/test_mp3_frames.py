@@ -0,0 +1,63 @@
+import pytest
+
+from mock_tts_server import FRAME_SECONDS, SILENT_FRAME
+from mp3_frames import parse_header, scan_mp3, split_frames
+
+# MPEG 1 Layer III，128kbps，44.1kHz，不含填充时每帧 417 字节
+MPEG1_FRAME = b'\xff\xfb\x90\x00' + bytes(413)
+MPEG1_PADDED = b'\xff\xfb\x92\x00' + bytes(414)
+ID3_TAG = b'ID3\x03\x00\x00\x00\x00\x00\x0a' + bytes(10)
+
+
+def test_parse_header():
+    frame = parse_header(SILENT_FRAME, 0)
+    assert (frame.length, frame.samples, frame.sample_rate) == (144, 576, 24000)
+    assert parse_header(MPEG1_PADDED, 0).length == 418
+    assert parse_header(b'\xff\xfb\xf0\x00', 0) is None
+    assert parse_header(b'\x00\x00\x00\x00', 0) is None
+
+
+def test_scan_constant_bitrate():
+    result = scan_mp3(SILENT_FRAME * 100)
+    assert result == {'frames': 100, 'duration': pytest.approx(100 * FRAME_SECONDS), 'junk': 0, 'truncated': 0}
+
+
+def test_scan_truncated_file():
+    result = scan_mp3(SILENT_FRAME * 10 + SILENT_FRAME[:50])
+    assert (result['frames'], result['truncated']) == (10, 50)
+
+
+def test_scan_junk_between_frames():
+    result = scan_mp3(SILENT_FRAME * 5 + b'garbage' + SILENT_FRAME * 5)
+    assert (result['frames'], result['junk'], result['truncated']) == (10, 7, 0)
+
+
+def test_scan_variable_frames_with_tags():
+    data = ID3_TAG + MPEG1_FRAME + MPEG1_PADDED + ID3_TAG + MPEG1_FRAME + b'TAG' + bytes(125)
+    result = scan_mp3(data)
+    assert (result['frames'], result['junk'], result['truncated']) == (3, 0, 0)
+    assert result['duration'] == pytest.approx(3 * 1152 / 44100)
+
+
+def test_scan_skips_info_frame():
+    info = b'\xff\xf3\x64\xc4' + bytes(32) + b'Info' + bytes(104)
+    result = scan_mp3(info + SILENT_FRAME * 4)
+    assert (result['frames'], result['junk']) == (4, 0)
+
+
+def test_scan_no_frames():
+    assert scan_mp3(b'not an mp3 file') == {'frames': 0, 'duration': 0.0, 'junk': 15, 'truncated': 0}
+    assert scan_mp3(b'')['frames'] == 0
+
+
+def test_split_frames_at_frame_boundaries():
+    data = ID3_TAG + SILENT_FRAME * 10
+    # 切分点落在第 3 帧中间时从第 4 帧开始下一段
+    pieces = split_frames(data, [2.5 * FRAME_SECONDS, 7.5 * FRAME_SECONDS])
+    assert [len(piece) // len(SILENT_FRAME) for piece in pieces] == [3, 5, 2]
+    assert b''.join(pieces) == SILENT_FRAME * 10
+
+
+def test_split_frames_with_empty_pieces():
+    pieces = split_frames(SILENT_FRAME * 2, [0.0, 10.0, 20.0])
+    assert [len(piece) // len(SILENT_FRAME) for piece in pieces] == [0, 2, 0, 0]
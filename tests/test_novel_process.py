@@ -0,0 +1,279 @@
+import codecs
+import hashlib
+import json
+import os
+import shutil
+
+import pytest
+
+import novel_process
+from novel_process import (
+    ChapterMatcher,
+    ChapterSplitter,
+    chinese_to_arabic,
+    detect_encoding_info,
+    DecodeErrorCounter,
+    fingerprint_file,
+    iter_novel_chapters,
+    prefix_fingerprint,
+    redetect_encoding,
+    scan_decode_errors,
+    split_chapters,
+)
+
+
+def write_patterns(path, patterns):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'chapter_patterns': [{'pattern': p, 'description': ''} for p in patterns]},
+                  f, ensure_ascii=False)
+
+
+@pytest.fixture
+def matcher(tmp_path):
+    config_path = tmp_path / 'config.json'
+    write_patterns(config_path, [r'第([0-9零一二三四五六七八九十百千万]+)章.*',
+                                 r'第([壹贰叁肆伍陆柒捌玖拾佰仟萬]+)章.*'])
+    return ChapterMatcher(str(config_path), check_interval=0)
+
+
+@pytest.mark.parametrize('line, number', [
+    ('第十二章 标题', 12),
+    ('第12章 标题', 12),
+    ('第一百零二章', 102),
+    ('第壹佰章 标题', 100),
+    ('正文里提到第十二章', None),
+    ('普通的正文', None),
+])
+def test_match(matcher, line, number):
+    assert matcher.match(line) == number
+
+
+def test_chinese_to_arabic():
+    assert chinese_to_arabic('十') == 10
+    assert chinese_to_arabic('二十三') == 23
+    assert chinese_to_arabic('一千零一') == 1001
+
+
+def test_reload_when_config_changes(matcher):
+    assert matcher.match('Chapter 7') is None
+    signature = matcher.signature
+    write_patterns(matcher.config_path, [r'Chapter ([0-9]+)'])
+    # 保证修改时间变化
+    mtime = os.path.getmtime(matcher.config_path) + 1
+    os.utime(matcher.config_path, (mtime, mtime))
+    assert matcher.refresh()
+    assert matcher.match('Chapter 7') == 7
+    assert matcher.signature != signature
+
+
+SAMPLE_TEXT = '简介一行\n\n第一章 开始\n正文一\n-----\n正文二\n第二章 继续\n正文三\n第一章 重复\n正文四\n'
+
+
+def test_split_chapters():
+    chapters = split_chapters(SAMPLE_TEXT)
+    assert chapters == [
+        {'number': 0, 'title': '内容简介', 'content': '简介一行'},
+        {'number': 1, 'title': '第一章 开始', 'content': '第一章 开始\n正文一\n\n正文二'},
+        {'number': 2, 'title': '第二章 继续', 'content': '第二章 继续\n正文三\n第一章 重复\n正文四'},
+    ]
+
+
+def test_streaming_split_matches_split_chapters(tmp_path):
+    path = tmp_path / 'novel.txt'
+    path.write_bytes(SAMPLE_TEXT.replace('\n', '\r\n').encode('gb18030'))
+    splitter = ChapterSplitter()
+    chapters = list(iter_novel_chapters(str(path), 'gb18030', splitter))
+    assert chapters == split_chapters(SAMPLE_TEXT)
+    assert splitter.duplicate_chapters[0]['line_number'] == 9
+    assert splitter.chapter_count == 3
+
+
+def test_detect_encoding_info(tmp_path):
+    path = tmp_path / 'novel.txt'
+    path.write_bytes(codecs.BOM_UTF8 + '第一章'.encode('utf-8'))
+    assert detect_encoding_info(str(path))['method'] == 'bom'
+    path.write_bytes('第一章 开始\n正文'.encode('utf-8'))
+    assert detect_encoding_info(str(path))['encoding'] == 'utf-8'
+
+
+def test_decode_error_counter_ignores_literal_replacement_chars():
+    raw = '原文中的\ufffd字符'.encode('utf-8') + b'\xff\xfe'
+    counter = DecodeErrorCounter('utf-8')
+    counter.add(raw.decode('utf-8', 'replace'), raw, 100)
+    assert (counter.count, counter.first) == (2, 100)
+    counter.add('正常'.encode('utf-8').decode('utf-8'), None, 200)
+    assert (counter.count, counter.first) == (2, 100)
+
+
+def test_redetect_encoding_past_ascii_header(tmp_path):
+    path = tmp_path / 'novel.txt'
+    header = b'ascii header line\n' * 6000
+    text = '第一章 开始\n这是一段中文正文，用来测试编码检测。\n' * 2000
+    path.write_bytes(header + text.encode('gb18030'))
+    info = detect_encoding_info(str(path))
+    assert info['encoding'] == 'utf-8'
+    assert scan_decode_errors(str(path), 'utf-8') > novel_process.DECODE_ERROR_LIMIT
+    redetected = redetect_encoding(str(path), 'utf-8', len(header) + 10)
+    assert redetected['encoding'] == 'gb18030'
+    assert redetected['method'] == 'rescan'
+    assert scan_decode_errors(str(path), 'gb18030') == 0
+
+
+def test_redetect_encoding_rejects_undecodable_file(tmp_path):
+    path = tmp_path / 'novel.txt'
+    path.write_bytes(b'ascii header line\n' * 6000 + bytes(range(0x80, 0x100)) * 200)
+    with pytest.raises(ValueError):
+        redetect_encoding(str(path), 'utf-8', 6000 * 18)
+
+
+def test_fingerprint_prefix(tmp_path, monkeypatch):
+    monkeypatch.setattr(novel_process, 'FINGERPRINT_BLOCK_SIZE', 64)
+    path = tmp_path / 'novel.txt'
+    data = bytes(range(256)) * 2
+    path.write_bytes(data)
+    full_hash, blocks = fingerprint_file(str(path))
+    assert full_hash == hashlib.sha1(data).hexdigest()
+    assert len(blocks) == 8
+    # 前缀的指纹只取决于前缀的内容
+    for length in (0, 64, 100, 512):
+        path.write_bytes(data[:length] + b'appended')
+        _, other_blocks = fingerprint_file(str(path))
+        expected = prefix_fingerprint(str(path), other_blocks, length)
+        path.write_bytes(data)
+        assert prefix_fingerprint(str(path), blocks, length) == expected
+    assert prefix_fingerprint(str(path), blocks, 100) != prefix_fingerprint(str(path), blocks, 101)
+    assert prefix_fingerprint(str(path), blocks, 513) is None
+
+
+def test_resume_after_append(tmp_path):
+    path = tmp_path / 'novel.txt'
+    path.write_bytes(SAMPLE_TEXT.encode('utf-8'))
+    splitter = ChapterSplitter()
+    list(iter_novel_chapters(str(path), 'utf-8', splitter))
+    checkpoint = splitter.resume_point
+    assert checkpoint['chapter_count'] == 2
+    assert checkpoint['used_numbers'] == [1]
+
+    _, blocks = fingerprint_file(str(path))
+    prefix = prefix_fingerprint(str(path), blocks, checkpoint['offset'])
+    appended = SAMPLE_TEXT + '第三章 新增\n正文五\n'
+    path.write_bytes(appended.encode('utf-8'))
+    _, blocks = fingerprint_file(str(path))
+    assert prefix_fingerprint(str(path), blocks, checkpoint['offset']) == prefix
+
+    resumed = ChapterSplitter()
+    resumed.resume(checkpoint)
+    chapters = list(iter_novel_chapters(str(path), 'utf-8', resumed, checkpoint['offset']))
+    assert chapters == split_chapters(appended)[2:]
+    assert resumed.duplicate_chapters[0]['line_number'] == 9
+    assert resumed.chapter_count == 4
+
+
+@pytest.fixture
+def data_root(tmp_path, monkeypatch):
+    """以临时目录作为项目根目录，使用仓库自带的配置文件"""
+    repo_config = novel_process.get_config_path()
+    os.makedirs(tmp_path / 'data' / 'config')
+    os.makedirs(tmp_path / 'data' / 'import')
+    shutil.copy(repo_config, tmp_path / 'data' / 'config' / 'config.json')
+    monkeypatch.setattr(novel_process, 'get_base_path', lambda: str(tmp_path))
+    monkeypatch.setattr(novel_process, '_chapter_matcher', None)
+    return tmp_path
+
+
+def write_novel(root, name, chapters):
+    text = '\n'.join(f'第{i}章 标题{i}\n正文第{i}段。' for i in range(1, chapters + 1))
+    (root / 'data' / 'import' / name).write_text(text, encoding='utf-8')
+
+
+def test_process_novel_in_parallel(data_root, capsys):
+    write_novel(data_root, '甲.txt', 3)
+    write_novel(data_root, '乙.txt', 5)
+    # 无法读取的文件只记为失败，不影响其他小说
+    os.makedirs(data_root / 'data' / 'import' / '坏.txt')
+    assert novel_process.process_novel(workers=2) == 2
+    output = capsys.readouterr().out
+    assert '失败 1 本' in output
+    assert len(list((data_root / 'data' / 'out_text' / '甲').glob('*.txt'))) == 3
+    assert novel_process.load_novel_meta('乙.txt')['chapter_count'] == 5
+
+    # 再次导入时未变化的小说直接跳过
+    result = novel_process.import_novel({'name': '甲.txt', 'path': str(data_root / 'data' / 'import' / '甲.txt')})
+    assert result['status'] == 'unchanged'
+
+
+def test_plan_line_ranges(tmp_path):
+    path = tmp_path / 'novel.txt'
+    data = b''.join(b'line %d\n' % i for i in range(1000))
+    path.write_bytes(data)
+    ranges = novel_process.plan_line_ranges(str(path), 8, 10)
+    assert ranges[0][0] == 10 and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start and data[start - 1:start] == b'\n'
+
+
+def test_parallel_split_matches_serial(data_root, monkeypatch):
+    monkeypatch.setattr(novel_process, 'PARALLEL_SPLIT_MIN_SIZE', 0)
+    lines = ['简介'] + [f'第{i % 40 + 1}章 标题{i}\n正文{i}\n-----\n' for i in range(60)]
+    text = '\n'.join(lines)
+    for name in ('串行.txt', '并行.txt'):
+        (data_root / 'data' / 'import' / name).write_text(text, encoding='utf-8')
+
+    def import_novel(name, workers):
+        novel = {'name': name, 'path': str(data_root / 'data' / 'import' / name)}
+        result = novel_process.import_novel(novel, workers)
+        output_dir = data_root / 'data' / 'out_text' / name[:-4]
+        files = {p.name: p.read_text(encoding='utf-8') for p in output_dir.glob('*.txt')}
+        return result, files, novel_process.load_novel_meta(name)['checkpoint']
+
+    serial, serial_files, serial_checkpoint = import_novel('串行.txt', 1)
+    parallel, parallel_files, parallel_checkpoint = import_novel('并行.txt', 2)
+    assert parallel_files == serial_files
+    assert parallel['duplicates'] == serial['duplicates']
+    assert parallel['chapters'] == serial['chapters'] == 41
+    assert parallel_checkpoint == serial_checkpoint
+
+
+def test_import_redetects_encoding_during_split(data_root):
+    path = data_root / 'data' / 'import' / '编码.txt'
+    chapters = ''.join(f'第{i}章 标题{i}\n这是一段中文正文，用来测试编码检测。\n' for i in range(1, 4))
+    path.write_bytes(b'ascii header line\n' * 6000 + chapters.encode('gb18030'))
+    result = novel_process.import_novel({'name': '编码.txt', 'path': str(path)})
+    assert result['encoding']['encoding'] == 'gb18030'
+    assert result['encoding']['method'] == 'rescan'
+    assert result['decode_errors'] == 0
+    output_dir = data_root / 'data' / 'out_text' / '编码'
+    assert sorted(p.name for p in output_dir.glob('*.txt')) == [
+        '00000.内容简介.txt', '00001.第1章 标题1.txt', '00002.第2章 标题2.txt', '00003.第3章 标题3.txt']
+
+
+def test_import_discards_chapters_written_with_wrong_encoding(data_root, monkeypatch):
+    monkeypatch.setattr(novel_process, 'DECODE_ERROR_LIMIT', 2)
+    path = data_root / 'data' / 'import' / '混合.txt'
+    # 文件头部样本只包含 UTF-8 编码的章节
+    head = ''.join(f'第{i}章 标题{i}\n' + '正文。\n' * 5000 for i in range(1, 3)).encode('utf-8')
+    tail = ''.join(f'第{i}章 标题{i}\n正文{i}\n' for i in range(3, 6)).encode('gb18030')
+    path.write_bytes(head + tail)
+    # 前半部分是 UTF-8，后半部分是 GB18030，没有能解码整个文件的编码
+    with pytest.raises(ValueError):
+        novel_process.import_novel({'name': '混合.txt', 'path': str(path)})
+    # 按 UTF-8 已经写出的章节随之删除，不留下部分导入的结果
+    assert not list((data_root / 'data' / 'out_text' / '混合').glob('*.txt'))
+
+
+def test_unchanged_novel_is_replanned_when_speech_options_change(data_root):
+    write_novel(data_root, '甲.txt', 3)
+    novel = {'name': '甲.txt', 'path': str(data_root / 'data' / 'import' / '甲.txt')}
+    novel_process.import_novel(novel)
+    assert 'speech' not in novel_process.import_novel(novel)
+
+    config_path = data_root / 'data' / 'config' / 'config.json'
+    config = json.loads(config_path.read_text(encoding='utf-8'))
+    config['segment_max_chars'] = 500
+    config_path.write_text(json.dumps(config, ensure_ascii=False), encoding='utf-8')
+    result = novel_process.import_novel(novel)
+    assert result['status'] == 'unchanged'
+    assert result['speech']['planned'] == 3
+    plan = json.loads((data_root / 'data' / 'out_text' / '甲' / 'segments.json').read_text(encoding='utf-8'))
+    assert plan['max_chars'] == 500
+    assert 'speech' not in novel_process.import_novel(novel)
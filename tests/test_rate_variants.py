@@ -0,0 +1,113 @@
+import os
+import sys
+
+import pytest
+
+import rate_variants
+from audio_cache import AudioCache
+from mock_tts_server import SILENT_FRAME
+from rate_variants import collect_chapters, rate_factor, scale_subtitles, tempo_filters
+from subtitles import load_cues, write_subtitles
+from tts_process import SynthesisRecorder, load_synthesis_record
+
+
+@pytest.mark.parametrize('factor, filters', [
+    (1.0, 'atempo=1.000000'),
+    (1.5, 'atempo=1.500000'),
+    (3.0, 'atempo=2.0,atempo=1.500000'),
+    (5.0, 'atempo=2.0,atempo=2.0,atempo=1.250000'),
+    (0.3, 'atempo=0.5,atempo=0.600000'),
+])
+def test_tempo_filters(factor, filters):
+    assert tempo_filters(factor) == filters
+
+
+@pytest.mark.parametrize('rate, source_rate, factor', [
+    ('+20%', '+0%', 1.2),
+    ('+20%', '+10%', 12 / 11),
+    ('-10%', '+20%', 0.75),
+    ('+0%', '+0%', 1.0),
+])
+def test_rate_factor(rate, source_rate, factor):
+    assert rate_factor(rate, source_rate) == pytest.approx(factor)
+
+
+def synthesize_chapter(mp3_dir, name, rate, frames=10):
+    """写入章节音频并按 SynthesisRecorder 的方式记录合成语速"""
+    mp3_dir.mkdir(parents=True, exist_ok=True)
+    (mp3_dir / f'{name}.mp3').write_bytes(SILENT_FRAME * frames)
+    recorder = SynthesisRecorder('zh-CN-YunxiNeural', rate)
+    recorder.record({'name': name, 'mp3_dir': str(mp3_dir)})
+    recorder.save()
+
+
+def test_synthesis_record_merges_with_file(tmp_path):
+    synthesize_chapter(tmp_path, '00001.第1章', '+0%')
+    synthesize_chapter(tmp_path, '00002.第2章', '+10%', frames=5)
+    record = load_synthesis_record(str(tmp_path))
+    assert record['00001.第1章'] == {'voice': 'zh-CN-YunxiNeural', 'rate': '+0%', 'size': 10 * len(SILENT_FRAME)}
+    assert record['00002.第2章']['rate'] == '+10%'
+
+
+def test_collect_chapters_uses_recorded_rate(tmp_path):
+    mp3_root, output_root = tmp_path / 'out_mp3', tmp_path / 'variants'
+    synthesize_chapter(mp3_root / '甲', '00001.第1章', '+0%')
+    synthesize_chapter(mp3_root / '甲', '00002.第2章', '+10%')
+    # 没有记录的章节，以及记录后音频被替换的章节，都无法确定合成语速
+    (mp3_root / '甲' / '00003.第3章.mp3').write_bytes(SILENT_FRAME)
+    synthesize_chapter(mp3_root / '乙', '00001.第1章', '+0%')
+    (mp3_root / '乙' / '00001.第1章.mp3').write_bytes(SILENT_FRAME * 3)
+
+    chapters, skipped = collect_chapters(str(mp3_root), str(output_root), '+20%')
+    assert [(os.path.basename(src), factor) for src, _, factor in chapters] == [
+        ('00001.第1章.mp3', pytest.approx(1.2)), ('00002.第2章.mp3', pytest.approx(12 / 11))]
+    assert skipped == {'up_to_date': 0, 'unknown_rate': 2}
+
+    # 指定 source_rate 时忽略记录
+    chapters, skipped = collect_chapters(str(mp3_root), str(output_root), '+20%', '+10%', novels=['乙'])
+    assert [factor for _, _, factor in chapters] == [pytest.approx(12 / 11)]
+    assert skipped['unknown_rate'] == 0
+
+
+def test_scale_subtitles(tmp_path):
+    src, dst = str(tmp_path / 'a.mp3'), str(tmp_path / 'b.mp3')
+    assert not scale_subtitles(src, dst, 2.0)
+    write_subtitles(src, [(1.0, 3.0, '正文')])
+    assert scale_subtitles(src, dst, 2.0)
+    assert load_cues(str(tmp_path / 'b.srt')) == [(0.5, 1.5, '正文')]
+
+
+@pytest.fixture
+def variant_env(tmp_path, monkeypatch):
+    """临时数据目录，ffmpeg 由把输入原样复制到输出的脚本代替"""
+    ffmpeg = tmp_path / 'ffmpeg'
+    ffmpeg.write_text(f"#!{sys.executable}\nimport shutil, sys\n"
+                      "args = sys.argv[1:]\nshutil.copyfile(args[args.index('-i') + 1], args[-1])\n")
+    ffmpeg.chmod(0o755)
+    monkeypatch.setattr(rate_variants, 'get_ffmpeg_path', lambda: str(ffmpeg))
+    monkeypatch.setattr(rate_variants, 'get_base_path', lambda: str(tmp_path))
+    monkeypatch.setattr(rate_variants, 'open_audio_cache', lambda: AudioCache(str(tmp_path / 'cache')))
+    return tmp_path
+
+
+def test_create_rate_variants(variant_env):
+    mp3_dir = variant_env / 'data' / 'out_mp3' / '甲'
+    synthesize_chapter(mp3_dir, '00001.第1章', '+0%')
+    synthesize_chapter(mp3_dir, '00002.第2章', '+20%')
+    write_subtitles(str(mp3_dir / '00001.第1章.mp3'), [(1.2, 2.4, '正文')])
+
+    counts = rate_variants.create_rate_variants('+20%', workers=1)
+    assert (counts['converted'], counts['failed']) == (2, 0)
+    output_dir = variant_env / 'data' / 'out_mp3_rate' / '+20%' / '甲'
+    assert load_cues(str(output_dir / '00001.第1章.srt')) == [(1.0, 2.0, '正文')]
+    assert rate_variants.load_variant_record(str(output_dir))['00002.第2章']['factor'] == 1.0
+
+    # 再次运行时已是最新；原音频重新合成后重新生成
+    assert rate_variants.create_rate_variants('+20%', workers=1)['up_to_date'] == 2
+    synthesize_chapter(mp3_dir, '00002.第2章', '+10%', frames=12)
+    counts = rate_variants.create_rate_variants('+20%', workers=1)
+    assert (counts['converted'], counts['up_to_date']) == (1, 1)
+    # 覆盖记录的语速时按新的倍数重新生成，相同的音频和倍数使用缓存
+    counts = rate_variants.create_rate_variants('+20%', '+10%', workers=1)
+    assert counts['converted'] + counts['cached'] == 1
+    assert counts['up_to_date'] == 1
@@ -0,0 +1,93 @@
+import pytest
+
+from speech_text import (
+    QUOTE_OVERFLOW_RATIO,
+    SPEECH_CACHE_DIR,
+    SpeechNormalizer,
+    load_segment_plan,
+    plan_segments,
+    update_segment_plans,
+)
+
+
+def assert_segments(text, segments, max_chars):
+    # 分段首尾相接，拼接后与原文一致
+    assert segments[0][0] == 0 and segments[-1][1] == len(text)
+    assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+    assert all(end - start <= max_chars * QUOTE_OVERFLOW_RATIO for start, end in segments)
+
+
+def test_short_text_is_one_segment():
+    assert plan_segments('短句。', 10) == [(0, 3)]
+
+
+def test_breaks_at_sentence_endings():
+    text = '第一句话。第二句话！第三句话？第四句话。'
+    segments = plan_segments(text, 12)
+    assert_segments(text, segments, 12)
+    assert [text[start:end] for start, end in segments] == ['第一句话。第二句话！', '第三句话？第四句话。']
+
+
+def test_does_not_break_inside_quotes():
+    text = '他说：“第一句。第二句。”然后走了。'
+    segments = plan_segments(text, 10)
+    assert_segments(text, segments, 10)
+    assert text[:segments[0][1]].endswith('”')
+
+
+@pytest.mark.parametrize('text', [
+    '没有标点的长文本' * 10,
+    '只有逗号，' * 20,
+    '正常的句子。\n' * 30,
+])
+def test_segments_cover_text(text):
+    segments = plan_segments(text, 16)
+    assert_segments(text, segments, 16)
+
+
+def test_update_segment_plans_only_replans_changed(tmp_path):
+    (tmp_path / '00001.第1章.txt').write_text('第一章。' * 10, encoding='utf-8')
+    (tmp_path / '00002.第2章.txt').write_text('第二章。', encoding='utf-8')
+    hashes = {'00001.第1章': 'a', '00002.第2章': 'b'}
+    assert update_segment_plans(str(tmp_path), hashes, 8)['planned'] == 2
+    assert update_segment_plans(str(tmp_path), hashes, 8)['planned'] == 0
+
+    plan = load_segment_plan(str(tmp_path))
+    assert len(plan['chapters']['00001.第1章']['segments']) == 5
+    del hashes['00002.第2章']
+    update_segment_plans(str(tmp_path), hashes, 8)
+    assert list(load_segment_plan(str(tmp_path))['chapters']) == ['00001.第1章']
+    assert len(list((tmp_path / SPEECH_CACHE_DIR).iterdir())) == 1
+
+
+@pytest.mark.parametrize('text, spoken', [
+    ('过了10年', '过了十年'),
+    ('20年后', '二十年后'),
+    ('98年3月', '九八年三月'),
+    ('2023年', '二零二三年'),
+    ('1000年', '一零零零年'),
+    ('13800138000', '一三八零零一三八零零零'),
+    ('5000000元', '五百万元'),
+    ('12000000人', '一千二百万人'),
+    ('1234567', '一二三四五六七'),
+    ('0123', '零一二三'),
+    ('3.5%', '百分之三点五'),
+    ('100000', '十万'),
+    ('105', '一百零五'),
+    ('1010', '一千零一十'),
+])
+def test_number_reading(text, spoken):
+    assert SpeechNormalizer().normalize_line(text) == spoken
+
+
+def test_normalize_removes_unspeakable_content():
+    normalizer = SpeechNormalizer({'boilerplate': ['天才一秒记住本站地址']})
+    text = '天才一秒记住本站地址\n他笑了！！！！\nhttps://example.com/a\n★★★\n正文'
+    assert normalizer.normalize(text) == '他笑了！\n正文'
+
+
+def test_normalization_report_counts(tmp_path):
+    (tmp_path / '00001.第1章.txt').write_text('第1章\n★正文', encoding='utf-8')
+    speech = update_segment_plans(str(tmp_path), {'00001.第1章': 'a'})
+    # “1” 和 “★” 被删除，新增“一”
+    assert (speech['removed'], speech['added']) == (2, 1)
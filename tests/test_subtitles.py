@@ -0,0 +1,75 @@
+import pytest
+
+from mock_tts_server import FRAME_SECONDS, SILENT_FRAME
+from subtitles import (
+    compose_srt,
+    compose_vtt,
+    concatenate_cues,
+    format_timestamp,
+    group_word_boundaries,
+    load_cues,
+    parse_srt,
+    subtitle_path,
+    write_subtitles,
+)
+
+
+def word(text, start, duration=0.2):
+    return {'text': text, 'offset': int(start * 1e7), 'duration': int(duration * 1e7)}
+
+
+def test_group_at_punctuation_and_keep_inner_text():
+    text = '他说，今天 天气很好。明天下雨'
+    events = [word('他说', 0.0), word('今天', 0.3), word('天气', 0.6), word('很好', 0.9),
+              word('明天', 1.2), word('下雨', 1.5)]
+    assert group_word_boundaries(text, events) == [
+        (0.0, 0.2, '他说'),
+        (0.3, 1.1, '今天 天气很好'),
+        (1.2, 1.7, '明天下雨'),
+    ]
+
+
+def test_group_splits_on_length_and_pause():
+    text = '一二三四五六七八'
+    events = [word('一二', 0.0), word('三四', 0.2), word('五六', 0.4), word('七八', 2.0)]
+    assert [cue[2] for cue in group_word_boundaries(text, events, max_chars=4)] == ['一二三四', '五六', '七八']
+
+
+def test_group_keeps_words_missing_from_text():
+    cues = group_word_boundaries('正文', [word('正文', 0.0), word('额外', 0.3)])
+    assert [cue[2] for cue in cues] == ['正文额外']
+
+
+@pytest.mark.parametrize('seconds, srt, vtt', [
+    (0, '00:00:00,000', '00:00:00.000'),
+    (3661.2345, '01:01:01,234', '01:01:01.234'),
+    (-1, '00:00:00,000', '00:00:00.000'),
+])
+def test_format_timestamp(seconds, srt, vtt):
+    assert format_timestamp(seconds) == srt
+    assert format_timestamp(seconds, '.') == vtt
+
+
+def test_srt_round_trip():
+    cues = [(0.0, 1.5, '第一句'), (1.5, 62.25, '第二句，\n两行')]
+    content = compose_srt(cues)
+    assert content.startswith('1\n00:00:00,000 --> 00:00:01,500\n第一句\n')
+    assert parse_srt(content.replace('\n', '\r\n')) == cues
+    assert compose_vtt(cues).startswith('WEBVTT\n\n00:00:00.000 --> 00:00:01.500\n')
+
+
+def test_concatenate_cues_offsets_by_audio_duration(tmp_path):
+    paths = []
+    for i, frames in enumerate((50, 25, 10)):
+        path = tmp_path / f'{i}.mp3'
+        path.write_bytes(SILENT_FRAME * frames)
+        paths.append(str(path))
+    write_subtitles(paths[0], [(0.0, 1.0, '一')], ('srt', 'vtt'))
+    write_subtitles(paths[2], [(0.1, 0.2, '三')])
+    assert (tmp_path / '0.vtt').exists() and not (tmp_path / '2.vtt').exists()
+
+    cues = concatenate_cues(paths)
+    assert [cue[2] for cue in cues] == ['一', '三']
+    assert cues[1][0] == pytest.approx(0.1 + 75 * FRAME_SECONDS)
+    assert load_cues(subtitle_path(paths[1])) is None
+    assert concatenate_cues(paths[1:2]) is None
@@ -0,0 +1,26 @@
+import asyncio
+
+from tts_benchmark import run_benchmarks, summarize_run
+
+
+def test_summarize_run():
+    events = [
+        {'event': 'finished', 'chars': 100, 'wall': 1.0},
+        {'event': 'finished', 'chars': 300, 'wall': 3.0},
+        {'event': 'failed', 'dead': False},
+        {'event': 'failed', 'dead': True},
+        {'event': 'run_finished', 'wall': 4.0, 'run_ttfa': 0.5},
+    ]
+    result = summarize_run(events, '合成请求 5 次，最终并发上限 6，延迟', 10.0)
+    assert result == {'wall': 4.0, 'chapters': 2, 'chapters_per_sec': 0.5, 'chars_per_sec': 100.0,
+                      'chapter_p95': 3.0, 'run_ttfa': 0.5, 'failures': 2, 'dead': 1, 'final_limit': 6}
+
+
+def test_benchmark_against_mock_service():
+    scenario = {'name': 'fast', 'latency': 0, 'realtime': 0}
+    results = asyncio.run(run_benchmarks([scenario], chapters=3, chapter_chars=200, concurrency=2, timeout=60))
+    result = results['scenarios']['fast']
+    assert (result['exit_code'], result['timed_out']) == (0, False)
+    assert result['chapters'] == 3
+    assert result['suspicious'] == 0
+    assert result['server']['completed'] >= 2
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+import tts_events
+from tts_events import ProgressReporter, describe_progress, format_eta, read_events
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动推进的单调时钟"""
+    now = [100.0]
+    monkeypatch.setattr(tts_events.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def job(novel, name, chars):
+    return {'novel': novel, 'name': name, 'chars': chars, 'attempts': 0}
+
+
+@pytest.mark.parametrize('seconds, text', [(None, '未知'), (0, '0:00:00'), (3725.9, '1:02:05')])
+def test_format_eta(seconds, text):
+    assert format_eta(seconds) == text
+
+
+def test_rate_and_eta(clock):
+    progress = ProgressReporter()
+    jobs = [job('甲', '1', 100), job('甲', '2', 100), job('乙', '1', 300)]
+    progress.queued(jobs)
+    assert progress.eta() is None
+
+    progress.chapter_started(jobs[0])
+    clock[0] += 2
+    progress.chapter_audio(jobs[0])
+    clock[0] += 8
+    progress.chapter_finished(jobs[0], 'converted', 1000)
+    assert progress.first_audio == 2
+    assert progress.rate() == 10.0
+    assert progress.eta('甲') == 10.0
+    assert progress.eta() == 40.0
+
+    # 死信章节不再计入剩余字数
+    progress.chapter_started(jobs[2])
+    progress.chapter_failed(jobs[2], '超时', dead=True)
+    assert progress.remaining_chars() == 100
+    # 跳过的章节计为完成，但不计入合成速度
+    progress.chapter_finished(jobs[1], 'skipped')
+    assert progress.eta() == 0.0
+    assert progress.rate() == 10.0
+
+
+def test_events_file(tmp_path, clock):
+    path = str(tmp_path / 'events' / 'progress.jsonl')
+    progress = ProgressReporter(path)
+    progress.skipped('甲', 3)
+    progress.run_started(worker='test')
+    jobs = [job('甲', '4', 50), job('甲', '5', 50)]
+    progress.queued(jobs)
+    progress.chapter_started(jobs[0])
+    clock[0] += 5
+    progress.chapter_finished(jobs[0], 'converted', 100)
+    jobs[1].update(attempts=1, next_time=time.time() + 30)
+    progress.chapter_failed(jobs[1], '超时', dead=False)
+    progress.close()
+
+    events = read_events(path)
+    assert [event['event'] for event in events] == ['run_started', 'skipped', 'queued', 'queued',
+                                                    'started', 'finished', 'failed']
+    finished = events[5]
+    assert (finished['wall'], finished['chars_per_sec'], finished['eta']) == (5.0, 10.0, 5.0)
+    assert 29 <= events[6]['retry_in'] <= 30
+    assert describe_progress(path).splitlines() == ['甲：1/2 章', '合成速度 10.0 字/秒，预计剩余 0:00:05',
+                                                     '失败 1 次', '正在转换']
+
+    # 只读取最近一次运行的事件，无法解析的行被忽略
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{不完整的行\n')
+    second = ProgressReporter(path)
+    second.run_started(worker='test')
+    second.run_finished(converted=0)
+    second.close()
+    assert [event['event'] for event in read_events(path)] == ['run_started', 'run_finished']
+    assert describe_progress(path).splitlines()[-1] == '转换已结束'
+    assert describe_progress(str(tmp_path / 'missing.jsonl')) == '暂无转换进度'
@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import tts_lease
+from tts_lease import LeaseManager, claim_worker_id
+
+
+@pytest.fixture
+def hostname(monkeypatch):
+    monkeypatch.setattr(tts_lease, 'default_worker_id', lambda: 'host/1')
+    return 'host_1'
+
+
+def test_default_worker_ids_are_unique_per_process(tmp_path, hostname):
+    first, first_lock = claim_worker_id(str(tmp_path))
+    second, second_lock = claim_worker_id(str(tmp_path))
+    assert (first, second) == (hostname, f'{hostname}-2')
+    # 另一个进程同样不能使用已被占用的标识
+    code = "import sys; from tts_lease import WorkerLock; sys.exit(0 if WorkerLock(sys.argv[1]).acquire() else 1)"
+    result = subprocess.run([sys.executable, '-c', code, str(tmp_path / hostname)],
+                            cwd=os.path.dirname(tts_lease.__file__))
+    assert result.returncode == 1
+
+    first_lock.release()
+    assert claim_worker_id(str(tmp_path))[0] == hostname
+    second_lock.release()
+
+
+def test_explicit_worker_id_in_use_raises(tmp_path):
+    worker_id, lock = claim_worker_id(str(tmp_path), 'gpu-box')
+    assert worker_id == 'gpu-box'
+    with pytest.raises(RuntimeError):
+        claim_worker_id(str(tmp_path), 'gpu-box')
+    lock.release()
+
+
+def test_lease_is_exclusive_until_released(tmp_path):
+    a = LeaseManager(str(tmp_path), 'a')
+    b = LeaseManager(str(tmp_path), 'b')
+    assert a.acquire('甲/第1章')
+    assert not b.acquire('甲/第1章')
+    a.release('甲/第1章')
+    assert b.acquire('甲/第1章')
+    # 不释放其他持有者的租约
+    a.held['甲/第1章'] = b.held['甲/第1章']
+    a.release('甲/第1章')
+    assert not a.acquire('甲/第1章')
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    a = LeaseManager(str(tmp_path), 'a', ttl=-1)
+    b = LeaseManager(str(tmp_path), 'b')
+    assert a.acquire('甲/第1章')
+    assert b.acquire('甲/第1章')
+    # 续约时发现租约已被回收
+    a.renew()
+    assert not a.held
+    b.release_all()
+    assert not list(tmp_path.iterdir())
+
+
+def test_unreadable_lease_is_reclaimed_after_ttl(tmp_path):
+    a = LeaseManager(str(tmp_path), 'a', ttl=60)
+    # 持有者创建租约文件后、写入前退出，留下空文件
+    path = a._path('甲/第1章')
+    open(path, 'wb').close()
+    assert not a.acquire('甲/第1章')
+    old = os.path.getmtime(path) - 120
+    os.utime(path, (old, old))
+    assert a.acquire('甲/第1章')
+    assert a._read(path)['owner'] == a.owner
+    assert [p.name for p in tmp_path.iterdir()] == [os.path.basename(path)]
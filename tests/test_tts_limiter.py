@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from tts_limiter import AdaptiveLimiter, is_overload_error, percentile
+
+
+class Overloaded(Exception):
+    status = 429
+
+
+async def run_requests(limiter, count, error=None):
+    for _ in range(count):
+        try:
+            async with limiter.request():
+                if error is not None:
+                    raise error
+        except Exception as e:
+            assert e is error
+
+
+def test_is_overload_error():
+    assert is_overload_error(asyncio.TimeoutError())
+    assert is_overload_error(ConnectionResetError())
+    assert is_overload_error(Overloaded())
+    assert not is_overload_error(ValueError())
+
+
+def test_percentile():
+    assert percentile([], 0.5) is None
+    assert percentile([3, 1, 2], 0.5) == 2
+    assert percentile(range(100), 0.95) == 95
+
+
+def test_increases_after_a_window_of_successes():
+    limiter = AdaptiveLimiter(2, 1, 3)
+    asyncio.run(run_requests(limiter, 2))
+    assert limiter.limit == 3
+    asyncio.run(run_requests(limiter, 10))
+    assert limiter.limit == 3
+
+
+def test_halves_once_per_overload_wave():
+    limiter = AdaptiveLimiter(8, 1, 16)
+    asyncio.run(run_requests(limiter, 3, Overloaded()))
+    assert limiter.limit == 4
+    assert limiter.stats()['overloads'] == 3
+    # 其他错误不减小并发，但计入错误率
+    asyncio.run(run_requests(limiter, 1, ValueError()))
+    assert limiter.limit == 4
+    assert limiter.error_rate() == 1.0
+
+
+def test_unhealthy_error_rate_blocks_increase():
+    limiter = AdaptiveLimiter(1, 1, 4)
+    asyncio.run(run_requests(limiter, 1, ValueError()))
+    asyncio.run(run_requests(limiter, 5))
+    assert limiter.limit == 1
+
+
+@pytest.mark.parametrize('initial, minimum, maximum, limit', [(10, 1, 4, 4), (0, 2, 4, 2), (3, 5, 1, 5)])
+def test_limit_is_clamped(initial, minimum, maximum, limit):
+    assert AdaptiveLimiter(initial, minimum, maximum).limit == limit
+
+
+def test_request_waits_for_a_slot():
+    limiter = AdaptiveLimiter(2, 2, 2)
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        async with limiter.request():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(request() for _ in range(6)))
+    asyncio.run(main())
+    assert peak == 2
@@ -0,0 +1,426 @@
+import asyncio
+import os
+import sys
+
+import edge_tts
+import pytest
+
+import tts_process
+from audio_cache import AudioCache
+from audio_check import AudioChecker
+from chapter_store import content_hash
+from mock_tts_server import FRAME_SECONDS, SILENT_FRAME, MockTTSServer, word_boundaries
+from mp3_frames import scan_mp3
+from speech_text import SpeechNormalizer, load_segment_plan, update_segment_plans
+from subtitles import load_cues
+from tts_lease import LeaseManager
+from tts_limiter import AdaptiveLimiter
+from tts_queue import TTSJobQueue, schedule_jobs
+
+
+class FakeClient:
+    """记录同时进行的请求数的合成后端，每个请求写出固定内容的音频"""
+
+    cache_voice = 'fake-voice'
+    rate = '+0%'
+
+    def __init__(self, delay=0.01, fail=None):
+        self.delay = delay
+        self.fail = fail or (lambda text: False)
+        self.texts = []
+        self.active = 0
+        self.peak = 0
+
+    async def synthesize(self, text, output_path, boundaries=None):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail(text):
+                raise ConnectionResetError("连接被重置")
+            self.texts.append(text)
+            self.write(text, output_path, boundaries)
+        finally:
+            self.active -= 1
+
+    def write(self, text, output_path, boundaries):
+        with open(output_path, 'wb') as f:
+            f.write(text.encode('utf-8'))
+
+
+class AudioClient(FakeClient):
+    """按模拟服务的语速返回静音 MP3 帧和逐词时间"""
+
+    def write(self, text, output_path, boundaries):
+        events, seconds = word_boundaries(text)
+        with open(output_path, 'wb') as f:
+            f.write(SILENT_FRAME * max(1, int(seconds / FRAME_SECONDS + 0.5)))
+        if boundaries is not None:
+            boundaries.extend({'type': 'WordBoundary', 'offset': event['Data']['Offset'],
+                               'duration': event['Data']['Duration'], 'text': event['Data']['text']['Text']}
+                              for event in events)
+
+
+def write_novel(text_dir, novel, chapters):
+    novel_dir = text_dir / novel
+    novel_dir.mkdir(parents=True)
+    for i, content in enumerate(chapters, 1):
+        (novel_dir / f'{i:05d}.第{i}章.txt').write_text(content, encoding='utf-8')
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    (tmp_path / 'out_text').mkdir()
+    (tmp_path / 'out_mp3').mkdir()
+    return tmp_path
+
+
+def run_queue(data_dir, client, limiter, policy='round_robin', warmup=0, **options):
+    jobs = tts_process.collect_pending_chapters(str(data_dir / 'out_text'), str(data_dir / 'out_mp3'))
+    queue = TTSJobQueue(str(data_dir / 'queue.json'), max_attempts=2, base_delay=0.01, max_delay=0.01)
+    queue.sync(schedule_jobs(jobs, policy, warmup))
+    leases = LeaseManager(str(data_dir / 'leases'), 'test')
+    converted = asyncio.run(tts_process.convert_chapters(queue, client, limiter, SpeechNormalizer(),
+                                                         leases=leases, **options))
+    return converted, queue
+
+
+def test_convert_chapters_concurrently(data_dir):
+    write_novel(data_dir / 'out_text', '甲', [f'第{i}章的正文。' for i in range(1, 9)])
+    client = FakeClient()
+    converted, queue = run_queue(data_dir, client, AdaptiveLimiter(3, 3, 3))
+    assert converted == 8
+    assert not queue.jobs and not queue.dead
+    assert 1 < client.peak <= 3
+    mp3_dir = data_dir / 'out_mp3' / '甲'
+    assert sorted(p.name for p in mp3_dir.glob('*.mp3')) == [f'{i:05d}.第{i}章.mp3' for i in range(1, 9)]
+
+    # 再次运行时已转换的章节被跳过
+    assert tts_process.collect_pending_chapters(str(data_dir / 'out_text'), str(data_dir / 'out_mp3')) == []
+
+
+def test_failed_chapters_are_retried_then_dead_lettered(data_dir):
+    write_novel(data_dir / 'out_text', '甲', ['正文一。', '偶尔失败。', '总是失败。'])
+    failures = {'偶尔失败。': 1, '总是失败。': 99}
+
+    def fail(text):
+        if failures.get(text, 0) > 0:
+            failures[text] -= 1
+            return True
+        return False
+
+    converted, queue = run_queue(data_dir, FakeClient(fail=fail), AdaptiveLimiter(2, 2, 2))
+    assert converted == 2
+    assert list(queue.dead) == ['甲/00003.第3章']
+    assert queue.dead['甲/00003.第3章']['attempts'] == 2
+
+
+def test_cached_audio_is_reused(data_dir):
+    write_novel(data_dir / 'out_text', '甲', ['相同的正文。', '另一章。'])
+    write_novel(data_dir / 'out_text', '乙', ['相同的正文。'])
+    cache = AudioCache(str(data_dir / 'cache'))
+    client = FakeClient()
+    run_queue(data_dir, client, AdaptiveLimiter(1, 1, 1), cache=cache)
+    assert sorted(client.texts) == ['另一章。', '相同的正文。']
+    assert cache.hits == 1
+    assert (data_dir / 'out_mp3' / '乙' / '00001.第1章.mp3').read_bytes() == '相同的正文。'.encode('utf-8')
+
+
+def test_synthesize_segments_resumes_missing_segments(tmp_path):
+    text = '第一段。第二段。第三段。'
+    segments = [(0, 4), (4, 8), (8, 12)]
+    segment_dir = str(tmp_path / 'segments')
+    failing = FakeClient(fail=lambda piece: piece == '第二段。')
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(tts_process.synthesize_segments(text, segments, segment_dir, failing, AdaptiveLimiter(3, 3, 3)))
+    # 失败的分段不留下 .part 文件，成功的分段保留
+    assert sorted(failing.texts) == ['第一段。', '第三段。']
+    assert len(os.listdir(segment_dir)) == 2
+
+    (tmp_path / 'segments' / '00009-stale.mp3').write_bytes(b'old')
+    client = FakeClient()
+    paths = asyncio.run(tts_process.synthesize_segments(text, segments, segment_dir, client, AdaptiveLimiter()))
+    assert client.texts == ['第二段。']
+    assert sorted(os.listdir(segment_dir)) == sorted(os.path.basename(path) for path in paths)
+
+    output = str(tmp_path / 'chapter.mp3')
+    tts_process.concatenate_segments(paths, output)
+    assert open(output, encoding='utf-8').read() == text
+
+
+def fake_convert_chapter(limiter, log, delay=0.01):
+    """代替 convert_chapter：依次发出两个请求，记录同时转换的章节数和完成顺序"""
+    state = {'active': 0, 'peak': 0}
+
+    async def convert_chapter(job, *args, **kwargs):
+        state['active'] += 1
+        state['peak'] = max(state['peak'], state['active'])
+        try:
+            for _ in range(2):
+                async with limiter.request():
+                    await asyncio.sleep(delay)
+        finally:
+            state['active'] -= 1
+        log.append(job)
+        return 'skipped'
+    return convert_chapter, state
+
+
+def test_chapters_in_flight_are_capped_at_the_limit(data_dir, monkeypatch):
+    write_novel(data_dir / 'out_text', '甲', [f'正文{i}。' for i in range(12)])
+    # 延迟超过目标，并发上限保持为 2，而工作协程按最大值 8 准备
+    limiter = AdaptiveLimiter(2, 2, 8, latency_target=0.001)
+    finished = []
+    convert_chapter, state = fake_convert_chapter(limiter, finished)
+    monkeypatch.setattr(tts_process, 'convert_chapter', convert_chapter)
+    run_queue(data_dir, FakeClient(), limiter)
+    assert len(finished) == 12
+    assert state['peak'] == 2
+    # 章节基本按队列顺序完成
+    assert [job['index'] for job in finished[:2]] in ([0, 1], [1, 0])
+
+
+@pytest.fixture
+def mock_service(monkeypatch):
+    """本地模拟的 Edge TTS 服务，测试结束后恢复 edge_tts 的服务地址"""
+    monkeypatch.setattr(edge_tts.communicate, 'WSS_URL', edge_tts.communicate.WSS_URL)
+    server = MockTTSServer(latency=0, realtime=0)
+
+    async def start():
+        monkeypatch.setenv(tts_process.EDGE_TTS_URL_ENV, await server.start())
+        return server
+    return start
+
+
+def test_edge_backend_shares_one_connector(mock_service, tmp_path):
+    async def main():
+        server = await mock_service()
+        backend = tts_process.EdgeTTSBackend('zh-CN-YunxiNeural', '+0%')
+        try:
+            await backend.start()
+            connector = backend.connector
+            for i in range(3):
+                boundaries = []
+                await backend.synthesize(f'第{i}段正文。', str(tmp_path / f'{i}.mp3'), boundaries)
+                assert boundaries and boundaries[0]['type'] == 'WordBoundary'
+                # edge_tts 每次请求后关闭会话，共用的连接器不随之关闭
+                assert backend.connector is connector and not connector.closed
+        finally:
+            await backend.close()
+            await server.stop()
+        assert connector.closed
+        # 预热请求加 3 个合成请求
+        assert server.counts['completed'] == 4
+        assert backend.requests == 3
+
+    asyncio.run(main())
+    assert all((tmp_path / f'{i}.mp3').stat().st_size > 0 for i in range(3))
+
+
+def test_warmup_chapters_finish_first(data_dir, monkeypatch):
+    for novel in ('甲', '乙', '丙'):
+        write_novel(data_dir / 'out_text', novel, [f'{novel}正文{i}。' for i in range(4)])
+    limiter = AdaptiveLimiter(3, 3, 3)
+    finished = []
+    convert_chapter, _ = fake_convert_chapter(limiter, finished)
+    monkeypatch.setattr(tts_process, 'convert_chapter', convert_chapter)
+    run_queue(data_dir, FakeClient(), limiter, policy='sequential', warmup=1)
+    indexes = [job['index'] for job in finished]
+    assert len(indexes) == 12
+    # 每本小说的第一章都先于任何小说的后续章节完成
+    assert sorted(indexes[:3]) == [0, 0, 0]
+
+
+@pytest.mark.parametrize('rate, value', [('+10%', 10), ('-25%', -25), ('+0%', 0), ('快', 0)])
+def test_parse_rate(rate, value):
+    assert tts_process.parse_rate(rate) == value
+
+
+def test_create_backend():
+    assert isinstance(tts_process.create_backend('edge', 'voice', '+0%'), tts_process.EdgeTTSBackend)
+    with pytest.raises(ValueError):
+        tts_process.create_backend('unknown', 'voice', '+0%')
+
+
+def test_local_command_backend(tmp_path):
+    # 用 Python 脚本代替合成引擎：把输入文本原样写入输出文件，文本为“失败”时退出码为 1
+    script = tmp_path / 'engine.py'
+    script.write_text(
+        "import sys\n"
+        "text = open(sys.argv[1], encoding='utf-8').read()\n"
+        "if text == '失败':\n"
+        "    sys.exit('engine error')\n"
+        "open(sys.argv[2], 'w', encoding='utf-8').write(sys.argv[3] + ':' + text)\n",
+        encoding='utf-8')
+    options = {'command': [sys.executable, str(script), '{input}', '{output}', '{voice}/{speed}'],
+               'output_format': 'mp3', 'base_speed': 200, 'workers': 2}
+    backend = tts_process.LocalCommandBackend('cmn', '+10%', options)
+    assert backend.capabilities['max_concurrency'] == 2
+    assert backend.cache_voice == 'local:cmn'
+
+    async def main():
+        await backend.start()
+        await backend.synthesize('正文', str(tmp_path / 'a.mp3'))
+        with pytest.raises(RuntimeError, match='engine error'):
+            await backend.synthesize('失败', str(tmp_path / 'b.mp3'))
+    asyncio.run(main())
+    assert (tmp_path / 'a.mp3').read_text(encoding='utf-8') == 'cmn/220:正文'
+    # 输入文本文件已删除
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['a.mp3', 'engine.py']
+    assert backend.requests == 2
+
+
+# ffmpeg 的 MP3 输出默认带有 ID3 标签和只记录本文件帧数的 Info 信息帧
+INFO_FRAME = SILENT_FRAME[:4] + bytes(32) + b'Info' + bytes(len(SILENT_FRAME) - 40)
+ID3_TAG = b'ID3\x04\x00\x00\x00\x00\x00\x0a' + bytes(10)
+
+
+@pytest.mark.parametrize('output_format', ['wav', 'mp3'])
+def test_local_segments_concatenate_to_full_duration(tmp_path, monkeypatch, output_format):
+    # 合成引擎每个字输出一个字节，“ffmpeg”把每个字节转为一帧，没有关闭时与 ffmpeg 一样写出标签和信息帧
+    engine = tmp_path / 'engine.py'
+    engine.write_text(
+        "import sys\n"
+        "text = open(sys.argv[1], encoding='utf-8').read()\n"
+        f"frame, info, tag = {SILENT_FRAME!r}, {INFO_FRAME!r}, {ID3_TAG!r}\n"
+        f"data = tag + info + frame * len(text) if {output_format == 'mp3'} else b'x' * len(text)\n"
+        "open(sys.argv[2], 'wb').write(data)\n",
+        encoding='utf-8')
+    ffmpeg = tmp_path / 'ffmpeg'
+    ffmpeg.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        "args = sys.argv[1:]\n"
+        "count = len(open(args[args.index('-i') + 1], 'rb').read())\n"
+        f"frame, info, tag = {SILENT_FRAME!r}, {INFO_FRAME!r}, {ID3_TAG!r}\n"
+        "xing = args[args.index('-write_xing') + 1] != '0' if '-write_xing' in args else True\n"
+        "id3 = args[args.index('-id3v2_version') + 1] != '0' if '-id3v2_version' in args else True\n"
+        "open(args[-1], 'wb').write((tag if id3 else b'') + (info if xing else b'') + frame * count)\n")
+    ffmpeg.chmod(0o755)
+    monkeypatch.setattr(tts_process, 'get_ffmpeg_path', lambda: str(ffmpeg))
+    options = {'command': [sys.executable, str(engine), '{input}', '{output}'],
+               'output_format': output_format, 'workers': 2}
+    backend = tts_process.LocalCommandBackend('cmn', '+0%', options)
+    segments = [str(tmp_path / 'a.mp3'), str(tmp_path / 'b.mp3')]
+
+    async def main():
+        await backend.start()
+        await backend.synthesize('第一段', segments[0])
+        await backend.synthesize('第二段文字', segments[1])
+    asyncio.run(main())
+    output = tmp_path / 'chapter.mp3'
+    tts_process.concatenate_segments(segments, str(output))
+    data = output.read_bytes()
+    # 拼接结果只有音频帧：开头没有信息帧，中间没有标签
+    assert data == SILENT_FRAME * 8
+    assert scan_mp3(data)['duration'] == pytest.approx(8 * FRAME_SECONDS)
+
+
+def test_pending_chapters_follow_chapter_numbers(data_dir):
+    novel_dir = data_dir / 'out_text' / '甲'
+    novel_dir.mkdir(parents=True)
+    names = ['00002.第2章', '99999.第99999章', '100000.第100000章', '100001.第100001章']
+    for name in names:
+        (novel_dir / f'{name}.txt').write_text('正文', encoding='utf-8')
+    jobs = tts_process.collect_pending_chapters(str(data_dir / 'out_text'), str(data_dir / 'out_mp3'))
+    assert [(job['index'], job['name']) for job in jobs] == list(enumerate(names))
+
+
+def test_chapter_subtitles_follow_segments(data_dir):
+    # 第 1 章分为两段，第二段的字幕按第一段的音频时长偏移
+    write_novel(data_dir / 'out_text', '甲', ['第一句话很长。第二句话。'])
+    novel_dir = str(data_dir / 'out_text' / '甲')
+    update_segment_plans(novel_dir, {'00001.第1章': content_hash('第一句话很长。第二句话。')}, 8)
+    assert len(load_segment_plan(novel_dir)['chapters']['00001.第1章']['segments']) == 2
+    subtitles = {'enabled': True, 'formats': ['srt', 'vtt'], 'max_chars': 20}
+    run_queue(data_dir, AudioClient(), AdaptiveLimiter(2, 2, 2), subtitles=subtitles)
+    mp3_path = data_dir / 'out_mp3' / '甲' / '00001.第1章.mp3'
+    cues = load_cues(str(mp3_path.with_suffix('.srt')))
+    assert [cue[2] for cue in cues] == ['第一句话很长', '第二句话']
+    assert cues[1][0] == pytest.approx(7 / 5, abs=FRAME_SECONDS)
+    assert mp3_path.with_suffix('.vtt').exists()
+
+
+def test_truncated_audio_is_quarantined_and_resynthesized(data_dir):
+    write_novel(data_dir / 'out_text', '甲', ['完整的章节。', '被截断的章节。'])
+    mp3_dir = data_dir / 'out_mp3' / '甲'
+    mp3_dir.mkdir()
+    (mp3_dir / '00001.第1章.mp3').write_bytes(SILENT_FRAME * 10)
+    (mp3_dir / '00002.第2章.mp3').write_bytes(SILENT_FRAME * 10 + SILENT_FRAME[:30])
+    # 默认只报告，不移动已有的音频
+    checker = AudioChecker(str(data_dir / 'scan.json'))
+    assert tts_process.collect_pending_chapters(str(data_dir / 'out_text'), str(data_dir / 'out_mp3'),
+                                                checker=checker) == []
+    assert sorted(p.name for p in mp3_dir.iterdir()) == ['00001.第1章.mp3', '00002.第2章.mp3']
+
+    checker = AudioChecker(str(data_dir / 'scan.json'), move_suspicious=True)
+    jobs = tts_process.collect_pending_chapters(str(data_dir / 'out_text'), str(data_dir / 'out_mp3'),
+                                                checker=checker)
+    assert [job['name'] for job in jobs] == ['00002.第2章']
+    assert len(list((mp3_dir / 'quarantine').glob('*.mp3'))) == 1
+
+    client = AudioClient()
+    run_queue(data_dir, client, AdaptiveLimiter(1, 1, 1), checker=checker)
+    assert client.texts == ['被截断的章节。']
+    assert checker.check(str(mp3_dir / '00002.第2章.mp3')) is None
+
+
+def test_split_boundaries():
+    text = '甲章正文\n\n乙章\n\n丙章正文'
+    ranges = [(0, 4), (6, 8), (10, 14)]
+    events = [{'text': word} for word in ('甲章', '正文', '乙章', '丙章', '正文')]
+    groups = tts_process.split_boundaries(text, ranges, events)
+    assert [[event['text'] for event in group] for group in groups] == [['甲章', '正文'], ['乙章'], ['丙章', '正文']]
+
+
+def test_short_chapters_are_batched(data_dir):
+    chapters = ['短章一。', '短章二，也很短。', '这一章比较长。' * 20, '短章四。']
+    write_novel(data_dir / 'out_text', '甲', chapters)
+    novel_dir = str(data_dir / 'out_text' / '甲')
+    update_segment_plans(novel_dir, {f'{i:05d}.第{i}章': content_hash(text) for i, text in enumerate(chapters, 1)})
+    client = AudioClient()
+    subtitles = {'enabled': True, 'formats': ['srt'], 'max_chars': 20}
+    batch = {'max_chars': 100, 'chapter_max_chars': 20}
+    converted, _ = run_queue(data_dir, client, AdaptiveLimiter(1, 1, 1), subtitles=subtitles, batch=batch)
+    assert converted == 4
+    # 前两章合并为一个请求，长章节和其后的短章节各自转换
+    assert client.texts[0] == '短章一。\n\n短章二，也很短。'
+    assert len(client.texts) == 3
+
+    # 在第一章最后一个词结束（0.6 秒）和第二章第一个词开始（1.2 秒）的中点处切分
+    mp3_dir = data_dir / 'out_mp3' / '甲'
+    first = scan_mp3((mp3_dir / '00001.第1章.mp3').read_bytes())
+    second = scan_mp3((mp3_dir / '00002.第2章.mp3').read_bytes())
+    assert first['duration'] == pytest.approx(0.9, abs=FRAME_SECONDS)
+    assert first['duration'] + second['duration'] == pytest.approx(len(client.texts[0]) / 5, abs=FRAME_SECONDS)
+    # 字幕时间相对于本章音频开头
+    assert load_cues(str(mp3_dir / '00001.第1章.srt')) == [(0.0, 0.6, '短章一')]
+    cues = load_cues(str(mp3_dir / '00002.第2章.srt'))
+    assert [cue[2] for cue in cues] == ['短章二', '也很短']
+    assert cues[0][0] == pytest.approx(1.2 - first['duration'], abs=0.002)
+
+
+def test_failed_batch_falls_back_to_single_chapters(data_dir):
+    write_novel(data_dir / 'out_text', '甲', ['短章一。', '短章二。'])
+    novel_dir = str(data_dir / 'out_text' / '甲')
+    update_segment_plans(novel_dir, {'00001.第1章': content_hash('短章一。'), '00002.第2章': content_hash('短章二。')})
+    client = AudioClient(fail=lambda text: '\n' in text)
+    converted, _ = run_queue(data_dir, client, AdaptiveLimiter(1, 1, 1),
+                             batch={'max_chars': 100, 'chapter_max_chars': 20})
+    assert converted == 2
+    assert sorted(client.texts) == ['短章一。', '短章二。']
+
+
+def test_batching_is_opt_in(monkeypatch):
+    monkeypatch.setattr(tts_process, 'load_config', lambda: {})
+    assert tts_process.get_batch_options() is None
+    monkeypatch.setattr(tts_process, 'load_config', lambda: {'tts_batch': {'enabled': True, 'max_chars': 800}})
+    assert tts_process.get_batch_options() == {
+        'max_chars': 800, 'chapter_max_chars': tts_process.DEFAULT_BATCH_CHAPTER_CHARS}
+
+
+def test_audio_check_reports_only_by_default(monkeypatch):
+    monkeypatch.setattr(tts_process, 'load_config', lambda: {})
+    assert tts_process.open_audio_checker().move_suspicious is False
+    monkeypatch.setattr(tts_process, 'load_config', lambda: {'audio_check': {'quarantine': True}})
+    assert tts_process.open_audio_checker().move_suspicious is True
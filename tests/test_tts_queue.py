@@ -0,0 +1,122 @@
+import time
+
+import pytest
+
+from tts_queue import (
+    SCHEDULE_ROUND_ROBIN,
+    SCHEDULE_SEQUENTIAL,
+    TTSJobQueue,
+    job_key,
+    schedule_jobs,
+)
+
+
+def make_jobs(*names, novel='甲'):
+    return [{'novel': novel, 'name': name, 'index': i, 'hash': name, 'chars': 10} for i, name in enumerate(names)]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return TTSJobQueue(str(tmp_path / 'queue.json'), max_attempts=3, base_delay=10, max_delay=25)
+
+
+def test_fail_backs_off_then_dead_letters(queue, monkeypatch):
+    queue.sync(make_jobs('a'))
+    job = queue.next_ready()
+    monkeypatch.setattr(time, 'time', lambda: 1000.0)
+
+    assert not queue.fail(job, '超时')
+    assert 1005 <= job['next_time'] <= 1010
+    assert queue.next_ready() is None
+    assert queue.wait_time() == pytest.approx(job['next_time'] - 1000)
+
+    assert not queue.fail(job, '超时')
+    assert 1010 <= job['next_time'] <= 1020
+    assert job['attempts'] == 2
+
+    assert queue.fail(job, '最后一次')
+    assert not queue.jobs
+    assert queue.dead[job_key('甲', 'a')]['last_error'] == '最后一次'
+
+
+def test_backoff_is_capped(tmp_path, monkeypatch):
+    queue = TTSJobQueue(str(tmp_path / 'queue.json'), max_attempts=10, base_delay=10, max_delay=25)
+    queue.sync(make_jobs('a'))
+    job = queue.next_ready()
+    monkeypatch.setattr(time, 'time', lambda: 1000.0)
+    for _ in range(5):
+        queue.fail(job, '超时')
+    assert 1012.5 <= job['next_time'] <= 1025
+
+
+def test_delayed_job_becomes_ready(queue):
+    queue.sync(make_jobs('a'))
+    job = queue.next_ready()
+    queue.defer(job, 0.0)
+    assert queue.next_ready() is job
+
+
+def test_sync_keeps_attempts_and_dead_letters(queue, tmp_path):
+    queue.sync(make_jobs('a', 'b', 'c'))
+    a = queue.next_ready()
+    queue.fail(a, '超时')
+    b = queue.next_ready()
+    for _ in range(3):
+        queue.fail(b, '超时')
+    queue.save()
+
+    reloaded = TTSJobQueue(queue.path, max_attempts=3)
+    assert reloaded.sync(make_jobs('a', 'b', 'd')) == 1
+    assert reloaded.jobs[job_key('甲', 'a')]['attempts'] == 1
+    assert job_key('甲', 'b') in reloaded.dead
+    # 已不在待转换列表中的任务被删除
+    assert job_key('甲', 'c') not in reloaded.jobs
+
+    # 内容变化的死信任务重新开始
+    changed = make_jobs('a', 'b', 'd')
+    changed[1]['hash'] = 'new'
+    reloaded.sync(changed)
+    assert reloaded.jobs[job_key('甲', 'b')]['attempts'] == 0
+    assert not reloaded.dead
+
+
+def test_retry_dead(queue):
+    queue.sync(make_jobs('a'))
+    job = queue.next_ready()
+    for _ in range(3):
+        queue.fail(job, '超时')
+    assert queue.retry_dead() == 1
+    assert queue.next_ready()['attempts'] == 0
+
+
+def test_claim_takes_specific_ready_job(queue):
+    queue.sync(make_jobs('a', 'b'))
+    assert queue.claim(job_key('甲', 'b'))['name'] == 'b'
+    assert queue.claim(job_key('甲', 'b')) is None
+    assert queue.next_ready()['name'] == 'a'
+    assert queue.next_ready() is None
+
+
+def names(jobs):
+    return [f"{job['novel']}{job['index']}" for job in jobs]
+
+
+def test_schedule_round_robin_and_sequential():
+    jobs = make_jobs('a', 'b', 'c', novel='甲') + make_jobs('a', 'b', novel='乙')
+    assert names(schedule_jobs(jobs, SCHEDULE_ROUND_ROBIN)) == ['甲0', '乙0', '甲1', '乙1', '甲2']
+    assert names(schedule_jobs(jobs, SCHEDULE_SEQUENTIAL)) == ['甲0', '甲1', '甲2', '乙0', '乙1']
+
+
+def test_schedule_warmup_renders_opening_chapters_first():
+    jobs = make_jobs('a', 'b', 'c', novel='甲') + make_jobs('a', 'b', 'c', novel='乙')
+    assert names(schedule_jobs(jobs, SCHEDULE_SEQUENTIAL, warmup=2)) == ['甲0', '乙0', '甲1', '乙1', '甲2', '乙2']
+    # 只剩部分章节待转换时，按章节在小说中的序号判断是否属于开头几章
+    assert names(schedule_jobs(jobs[1:], SCHEDULE_SEQUENTIAL, warmup=1)) == ['乙0', '甲1', '甲2', '乙1', '乙2']
+
+
+def test_schedule_weights():
+    jobs = make_jobs('a', 'b', 'c', 'd', novel='甲') + make_jobs('a', 'b', novel='乙')
+    ordered = schedule_jobs(jobs, SCHEDULE_ROUND_ROBIN, weights={'乙': 2})
+    assert names(ordered) == ['乙0', '乙1', '甲0', '甲1', '甲2', '甲3']
+    ordered = schedule_jobs(jobs, SCHEDULE_ROUND_ROBIN, weights={'甲': 2})
+    assert names(ordered) == ['甲0', '甲1', '乙0', '甲2', '甲3', '乙1']
@@ -0,0 +1,190 @@
+import os
+import re
+import sys
+import glob
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from typing import List, Dict, Optional
+
+from audio_check import AudioChecker, check_library
+from benchmark import BENCHMARK_DIR, generate_novel, load_results, save_results, write_novel
+from mock_tts_server import MockTTSServer
+from tts_events import read_events
+from tts_limiter import percentile
+from tts_process import EDGE_TTS_URL_ENV
+
+TTS_RESULTS_PATH = os.path.join(BENCHMARK_DIR, "tts_results.json")
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+NOVEL_NAME = "基准测试"
+VOICE = "zh-CN-YunxiNeural"
+
+# 默认的压测场景，其余参数使用 MockTTSServer 的默认值；未指定 seed 时固定为 0，注入的故障可重现
+DEFAULT_SCENARIOS = [
+    {'name': 'baseline'},
+    {'name': 'slow', 'latency': 0.5, 'realtime': 20.0},
+    {'name': 'errors', 'error_rate': 0.1, 'drop_rate': 0.05},
+    {'name': 'throttled', 'max_connections': 4}
+]
+SERVER_OPTIONS = ('latency', 'realtime', 'error_rate', 'drop_rate', 'max_connections', 'seed')
+
+def prepare_workspace(work_dir: str, chapters: int, chapter_chars: int, seed: int = 0) -> str:
+    """复制程序文件和配置到独立目录并导入一本合成小说，返回该目录
+
+    所有场景从这份目录复制，互不影响，也不会读写项目自己的 data 目录。
+    """
+    template = os.path.join(work_dir, "template")
+    os.makedirs(os.path.join(template, "data", "config"))
+    os.makedirs(os.path.join(template, "data", "import"))
+    for path in glob.glob(os.path.join(SOURCE_DIR, "*.py")):
+        shutil.copy2(path, template)
+    shutil.copy2(os.path.join(SOURCE_DIR, "data", "config", "config.json"),
+                 os.path.join(template, "data", "config"))
+    text = generate_novel(chapters=chapters, chapter_chars=chapter_chars, seed=seed)
+    write_novel(os.path.join(template, "data", "import", f"{NOVEL_NAME}.txt"), text)
+    subprocess.run([sys.executable, "-c", "from novel_process import process_novel; process_novel()"],
+                   cwd=template, check=True, stdout=subprocess.DEVNULL)
+    return template
+
+def summarize_run(events: List[Dict], log: str, wall: float) -> Dict:
+    """按进度事件和输出日志汇总一次转换"""
+    finished = [event for event in events if event['event'] == 'finished']
+    failed = [event for event in events if event['event'] == 'failed']
+    run_finished = next((event for event in events if event['event'] == 'run_finished'), {})
+    walls = [event['wall'] for event in finished if event.get('wall') is not None]
+    limit = re.search(r'最终并发上限 (\d+)', log)
+    wall = run_finished.get('wall') or wall
+    chars = sum(event.get('chars', 0) for event in finished)
+    return {
+        'wall': round(wall, 3),
+        'chapters': len(finished),
+        'chapters_per_sec': round(len(finished) / wall, 3) if wall else None,
+        'chars_per_sec': round(chars / wall, 1) if wall else None,
+        'chapter_p95': percentile(walls, 0.95),
+        'run_ttfa': run_finished.get('run_ttfa'),
+        'failures': len(failed),
+        'dead': sum(1 for event in failed if event.get('dead')),
+        'final_limit': int(limit.group(1)) if limit else None
+    }
+
+async def run_scenario(scenario: Dict, template: str, work_dir: str, concurrency: int,
+                       timeout: float) -> Dict:
+    """在模拟服务上运行一次完整的 tts_process，返回吞吐量、延迟和失败情况"""
+    scenario_dir = os.path.join(work_dir, scenario['name'])
+    shutil.copytree(template, scenario_dir)
+    options = {key: scenario[key] for key in SERVER_OPTIONS if key in scenario}
+    options.setdefault('seed', 0)
+    server = MockTTSServer(**options)
+    url = await server.start()
+    events_path = os.path.join(scenario_dir, "data", "tmp", "tts_events.jsonl")
+    log_path = os.path.join(scenario_dir, "tts_process.log")
+    env = dict(os.environ, **{EDGE_TTS_URL_ENV: url})
+    timed_out = False
+    start = time.monotonic()
+    try:
+        with open(log_path, 'wb') as log:
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, "tts_process.py", VOICE, "+0%", "0", "--concurrency", str(concurrency),
+                "--events", events_path, "--worker-id", "benchmark",
+                cwd=scenario_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+            try:
+                await asyncio.wait_for(process.wait(), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                process.kill()
+                await process.wait()
+    finally:
+        await server.stop()
+    wall = time.monotonic() - start
+
+    with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+        log = f.read()
+    result = summarize_run(read_events(events_path), log, wall)
+    result['timed_out'] = timed_out
+    result['exit_code'] = process.returncode
+    result['server'] = server.stats()
+    # 检查输出的音频是否完整，确认注入的故障没有留下损坏的章节
+    checker = AudioChecker(os.path.join(scenario_dir, "data", "cache", "benchmark_scan.json"))
+    counts = check_library(os.path.join(scenario_dir, "data", "out_mp3"),
+                           os.path.join(scenario_dir, "data", "out_text"), checker)
+    result['suspicious'] = counts['suspicious']
+    return result
+
+async def run_benchmarks(scenarios: List[Dict], chapters: int, chapter_chars: int, concurrency: int,
+                         timeout: float) -> Dict:
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'chapters': chapters,
+        'chapter_chars': chapter_chars,
+        'concurrency': concurrency,
+        'scenarios': {}
+    }
+    work_dir = tempfile.mkdtemp(prefix='tts_benchmark_')
+    try:
+        print(f"正在准备 {chapters} 章的测试小说")
+        template = prepare_workspace(work_dir, chapters, chapter_chars)
+        for scenario in scenarios:
+            print(f"正在运行压测场景：{scenario['name']}")
+            result = await run_scenario(scenario, template, work_dir, concurrency, timeout)
+            result['options'] = {key: scenario[key] for key in SERVER_OPTIONS if key in scenario}
+            results['scenarios'][scenario['name']] = result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def print_results(results: Dict):
+    """打印各场景的吞吐量、延迟和注入故障下的表现"""
+    for name, result in results['scenarios'].items():
+        server = result['server']
+        print(f"\n{name}：{result['chapters']}/{results['chapters']} 章，用时 {result['wall']:.1f} 秒"
+              f"{'（超时）' if result['timed_out'] else ''}")
+        print(f"  吞吐量      {result['chapters_per_sec'] or 0:.2f} 章/秒，{result['chars_per_sec'] or 0:.0f} 字/秒")
+        print(f"  请求延迟    p50 {server['latency_p50'] or 0:.3f} 秒，p95 {server['latency_p95'] or 0:.3f} 秒")
+        print(f"  章节用时    p95 {result['chapter_p95'] or 0:.2f} 秒，首段音频 {result['run_ttfa'] or 0:.2f} 秒")
+        print(f"  服务端      请求 {server['requests']} 次，完成 {server['completed']}，错误 {server['errors']}，"
+              f"断开 {server['drops']}，限流 {server['throttled']}，最大同时连接 {server['peak_connections']}")
+        print(f"  客户端      失败 {result['failures']} 次，死信 {result['dead']} 章，"
+              f"最终并发上限 {result['final_limit']}，可疑音频 {result['suspicious']} 个")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="语音转换端到端吞吐量基准（使用本地模拟的 Edge TTS 服务）")
+    parser.add_argument('--scenario', action='append', help="只运行指定名称的场景，可重复指定")
+    parser.add_argument('--chapters', type=int, default=20, help="测试小说的章节数")
+    parser.add_argument('--chapter-chars', type=int, default=3000, help="每章的字数")
+    parser.add_argument('--concurrency', '-c', type=int, default=4, help="初始并发请求数")
+    parser.add_argument('--timeout', type=float, default=600, help="每个场景的最长运行时间（秒）")
+    parser.add_argument('--compare', action='store_true', help="与上次保存的结果比较吞吐量")
+    args = parser.parse_args(argv)
+
+    scenarios = DEFAULT_SCENARIOS
+    if args.scenario:
+        scenarios = [scenario for scenario in DEFAULT_SCENARIOS if scenario['name'] in args.scenario]
+        if not scenarios:
+            print(f"没有找到场景：{', '.join(args.scenario)}")
+            return 2
+
+    previous = load_results(TTS_RESULTS_PATH) if args.compare else None
+    results = asyncio.run(run_benchmarks(scenarios, max(1, args.chapters), args.chapter_chars,
+                                         max(1, args.concurrency), args.timeout))
+    save_results(TTS_RESULTS_PATH, results)
+    print_results(results)
+    if previous:
+        print("\n与上次结果相比：")
+        for name, result in results['scenarios'].items():
+            before = previous.get('scenarios', {}).get(name, {}).get('chapters_per_sec')
+            if before and result['chapters_per_sec']:
+                print(f"  {name}：{before:.2f} -> {result['chapters_per_sec']:.2f} 章/秒"
+                      f"（{result['chapters_per_sec'] / before - 1:+.0%}）")
+    incomplete = [name for name, result in results['scenarios'].items() if result['timed_out']]
+    if incomplete:
+        print(f"\n以下场景超时：{', '.join(incomplete)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+# 计算滚动合成速度时统计最近多少秒内完成的章节
+RATE_WINDOW = 300.0
+
+def format_eta(seconds: Optional[float]) -> str:
+    """把剩余秒数格式化为 时:分:秒，无法估计时返回“未知”"""
+    if seconds is None:
+        return "未知"
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+class _RollingRate:
+    """最近 RATE_WINDOW 秒内的处理速度（字/秒）"""
+
+    def __init__(self, started: float):
+        self.started = started
+        self._recent = deque()
+        self._chars = 0
+
+    def add(self, now: float, chars: int):
+        self._recent.append((now, chars))
+        self._chars += chars
+
+    def rate(self, now: float) -> Optional[float]:
+        while self._recent and self._recent[0][0] < now - RATE_WINDOW:
+            self._chars -= self._recent.popleft()[1]
+        span = now - max(self.started, now - RATE_WINDOW)
+        if not self._chars or span <= 0:
+            return None
+        return self._chars / span
+
+class ProgressReporter:
+    """语音转换进度事件
+
+    每个事件写成一行 JSON（event 为事件类型，time 为 Unix 时间），写入 path 指定的文件
+    或命名管道；未指定 path 时只统计，不写入。章节事件包括 queued、started、first_audio、
+    finished 和 failed，带有字数、写入字节数、耗时和重试次数，finished 和 failed 事件
+    还带有最近的合成速度（字/秒）以及该小说和整个运行的预计剩余时间（秒）。
+    已转换而跳过的章节按小说汇总为一个 skipped 事件，音频可疑而被隔离的章节为 quarantined 事件。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._file = None
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._file = open(path, 'a', encoding='utf-8', buffering=1)
+        self.started = time.monotonic()
+        self.first_audio = None
+        self.novels = {}
+        self._rate = _RollingRate(self.started)
+        self._chapters = {}
+        self._skipped = {}
+
+    def emit(self, event: str, **fields):
+        if self._file is None:
+            return
+        record = {'event': event, 'time': round(time.time(), 3)}
+        record.update(fields)
+        try:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        except OSError:
+            # 读取端已关闭（如管道另一端退出）时停止写入，不影响转换
+            self._file = None
+
+    def _novel(self, novel: str) -> Dict:
+        if novel not in self.novels:
+            self.novels[novel] = {'chapters': 0, 'chars': 0, 'done': 0, 'done_chars': 0,
+                                  'rate': _RollingRate(self.started)}
+        return self.novels[novel]
+
+    def skipped(self, novel: str, count: int):
+        """已转换而跳过的章节，按小说汇总，在 run_started 事件之后写入"""
+        if count:
+            self._skipped[novel] = self._skipped.get(novel, 0) + count
+
+    def quarantined(self, novel: str, chapter: str, reason: str):
+        """已转换章节的音频可疑，已移入隔离目录并将重新转换"""
+        self.emit('quarantined', novel=novel, chapter=chapter, reason=reason)
+
+    def queued(self, jobs: List[Dict]):
+        """本次运行需要转换的章节"""
+        for job in jobs:
+            stats = self._novel(job['novel'])
+            stats['chapters'] += 1
+            stats['chars'] += job.get('chars', 0)
+            self.emit('queued', novel=job['novel'], chapter=job['name'], chars=job.get('chars', 0),
+                      attempts=job.get('attempts', 0))
+
+    def chapter_started(self, job: Dict):
+        self._chapters[(job['novel'], job['name'])] = {'start': time.monotonic(), 'first_audio': None}
+        self.emit('started', novel=job['novel'], chapter=job['name'], chars=job.get('chars', 0),
+                  attempts=job.get('attempts', 0))
+
+    def chapter_audio(self, job: Dict):
+        """章节的第一个分段合成完成时调用，记录首段音频用时"""
+        state = self._chapters.get((job['novel'], job['name']))
+        if state is None or state['first_audio'] is not None:
+            return
+        now = time.monotonic()
+        state['first_audio'] = now - state['start']
+        if self.first_audio is None:
+            self.first_audio = now - self.started
+        self.emit('first_audio', novel=job['novel'], chapter=job['name'],
+                  ttfa=round(state['first_audio'], 3), run_ttfa=round(self.first_audio, 3))
+
+    def _finish(self, job: Dict, done: bool, converted: bool) -> Dict:
+        now = time.monotonic()
+        state = self._chapters.pop((job['novel'], job['name']), None) or {'start': now, 'first_audio': None}
+        stats = self._novel(job['novel'])
+        chars = job.get('chars', 0)
+        if done:
+            stats['done'] += 1
+            stats['done_chars'] += chars
+        else:
+            # 不再转换的章节（死信）不计入剩余字数
+            stats['chars'] -= chars
+        if converted:
+            self._rate.add(now, chars)
+            stats['rate'].add(now, chars)
+        return {
+            'novel': job['novel'],
+            'chapter': job['name'],
+            'chars': chars,
+            'attempts': job.get('attempts', 0),
+            'wall': round(now - state['start'], 3),
+            'ttfa': None if state['first_audio'] is None else round(state['first_audio'], 3),
+            'chars_per_sec': self.rate(),
+            'novel_eta': self.eta(job['novel']),
+            'eta': self.eta()
+        }
+
+    def chapter_finished(self, job: Dict, result: str, size: int = 0):
+        """章节完成，result 为 converted/cached/skipped，size 为写入的音频字节数"""
+        fields = self._finish(job, True, result == 'converted')
+        self.emit('finished', result=result, bytes=size, **fields)
+
+    def chapter_failed(self, job: Dict, error: str, dead: bool):
+        fields = self._finish(job, False, False) if dead else self._retry_fields(job)
+        self.emit('failed', error=error, dead=dead, **fields)
+
+    def _retry_fields(self, job: Dict) -> Dict:
+        # 还会重试的章节仍计入剩余字数，下次开始时重新计时
+        state = self._chapters.pop((job['novel'], job['name']), None)
+        return {
+            'novel': job['novel'],
+            'chapter': job['name'],
+            'chars': job.get('chars', 0),
+            'attempts': job.get('attempts', 0),
+            'wall': None if state is None else round(time.monotonic() - state['start'], 3),
+            'retry_in': round(max(0.0, job.get('next_time', 0) - time.time()), 1),
+            'chars_per_sec': self.rate(),
+            'novel_eta': self.eta(job['novel']),
+            'eta': self.eta()
+        }
+
+    def rate(self, novel: Optional[str] = None) -> Optional[float]:
+        """最近的合成速度（字/秒），novel 为 None 时为整个运行"""
+        rolling = self._rate if novel is None else self._novel(novel)['rate']
+        rate = rolling.rate(time.monotonic())
+        return None if rate is None else round(rate, 1)
+
+    def remaining_chars(self, novel: Optional[str] = None) -> int:
+        novels = self.novels.values() if novel is None else [self._novel(novel)]
+        return sum(stats['chars'] - stats['done_chars'] for stats in novels)
+
+    def eta(self, novel: Optional[str] = None) -> Optional[float]:
+        """按最近的合成速度估计的剩余秒数，没有剩余时为 0，还没有速度数据时为 None"""
+        remaining = self.remaining_chars(novel)
+        if remaining <= 0:
+            return 0.0
+        rate = self.rate(novel)
+        return None if not rate else round(remaining / rate, 1)
+
+    def run_started(self, **fields):
+        self.emit('run_started', **fields)
+        for novel, count in self._skipped.items():
+            self.emit('skipped', novel=novel, chapters=count)
+
+    def run_finished(self, **fields):
+        self.emit('run_finished', wall=round(time.monotonic() - self.started, 3),
+                  run_ttfa=None if self.first_audio is None else round(self.first_audio, 3),
+                  chars_per_sec=self.rate(), **fields)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def read_events(path: str) -> List[Dict]:
+    """读取进度事件文件中最近一次运行的事件"""
+    events = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event.get('event') == 'run_started':
+                    events = []
+                events.append(event)
+    except OSError:
+        pass
+    return events
+
+def describe_progress(path: str) -> str:
+    """按进度事件文件生成最近一次运行的进度说明"""
+    events = read_events(path)
+    if not any(event['event'] == 'run_started' for event in events):
+        return "暂无转换进度"
+    novels = {}
+    last = None
+    failed = 0
+    finished = False
+    for event in events:
+        kind = event['event']
+        if kind == 'queued':
+            novels.setdefault(event['novel'], [0, 0])[1] += 1
+        elif kind == 'finished':
+            novels.setdefault(event['novel'], [0, 0])[0] += 1
+            last = event
+        elif kind == 'failed':
+            failed += 1
+            last = event
+        elif kind == 'run_finished':
+            finished = True
+
+    lines = [f"{novel}：{done}/{total} 章" for novel, (done, total) in novels.items()]
+    if last is not None:
+        lines.append(f"合成速度 {last.get('chars_per_sec') or 0:.1f} 字/秒，"
+                     f"预计剩余 {format_eta(None if finished else last.get('eta'))}")
+    if failed:
+        lines.append(f"失败 {failed} 次")
+    lines.append("转换已结束" if finished else "正在转换")
+    return '\n'.join(lines)
@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import time
+import uuid
+import socket
+import hashlib
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows 使用 msvcrt 加锁
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# 租约有效期（秒），持有者定期续约，进程退出后超过有效期即可被其他进程回收
+DEFAULT_LEASE_TTL = 120.0
+# 进程标识目录中的锁文件名，持有该锁的进程独占该标识的队列文件和临时目录
+WORKER_LOCK_NAME = 'worker.lock'
+# 默认标识被同一主机上的其他进程占用时，依次尝试 主机名-2、主机名-3 …… 的个数上限
+MAX_WORKER_SLOTS = 64
+
+def default_worker_id() -> str:
+    """默认的工作进程标识：主机名（容器中即容器 ID），重启后保持不变"""
+    return socket.gethostname() or 'worker'
+
+def safe_worker_id(worker_id: str) -> str:
+    """进程标识用作目录名，替换掉不能用于文件名的字符"""
+    return re.sub(r'[^\w.-]', '_', worker_id)
+
+class WorkerLock:
+    """进程标识目录上的排他锁（操作系统文件锁，进程退出后自动释放）"""
+
+    def __init__(self, worker_dir: str):
+        self.path = os.path.join(worker_dir, WORKER_LOCK_NAME)
+        self._file = None
+
+    def acquire(self) -> bool:
+        """尝试加锁，已被其他进程持有时返回 False"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        f = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            elif msvcrt is not None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        if fcntl is None and msvcrt is not None:
+            try:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            except OSError:
+                pass
+        self._file.close()
+        self._file = None
+
+def claim_worker_id(workers_dir: str, worker_id: Optional[str] = None) -> Tuple[str, WorkerLock]:
+    """为本进程取得一个独占的进程标识，返回 (标识, 锁)，进程结束前应调用锁的 release()
+
+    队列文件和临时目录按进程标识区分，两个进程使用同一标识会互相删除对方的临时文件。
+    指定的标识已被其他进程使用时抛出 RuntimeError；未指定时使用主机名，
+    被同一主机上的其他进程占用时依次改用 主机名-2、主机名-3 ……，单个进程重启后仍使用主机名，
+    可以继续使用上次的队列和未完成的分段。
+    """
+    if worker_id:
+        candidates = [safe_worker_id(worker_id)]
+    else:
+        base = safe_worker_id(default_worker_id())
+        candidates = [base] + [f"{base}-{slot}" for slot in range(2, MAX_WORKER_SLOTS + 1)]
+    for candidate in candidates:
+        lock = WorkerLock(os.path.join(workers_dir, candidate))
+        if lock.acquire():
+            return candidate, lock
+    if worker_id:
+        raise RuntimeError(f"进程标识 {candidates[0]} 正被其他转换进程使用，请用 --worker-id 指定其他标识")
+    raise RuntimeError(f"同一主机上运行的转换进程过多（{MAX_WORKER_SLOTS} 个）")
+
+class LeaseManager:
+    """基于共享目录中原子创建文件的任务租约
+
+    每个任务对应租约目录中的一个文件，用 O_CREAT|O_EXCL 创建，创建成功即获得租约。
+    租约记录持有者和到期时间，持有期间需要定期 renew()；到期未续约的租约可以被
+    其他进程回收。可用于同一主机上的多个进程，也可用于挂载同一数据卷的多台主机。
+    """
+
+    def __init__(self, lease_dir: str, worker_id: Optional[str] = None, ttl: float = DEFAULT_LEASE_TTL):
+        self.lease_dir = lease_dir
+        self.worker_id = safe_worker_id(worker_id or default_worker_id())
+        # 同一 worker_id 下可能有多个进程，租约按进程区分持有者
+        self.owner = f"{self.worker_id}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.ttl = ttl
+        self.held = {}
+        os.makedirs(lease_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.lease_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.lease')
+
+    def _record(self, key: str) -> bytes:
+        return json.dumps({
+            'key': key,
+            'owner': self.owner,
+            'expires': time.time() + self.ttl
+        }, ensure_ascii=False).encode('utf-8')
+
+    @staticmethod
+    def _read(path: str) -> Optional[Dict]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                lease = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return lease if isinstance(lease, dict) and 'owner' in lease and 'expires' in lease else None
+
+    def _expired(self, path: str, lease: Optional[Dict]) -> bool:
+        """租约是否已过期
+
+        无法读取的租约可能正在写入，也可能是持有者在创建文件后、写入前退出留下的，
+        按文件修改时间超过有效期才视为过期。
+        """
+        if lease is not None:
+            return lease['expires'] <= time.time()
+        try:
+            return os.path.getmtime(path) + self.ttl <= time.time()
+        except OSError:
+            return False
+
+    def _create(self, key: str, path: str) -> bool:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self._record(key))
+        self.held[key] = path
+        return True
+
+    def acquire(self, key: str) -> bool:
+        """尝试获得任务租约，已被其他进程持有且未过期时返回 False"""
+        path = self._path(key)
+        if self._create(key, path):
+            return True
+
+        if not self._expired(path, self._read(path)):
+            return False
+
+        # 租约已过期：先改名移走，只有一个进程能改名成功
+        stale_path = f"{path}.{self.owner}.stale"
+        try:
+            os.rename(path, stale_path)
+        except OSError:
+            return False
+        if not self._expired(stale_path, self._read(stale_path)):
+            # 改名前租约刚被其他进程回收并重新创建，原样放回
+            try:
+                os.link(stale_path, path)
+            except OSError:
+                pass
+            os.remove(stale_path)
+            return False
+        os.remove(stale_path)
+        return self._create(key, path)
+
+    def renew(self):
+        """为持有的全部租约续约，已被其他进程回收的租约不再持有"""
+        for key, path in list(self.held.items()):
+            lease = self._read(path)
+            if lease is None or lease['owner'] != self.owner:
+                print(f"任务租约已失效: {key}")
+                del self.held[key]
+                continue
+            tmp_path = f"{path}.{self.owner}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(self._record(key))
+            os.replace(tmp_path, path)
+
+    def release(self, key: str):
+        """释放租约"""
+        path = self.held.pop(key, None)
+        if path is None:
+            return
+        lease = self._read(path)
+        if lease is not None and lease['owner'] == self.owner:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def release_all(self):
+        for key in list(self.held):
+            self.release(key)
@@ -0,0 +1,144 @@
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import aiohttp
+
+# 默认并发上下限
+DEFAULT_MIN_CONCURRENCY = 1
+DEFAULT_MAX_CONCURRENCY = 16
+# 最近多少次请求用于统计延迟和错误率
+STATS_WINDOW = 200
+# 错误率超过该值时不再增加并发
+HEALTHY_ERROR_RATE = 0.05
+# 两次减小并发之间的最短间隔（秒），同一波限流只减一次
+DECREASE_COOLDOWN = 5.0
+# 过载时并发上限乘以该系数
+DECREASE_FACTOR = 0.5
+# 表示服务过载或限流的 HTTP 状态码
+OVERLOAD_STATUS = (429, 503)
+
+def is_overload_error(error: BaseException) -> bool:
+    """判断错误是否表示服务过载：超时、限流（429/503）或连接被重置"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError,
+                          aiohttp.ServerDisconnectedError, aiohttp.ClientOSError)):
+        return True
+    return getattr(error, 'status', None) in OVERLOAD_STATUS
+
+def percentile(values, fraction: float) -> Optional[float]:
+    """计算百分位数，没有数据时返回 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class AdaptiveLimiter:
+    """按加性增、乘性减（AIMD）自动调整同时进行的合成请求数
+
+    每完成约“当前上限”个成功请求，且最近的错误率和 p95 延迟都正常时，上限加一；
+    遇到超时、限流或连接重置时上限减半（冷却时间内只减一次）。
+    minimum 等于 maximum 时即为固定并发。
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = DEFAULT_MIN_CONCURRENCY,
+                 maximum: int = DEFAULT_MAX_CONCURRENCY, latency_target: Optional[float] = None):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.overloads = 0
+        self._latencies = deque(maxlen=STATS_WINDOW)
+        self._outcomes = deque(maxlen=STATS_WINDOW)
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._condition = None
+
+    @asynccontextmanager
+    async def request(self):
+        """占用一个请求名额，记录本次请求的延迟和结果"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        else:
+            self._record_success(time.monotonic() - start)
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def _record_success(self, latency: float):
+        self.requests += 1
+        self._latencies.append(latency)
+        self._outcomes.append(True)
+        self._successes += 1
+        if self._successes < self.limit or self.limit >= self.maximum:
+            return
+        self._successes = 0
+        if self.error_rate() > HEALTHY_ERROR_RATE:
+            return
+        if self.latency_target and percentile(self._latencies, 0.95) > self.latency_target:
+            return
+        self._set_limit(self.limit + 1, "延迟和错误率正常")
+
+    def _record_failure(self, error: BaseException):
+        self.requests += 1
+        self.errors += 1
+        self._outcomes.append(False)
+        if not is_overload_error(error):
+            return
+        self.overloads += 1
+        self._successes = 0
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self._set_limit(int(self.limit * DECREASE_FACTOR), f"服务过载（{error.__class__.__name__}）")
+
+    def _set_limit(self, limit: int, reason: str):
+        """调整并发上限；上限提高后，请求结束释放名额时会唤醒等待中的请求"""
+        old = self.limit
+        self.limit = min(self.maximum, max(self.minimum, limit))
+        if self.limit != old:
+            print(f"并发上限 {old} -> {self.limit}：{reason}，{self.describe()}")
+
+    def error_rate(self) -> float:
+        """最近请求的错误率"""
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def stats(self) -> Dict:
+        """当前并发上限、最近请求的 p50/p95 延迟（秒）和错误率"""
+        return {
+            'limit': self.limit,
+            'in_flight': self.in_flight,
+            'p50': percentile(self._latencies, 0.5),
+            'p95': percentile(self._latencies, 0.95),
+            'error_rate': self.error_rate(),
+            'requests': self.requests,
+            'errors': self.errors,
+            'overloads': self.overloads
+        }
+
+    def describe(self) -> str:
+        """统计信息的文字描述"""
+        stats = self.stats()
+        if stats['p50'] is None:
+            latency = "暂无延迟数据"
+        else:
+            latency = f"延迟 p50 {stats['p50']:.1f}s / p95 {stats['p95']:.1f}s"
+        return f"{latency}，错误率 {stats['error_rate']:.1%}"
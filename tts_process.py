@@ -1,8 +1,53 @@
 import os
 import re
+import json
+import time
+import uuid
 import asyncio
+import argparse
+import aiohttp
 import edge_tts
 import shutil  # 添加 shutil 模块导入
+from chapter_store import chapter_sort_key, content_hash, open_chapter_reader
+from novel_process import get_speech_normalizer, get_subtitle_options, load_config
+from speech_text import get_chapter_segments, get_speech_text, load_segment_plan
+from tts_queue import (
+    TTSJobQueue, DEFAULT_MAX_ATTEMPTS, DEFAULT_BASE_DELAY, DEFAULT_MAX_DELAY,
+    QUEUE_SAVE_INTERVAL, SCHEDULE_POLICIES, SCHEDULE_ROUND_ROBIN, job_key, schedule_jobs
+)
+from audio_cache import AudioCache, DEFAULT_CACHE_SIZE_MB, audio_key
+from tts_limiter import AdaptiveLimiter, DEFAULT_MIN_CONCURRENCY, DEFAULT_MAX_CONCURRENCY
+from tts_lease import LeaseManager, DEFAULT_LEASE_TTL, claim_worker_id, default_worker_id
+from tts_events import ProgressReporter
+from audio_check import AudioChecker, DEFAULT_MAX_CHARS_PER_SEC, DEFAULT_MIN_CHARS_PER_SEC, quarantine
+from mp3_frames import scan_mp3, split_frames
+from subtitles import (
+    concatenate_cues, group_word_boundaries, load_cues, move_subtitles, subtitle_path, write_subtitles
+)
+
+# 默认的初始并发请求数
+DEFAULT_CONCURRENCY = 4
+# 预热连接时合成的文本
+WARMUP_TEXT = "你好"
+# 运行期间 DNS 解析结果的缓存时间（秒）
+WARMUP_DNS_TTL = 300
+# 设置该环境变量时改用其指定的兼容服务地址（如 mock_tts_server.py 启动的本地服务）
+EDGE_TTS_URL_ENV = "EDGE_TTS_WSS_URL"
+# 默认的语音合成后端
+DEFAULT_BACKEND = 'edge'
+# 本地合成引擎的默认命令和语音：{input} 为文本文件，{output} 为输出文件，
+# {voice} 为语音，{speed} 为每分钟字数，{rate} 为原始语速参数
+DEFAULT_LOCAL_COMMAND = ["espeak-ng", "-v", "{voice}", "-s", "{speed}", "-w", "{output}", "-f", "{input}"]
+DEFAULT_LOCAL_VOICES = ["cmn", "yue"]
+DEFAULT_LOCAL_SPEED = 175
+# 短章节合并转换：合并后的朗读字数上限和可以合并的章节字数上限。
+# edge_tts 会把超过 4096 字节的文本拆成多次请求，汉字按 UTF-8 每字 3 字节计算，默认值保持在一次请求内
+DEFAULT_BATCH_MAX_CHARS = 1200
+DEFAULT_BATCH_CHAPTER_CHARS = 600
+# 合并转换时章节之间的分隔，朗读时形成停顿，在停顿中间切分音频
+BATCH_SEPARATOR = "\n\n"
+# 章节音频合成参数的记录文件名，位于小说的音频目录中
+SYNTHESIS_RECORD_NAME = ".synthesis.json"
 
 def get_base_path():
     """获取项目基础路径"""
@@ -33,89 +78,993 @@ def count_converted_chapters():
     
     return count
 
-def process_tts(voice="zh-CN-YunxiNeural", rate="+0%", total_chapters=0):
-    """处理语音转换的主函数"""
-    while True:
-        converted_count = 0
-        base_path = get_base_path()
-        text_dir = os.path.join(base_path, "data", "out_text")
-        
-        # 处理所有小说目录
-        for novel_dir in os.listdir(text_dir):
-            novel_path = os.path.join(text_dir, novel_dir)
-            if os.path.isdir(novel_path):
-                # 创建对应的MP3输出目录
-                mp3_dir = os.path.join(base_path, "data", "out_mp3", novel_dir)
-                os.makedirs(mp3_dir, exist_ok=True)
-                
-                # 获取已转换的章节列表
-                converted_chapters = get_converted_chapters(mp3_dir)
-                
-                # 处理每个章节前创建临时目录
-                tmp_dir = os.path.join(mp3_dir, "tmp")
-                os.makedirs(tmp_dir, exist_ok=True)
-                
-                try:
-                    # 处理每个章节
-                    for chapter_file in os.listdir(novel_path):
-                        if chapter_file.endswith('.txt'):
-                            # 检查是否已转换
-                            chapter_name = chapter_file[:-4]
-                            if chapter_name in converted_chapters:
-                                print(f"跳过已转换章节: {chapter_file}")
-                                continue
-                            
-                            # 读取文本内容
-                            text_path = os.path.join(novel_path, chapter_file)
-                            with open(text_path, 'r', encoding='utf-8') as f:
-                                text = f.read()
-                            
-                            # 设置临时输出路径和最终输出路径
-                            mp3_filename = chapter_file.replace('.txt', '.mp3')
-                            mp3_filename = re.sub(r'[<>:"/\\|?*]', '_', mp3_filename)
-                            tmp_path = os.path.join(tmp_dir, mp3_filename)
-                            final_path = os.path.join(mp3_dir, mp3_filename)
-                            
-                            try:
-                                # 转换语音到临时文件
-                                print(f"正在转换: {mp3_filename}")
-                                asyncio.run(text_to_speech(text, tmp_path, voice, rate))
-                                
-                                # 转换成功后移动到最终目录
-                                if os.path.exists(tmp_path):
-                                    shutil.move(tmp_path, final_path)
-                                    converted_count += 1
-                                    print(f"已完成: {mp3_filename}")
-                            except Exception as e:
-                                print(f"转换失败: {mp3_filename}, 错误: {str(e)}")
-                                # 清理可能存在的临时文件
-                                if os.path.exists(tmp_path):
-                                    os.remove(tmp_path)
-                finally:
-                    # 在处理完所有章节后清理临时目录
-                    try:
-                        if os.path.exists(tmp_dir):
-                            shutil.rmtree(tmp_dir)
-                    except Exception as e:
-                        print(f"清理临时目录失败: {str(e)}")
+def collect_pending_chapters(text_dir, mp3_root, progress=None, checker=None, resynthesize=False):
+    """收集所有尚未转换的章节，已转换的章节按小说汇总输出
+
+    提供 checker 时检查已转换章节的音频，可疑的音频只报告；checker.move_suspicious 为 True 时
+    移入隔离目录后重新转换。
+    resynthesize 为 True 时已转换的章节也重新合成（任务带有 replace 标记），完成后替换原音频。
+    """
+    jobs = []
+    suspicious = 0
+    for novel_dir in os.listdir(text_dir):
+        novel_path = os.path.join(text_dir, novel_dir)
+        if not os.path.isdir(novel_path):
+            continue
+        # 创建对应的MP3输出目录
+        mp3_dir = os.path.join(mp3_root, novel_dir)
+        os.makedirs(mp3_dir, exist_ok=True)
         
-        # 所有章节处理完成后的检查逻辑
-        total_converted = count_converted_chapters()
-        print(f"本轮转换完成，已转换 {total_converted}/{total_chapters} 章节")
+        # 获取已转换的章节列表
+        converted_chapters = get_converted_chapters(mp3_dir)
+        # 分段计划中记录了各章节朗读文本的字数，用于统计速度和预计剩余时间
+        planned = load_segment_plan(novel_path).get('chapters', {})
+        skipped = 0
         
-        if total_chapters > 0 and total_converted < total_chapters:
-            print("检测到有未转换的章节，开始新一轮转换...")
+        # 支持每章一个文件和打包两种存储格式
+        with open_chapter_reader(novel_path) as reader:
+            # 按章节顺序排列，index 供调度时判断是否属于开头几章
+            for index, chapter_name in enumerate(sorted(reader.names(), key=chapter_sort_key)):
+                chapter_plan = planned.get(chapter_name, {})
+                chars = chapter_plan.get('speech_chars', chapter_plan.get('chars', 0))
+                replace = resynthesize and chapter_name in converted_chapters
+                if chapter_name in converted_chapters and not replace:
+                    mp3_path = os.path.join(mp3_dir, f"{chapter_name}.mp3")
+                    reason = checker.check(mp3_path, chars) if checker is not None else None
+                    if reason is None:
+                        skipped += 1
+                        continue
+                    if not checker.move_suspicious:
+                        print(f"可疑音频: {novel_dir}/{chapter_name}.mp3（{reason}）")
+                        suspicious += 1
+                        skipped += 1
+                        continue
+                    quarantine(mp3_path, reason)
+                    checker.forget(mp3_path)
+                    print(f"隔离可疑音频: {novel_dir}/{chapter_name}.mp3（{reason}），将重新转换")
+                    if progress is not None:
+                        progress.quarantined(novel_dir, chapter_name, reason)
+                jobs.append({
+                    'novel': novel_dir,
+                    'name': chapter_name,
+                    'index': index,
+                    'hash': reader.hash(chapter_name),
+                    'chars': chars,
+                    'novel_path': novel_path,
+                    'mp3_dir': mp3_dir,
+                    'replace': replace
+                })
+        if skipped:
+            print(f"跳过已转换章节: {novel_dir} 共 {skipped} 章")
+            if progress is not None:
+                progress.skipped(novel_dir, skipped)
+    if suspicious:
+        print(f"有 {suspicious} 个已转换的音频可疑，未作处理；确认后可运行 python audio_check.py --quarantine "
+              f"隔离这些音频，或在配置中把 audio_check.quarantine 设为 true，转换前自动隔离并重新转换")
+    return jobs
+
+def get_synthesis_record_path(mp3_dir):
+    """记录各章节音频合成参数（语音、语速）的文件，与章节音频在同一目录"""
+    return os.path.join(mp3_dir, SYNTHESIS_RECORD_NAME)
+
+def load_synthesis_record(mp3_dir):
+    """读取小说各章节音频的合成参数 {章节名: {'voice', 'rate', 'size'}}"""
+    try:
+        with open(get_synthesis_record_path(mp3_dir), 'r', encoding='utf-8') as f:
+            return json.load(f).get('chapters', {})
+    except (OSError, ValueError):
+        return {}
+
+class SynthesisRecorder:
+    """记录每个章节音频合成时使用的语音和语速，供 rate_variants.py 计算变速倍数
+
+    记录按小说保存在章节音频目录的 .synthesis.json 中，带有音频大小，音频被替换后
+    记录随之失效。保存时先读取最新的记录再合并，多个进程转换同一本小说时互不覆盖。
+    """
+
+    def __init__(self, voice, rate):
+        self.voice = voice
+        self.rate = rate
+        self._pending = {}
+        self._saved_at = 0.0
+
+    def record(self, job):
+        mp3_path = get_mp3_path(job)
+        self._pending.setdefault(job['mp3_dir'], {})[job['name']] = {
+            'voice': self.voice,
+            'rate': self.rate,
+            'size': os.path.getsize(mp3_path)
+        }
+        self.save(force=False)
+
+    def save(self, force=True):
+        """写入待保存的记录；force 为 False 时距上次保存不足 QUEUE_SAVE_INTERVAL 秒则跳过"""
+        if not force and time.monotonic() - self._saved_at < QUEUE_SAVE_INTERVAL:
+            return
+        for mp3_dir, entries in self._pending.items():
+            chapters = load_synthesis_record(mp3_dir)
+            chapters.update(entries)
+            record_path = get_synthesis_record_path(mp3_dir)
+            tmp_path = f"{record_path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'chapters': chapters}, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, record_path)
+        self._pending = {}
+        self._saved_at = time.monotonic()
+
+def get_workers_dir():
+    """各转换进程的队列文件目录，按进程标识分子目录"""
+    return os.path.join(get_base_path(), "data", "tmp", "workers")
+
+def get_queue_path(worker_id):
+    """语音合成任务队列文件路径，每个转换进程使用自己的队列文件"""
+    return os.path.join(get_workers_dir(), worker_id, "tts_queue.json")
+
+def open_job_queue(worker_id):
+    """按配置文件中的 tts_retry 选项打开任务队列"""
+    options = load_config().get('tts_retry', {})
+    return TTSJobQueue(
+        get_queue_path(worker_id),
+        max_attempts=int(options.get('max_attempts', DEFAULT_MAX_ATTEMPTS)),
+        base_delay=float(options.get('base_delay', DEFAULT_BASE_DELAY)),
+        max_delay=float(options.get('max_delay', DEFAULT_MAX_DELAY))
+    )
+
+def open_lease_manager(worker_id=None):
+    """按配置文件中的 tts_workers 选项创建任务租约，租约文件保存在 data/tmp/leases 中"""
+    options = load_config().get('tts_workers', {})
+    return LeaseManager(
+        os.path.join(get_base_path(), "data", "tmp", "leases"),
+        worker_id,
+        ttl=float(options.get('lease_ttl', DEFAULT_LEASE_TTL))
+    )
+
+def open_audio_checker():
+    """按配置文件中的 audio_check 选项创建音频检查器，未启用时返回 None
+
+    已转换的可疑音频默认只报告，quarantine 为 true 时才移入隔离目录并重新转换。
+    """
+    options = load_config().get('audio_check', {})
+    if not options.get('enabled', True):
+        return None
+    return AudioChecker(
+        min_chars_per_sec=float(options.get('min_chars_per_sec', DEFAULT_MIN_CHARS_PER_SEC)),
+        max_chars_per_sec=float(options.get('max_chars_per_sec', DEFAULT_MAX_CHARS_PER_SEC)),
+        move_suspicious=bool(options.get('quarantine', False))
+    )
+
+def get_batch_options():
+    """按配置文件中的 tts_batch 选项返回短章节合并转换的参数，未启用（默认）时返回 None
+
+    合并转换的章节音频由合并后的音频按帧切分得到，需要在配置中设置 tts_batch.enabled 为 true 才会使用。
+    """
+    options = load_config().get('tts_batch', {})
+    if not options.get('enabled', False):
+        return None
+    return {
+        'max_chars': int(options.get('max_chars', DEFAULT_BATCH_MAX_CHARS)),
+        'chapter_max_chars': int(options.get('chapter_max_chars', DEFAULT_BATCH_CHAPTER_CHARS))
+    }
+
+def open_audio_cache():
+    """按配置文件中的 audio_cache 选项打开音频缓存，未启用时返回 None"""
+    options = load_config().get('audio_cache', {})
+    if not options.get('enabled', True):
+        return None
+    return AudioCache(max_size_mb=float(options.get('max_size_mb', DEFAULT_CACHE_SIZE_MB)))
+
+async def synthesize_segment(text, segment_path, client, limiter, subtitles=None, on_audio=None):
+    """合成单个分段，先写入 .part 文件，完成后再改名，中断时不会留下不完整的分段
+
+    subtitles 为字幕选项时同时收集逐词时间，在分段旁写入 SRT 字幕。
+    """
+    part_path = segment_path + '.part'
+    boundaries = [] if subtitles else None
+    async with limiter.request():
+        try:
+            await client.synthesize(text, part_path, boundaries)
+            if not os.path.exists(part_path):
+                raise RuntimeError("没有生成音频文件")
+            if subtitles:
+                write_subtitles(segment_path, group_word_boundaries(text, boundaries, subtitles['max_chars']))
+            os.replace(part_path, segment_path)
+        except Exception:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+    if on_audio is not None:
+        on_audio()
+
+async def synthesize_segments(text, segments, segment_dir, client, limiter, subtitles=None, on_audio=None):
+    """并行合成章节的各个分段，已存在的分段不再合成，返回按顺序排列的分段文件列表
+
+    分段文件名包含序号和分段文本哈希，分段计划变化后旧的分段文件会被删除。
+    有分段失败时等其余分段完成后再抛出异常，已完成的分段留给下次继续使用。
+    需要字幕时，缺少字幕文件的分段也会重新合成。on_audio 在每个分段合成完成后调用。
+    """
+    os.makedirs(segment_dir, exist_ok=True)
+    paths = []
+    tasks = []
+    for index, (start, end) in enumerate(segments):
+        piece = text[start:end].strip()
+        if not piece:
             continue
+        path = os.path.join(segment_dir, f"{index:05d}-{content_hash(piece)[:12]}.mp3")
+        paths.append(path)
+        if not os.path.exists(path) or (subtitles and not os.path.exists(subtitle_path(path))):
+            tasks.append(synthesize_segment(piece, path, client, limiter, subtitles, on_audio))
+    
+    # 删除不再属于当前分段计划的文件
+    current = {os.path.basename(path) for path in paths}
+    current.update(os.path.basename(subtitle_path(path)) for path in paths)
+    for file in os.listdir(segment_dir):
+        if file not in current:
+            os.remove(os.path.join(segment_dir, file))
+    
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        raise errors[0]
+    return paths
+
+def concatenate_segments(segment_paths, output_path):
+    """按顺序拼接分段 MP3（MP3 帧流可直接首尾相接）"""
+    with open(output_path, 'wb') as out:
+        for path in segment_paths:
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, out)
+
+def strip_mp3_tags(path):
+    """去掉 MP3 文件中的 ID3 标签和 Xing/Info 信息帧，只保留可以直接拼接的音频帧
+
+    找不到音频帧时保持原样，交给音频检查处理。
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    frames = split_frames(data, [])[0]
+    if frames and len(frames) != len(data):
+        with open(path, 'wb') as f:
+            f.write(frames)
+
+def get_mp3_path(job):
+    """章节音频的最终路径"""
+    mp3_filename = re.sub(r'[<>:"/\\|?*]', '_', f"{job['name']}.mp3")
+    return os.path.join(job['mp3_dir'], mp3_filename)
+
+def remove_chapter_audio(mp3_path):
+    """删除章节音频和同名字幕"""
+    for path in (mp3_path, subtitle_path(mp3_path), subtitle_path(mp3_path, 'vtt')):
+        if os.path.exists(path):
+            os.remove(path)
+
+def read_speech_text(job, reader, normalizer):
+    """读取章节规范化后的朗读文本（按章节内容哈希缓存），返回 (朗读文本, 原文哈希)"""
+    original = reader.read(job['name'])
+    original_hash = content_hash(original)
+    return get_speech_text(job['novel_path'], original, original_hash, normalizer), original_hash
+
+def use_cached_audio(job, text, client, cache, subtitles=None, checker=None):
+    """相同文本、语音和语速已经合成过时把缓存的音频放到章节音频位置，返回是否使用了缓存
+
+    要求重新合成的章节（replace）不使用缓存，并丢弃旧的缓存以便放入新合成的音频。
+    """
+    if cache is None:
+        return False
+    final_path = get_mp3_path(job)
+    key = audio_key(text, client.cache_voice, client.rate)
+    if job.get('replace'):
+        cache.discard(key)
+        return False
+    if not cache.get(key, final_path, ('.srt',) if subtitles else ()):
+        return False
+    reason = checker.check(final_path, len(text)) if checker is not None else None
+    if reason is not None:
+        print(f"缓存的音频可疑（{reason}），重新转换: {os.path.basename(final_path)}")
+        cache.hits -= 1
+        cache.discard(key)
+        remove_chapter_audio(final_path)
+        return False
+    if subtitles:
+        write_subtitles(final_path, load_cues(subtitle_path(final_path)), subtitles['formats'])
+    print(f"使用缓存: {os.path.basename(final_path)}")
+    return True
+
+async def convert_chapter(job, reader, plan, client, normalizer, limiter, cache=None, worker_id=None,
+                          subtitles=None, on_audio=None, checker=None):
+    """转换单个章节，返回 converted/cached/skipped，转换失败时抛出异常
+
+    章节按分段计划拆分后并行合成，分段保存在 tmp/进程标识/章节名/ 目录中，全部完成后拼接为章节音频；
+    中断后再次运行只合成缺失的分段。subtitles 为字幕选项时，同时拼接各分段的字幕，
+    在章节音频旁生成字幕文件。on_audio 在每个分段合成完成后调用。
+    提供 checker 时检查缓存和新合成的音频，新合成的音频可疑时删除分段后抛出异常以便重试。
+    """
+    chapter_file = f"{job['name']}.txt"
+    text, original_hash = read_speech_text(job, reader, normalizer)
+    if not text:
+        print(f"跳过无可朗读内容的章节: {chapter_file}")
+        return 'skipped'
+    
+    # 设置临时输出路径和最终输出路径
+    final_path = get_mp3_path(job)
+    mp3_filename = os.path.basename(final_path)
+    tmp_dir = os.path.join(job['mp3_dir'], "tmp", worker_id or default_worker_id())
+    segment_dir = os.path.join(tmp_dir, mp3_filename[:-4])
+    tmp_path = os.path.join(tmp_dir, mp3_filename)
+    if os.path.exists(final_path) and not job.get('replace'):
+        # 其他进程已经转换完成
+        print(f"跳过已转换章节: {chapter_file}")
+        return 'skipped'
+    
+    if use_cached_audio(job, text, client, cache, subtitles, checker):
+        return 'cached'
+    
+    segments = get_chapter_segments(plan, job['name'], text, original_hash, normalizer)
+    try:
+        # 转换语音到临时文件
+        print(f"正在转换: {mp3_filename}（{len(segments)} 段）")
+        segment_paths = await synthesize_segments(text, segments, segment_dir, client, limiter, subtitles,
+                                                  on_audio)
+        concatenate_segments(segment_paths, tmp_path)
+        reason = checker.check(tmp_path, len(text), remember=False) if checker is not None else None
+        if reason is not None:
+            # 分段有问题，下次重试时全部重新合成
+            shutil.rmtree(segment_dir, ignore_errors=True)
+            raise RuntimeError(f"音频校验失败: {reason}")
+        if subtitles:
+            write_subtitles(tmp_path, concatenate_cues(segment_paths) or [], subtitles['formats'])
+        
+        # 转换成功后移动到最终目录，字幕先于音频移动
+        move_subtitles(tmp_path, final_path)
+        shutil.move(tmp_path, final_path)
+        print(f"已完成: {mp3_filename}")
+    except Exception:
+        # 清理可能存在的临时文件，已完成的分段保留
+        for path in (tmp_path, subtitle_path(tmp_path), subtitle_path(tmp_path, 'vtt')):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    shutil.rmtree(segment_dir, ignore_errors=True)
+    
+    if cache is not None:
+        cache.put(audio_key(text, client.cache_voice, client.rate), final_path, ('.srt',) if subtitles else ())
+    return 'converted'
+
+def split_boundaries(text, ranges, events):
+    """按各章节在合并文本中的范围 [(开始, 结束)] 把逐词时间事件分给各章节"""
+    groups = [[] for _ in ranges]
+    position = 0
+    current = 0
+    for event in events:
+        index = text.find(event['text'], position)
+        if index >= 0:
+            position = index + len(event['text'])
+            while current + 1 < len(ranges) and index >= ranges[current + 1][0]:
+                current += 1
+        groups[current].append(event)
+    return groups
+
+async def convert_batch(jobs, reader, client, normalizer, limiter, cache=None, worker_id=None,
+                        subtitles=None, on_audio=None, checker=None):
+    """把几个连续的短章节合并为一个合成请求，再按逐词时间在帧边界处切分为各章节音频
+
+    切分点取前一章最后一个词结束和后一章第一个词开始之间的中点。返回 {章节名: converted/cached/skipped}；
+    合成或切分失败时抛出异常，此时没有章节被写入最终位置（使用缓存的章节除外），由调用方改为逐章转换。
+    """
+    results = {}
+    pending = []
+    for job in jobs:
+        text, _ = read_speech_text(job, reader, normalizer)
+        if not text or (os.path.exists(get_mp3_path(job)) and not job.get('replace')):
+            results[job['name']] = 'skipped'
+        elif use_cached_audio(job, text, client, cache, subtitles, checker):
+            results[job['name']] = 'cached'
         else:
-            print(f"所有章节均已转换完成，共 {total_converted} 章节")
-            break
+            pending.append((job, text))
+    if not pending:
+        return results
+    
+    combined = BATCH_SEPARATOR.join(text for _, text in pending)
+    ranges = []
+    start = 0
+    for _, text in pending:
+        ranges.append((start, start + len(text)))
+        start += len(text) + len(BATCH_SEPARATOR)
+    tmp_dir = os.path.join(jobs[0]['mp3_dir'], "tmp", worker_id or default_worker_id())
+    os.makedirs(tmp_dir, exist_ok=True)
+    batch_path = os.path.join(tmp_dir, f"batch-{content_hash(combined)[:12]}.mp3")
+    outputs = []
+    try:
+        print(f"正在合并转换 {len(pending)} 个章节: {'、'.join(job['name'] for job, _ in pending)}")
+        boundaries = []
+        async with limiter.request():
+            await client.synthesize(combined, batch_path, boundaries)
+        if on_audio is not None:
+            on_audio()
+        with open(batch_path, 'rb') as f:
+            data = f.read()
+        
+        groups = split_boundaries(combined, ranges, boundaries)
+        if not all(groups):
+            raise RuntimeError("部分章节没有逐词时间，无法切分音频")
+        cut_times = []
+        for previous, following in zip(groups, groups[1:]):
+            end = previous[-1]['offset'] + previous[-1]['duration']
+            if following[0]['offset'] < end:
+                raise RuntimeError("逐词时间顺序异常，无法切分音频")
+            cut_times.append((end + following[0]['offset']) / 2 / 1e7)
+        
+        # 全部切分并检查后再移动到最终位置
+        offset = 0.0
+        for (job, text), piece, events in zip(pending, split_frames(data, cut_times), groups):
+            tmp_path = os.path.join(tmp_dir, os.path.basename(get_mp3_path(job)))
+            outputs.append(tmp_path)
+            with open(tmp_path, 'wb') as f:
+                f.write(piece)
+            reason = "没有有效的音频帧" if not piece else None
+            if reason is None and checker is not None:
+                reason = checker.check(tmp_path, len(text), remember=False)
+            if reason is not None:
+                raise RuntimeError(f"音频校验失败: {job['name']}：{reason}")
+            if subtitles:
+                # 逐词时间改为相对于本章音频开头
+                shifted = [dict(event, offset=event['offset'] - int(offset * 1e7)) for event in events]
+                write_subtitles(tmp_path, group_word_boundaries(text, shifted, subtitles['max_chars']),
+                                subtitles['formats'])
+            offset += scan_mp3(piece)['duration']
+        
+        for (job, text), tmp_path in zip(pending, outputs):
+            final_path = get_mp3_path(job)
+            move_subtitles(tmp_path, final_path)
+            shutil.move(tmp_path, final_path)
+            if cache is not None:
+                cache.put(audio_key(text, client.cache_voice, client.rate), final_path,
+                          ('.srt',) if subtitles else ())
+            results[job['name']] = 'converted'
+            print(f"已完成: {os.path.basename(final_path)}")
+    except Exception:
+        for tmp_path in outputs:
+            remove_chapter_audio(tmp_path)
+        raise
+    finally:
+        if os.path.exists(batch_path):
+            os.remove(batch_path)
+    return results
+
+def cleanup_tmp_dir(tmp_dir):
+    """清理临时目录中未完成的章节文件，保留未完成章节的分段以便下次继续"""
+    if not os.path.isdir(tmp_dir):
+        return
+    for entry in os.listdir(tmp_dir):
+        path = os.path.join(tmp_dir, entry)
+        if os.path.isdir(path):
+            if not os.listdir(path):
+                os.rmdir(path)
+        else:
+            os.remove(path)
+    if not os.listdir(tmp_dir):
+        os.rmdir(tmp_dir)
+
+def remove_empty_dir(path):
+    """目录为空时删除（其他进程可能同时写入，删除失败时忽略）"""
+    try:
+        os.rmdir(path)
+    except OSError:
+        pass
+
+def create_limiter(concurrency, max_concurrency=None, capabilities=None):
+    """按配置文件中的 tts_concurrency 选项创建并发控制器
+
+    concurrency 为初始并发数；adaptive 为 false 时固定使用该并发数。
+    后端不需要自适应并发时（如本地引擎）固定使用后端的并发上限。
+    """
+    capabilities = capabilities or {}
+    if not capabilities.get('adaptive', True):
+        fixed = capabilities.get('max_concurrency') or concurrency
+        return AdaptiveLimiter(fixed, fixed, fixed)
+    options = load_config().get('tts_concurrency', {})
+    if not options.get('adaptive', True):
+        return AdaptiveLimiter(concurrency, concurrency, concurrency)
+    return AdaptiveLimiter(
+        concurrency,
+        minimum=int(options.get('min', DEFAULT_MIN_CONCURRENCY)),
+        maximum=int(max_concurrency or options.get('max', DEFAULT_MAX_CONCURRENCY)),
+        latency_target=float(options.get('latency_target') or 0) or None
+    )
+
+async def renew_leases(leases):
+    """定期为正在转换的章节续约，间隔为租约有效期的三分之一"""
+    while True:
+        await asyncio.sleep(leases.ttl / 3)
+        try:
+            leases.renew()
+        except OSError as e:
+            print(f"任务租约续约失败: {str(e)}")
+
+async def convert_chapters(queue, client, limiter, normalizer, cache=None, leases=None, subtitles=None,
+                           progress=None, checker=None, batch=None, recorder=None):
+    """在同一个事件循环中并发执行队列中的任务，同时进行的请求数由 limiter 控制
+
+    同时转换的章节数不超过当前的并发上限，各章节的分段不会与大量其他章节争抢请求名额，
+    章节基本按队列（调度策略）顺序完成。
+    多个进程共用数据目录时，每个章节先取得租约再转换；章节正由其他进程转换时推迟到
+    稍后再检查，其他进程退出后租约过期，章节由仍在运行的进程接手。
+    progress 为 ProgressReporter，记录各章节的开始、完成和失败事件。
+    batch 为短章节合并转换的参数（get_batch_options()），取出短章节时把紧随其后的
+    短章节一起合并为一个合成请求，合并转换失败时改为逐章转换。
+    recorder 为 SynthesisRecorder，记录转换完成的章节使用的语音和语速。
+    """
+    leases = leases or open_lease_manager()
+    progress = progress or ProgressReporter()
+    readers = {}
+    plans = {}
+    converted_count = 0
+    # 按小说和章节序号查找任务，用于合并连续的短章节
+    by_index = {(job['novel'], job['index']): key for key, job in queue.jobs.items() if 'index' in job}
+    in_flight = 0
+    chapter_slots = asyncio.Condition()
+    
+    async def acquire_chapter_slot():
+        nonlocal in_flight
+        async with chapter_slots:
+            while in_flight >= limiter.limit:
+                # 并发上限提高时没有章节完成也要重新检查
+                try:
+                    await asyncio.wait_for(chapter_slots.wait(), 1.0)
+                except asyncio.TimeoutError:
+                    pass
+            in_flight += 1
+    
+    async def release_chapter_slot():
+        nonlocal in_flight
+        async with chapter_slots:
+            in_flight -= 1
+            chapter_slots.notify_all()
+    
+    def is_short(job):
+        return 0 < job.get('chars', 0) <= batch['chapter_max_chars']
+    
+    def claim_batch(job):
+        """取出紧随 job 之后、可以与其合并转换的短章节（已取得租约），返回包括 job 在内的任务列表"""
+        jobs = [job]
+        if batch is None or not is_short(job):
+            return jobs
+        total = job['chars']
+        while True:
+            key = by_index.get((job['novel'], jobs[-1]['index'] + 1))
+            following = queue.jobs.get(key) if key else None
+            if following is None or not is_short(following) or total + following['chars'] > batch['max_chars']:
+                return jobs
+            if not queue.is_ready(key) or not leases.acquire(key):
+                return jobs
+            jobs.append(queue.claim(key))
+            total += following['chars']
+    
+    async def worker():
+        while queue.jobs:
+            await acquire_chapter_slot()
+            try:
+                found = await convert_next()
+            finally:
+                await release_chapter_slot()
+            if not found:
+                # 其余任务正在执行、等待退避结束或由其他进程转换
+                await asyncio.sleep(min(queue.wait_time() or 1.0, 1.0))
     
+    async def convert_next():
+        """取出一个就绪的任务（连同可合并的短章节）转换，没有就绪的任务时返回 False"""
+        nonlocal converted_count
+        job = queue.next_ready()
+        if job is None:
+            return False
+        if not leases.acquire(job_key(job['novel'], job['name'])):
+            queue.defer(job, leases.ttl / 4)
+            return True
+        
+        reader = readers.get(job['novel_path'])
+        if reader is None:
+            reader = readers[job['novel_path']] = open_chapter_reader(job['novel_path'])
+            plans[job['novel_path']] = load_segment_plan(job['novel_path'])
+        plan = plans[job['novel_path']]
+        jobs = claim_batch(job)
+        for job in jobs:
+            progress.chapter_started(job)
+        
+        results = {}
+        if len(jobs) > 1:
+            def on_batch_audio():
+                for job in jobs:
+                    progress.chapter_audio(job)
+            try:
+                results = await convert_batch(jobs, reader, client, normalizer, limiter, cache,
+                                              leases.worker_id, subtitles, on_batch_audio, checker)
+            except Exception as e:
+                print(f"合并转换失败: {str(e) or e.__class__.__name__}，改为逐章转换")
+        
+        for job in jobs:
+            try:
+                result = results.get(job['name'])
+                if result is None:
+                    result = await convert_chapter(job, reader, plan, client, normalizer, limiter, cache,
+                                                   leases.worker_id, subtitles,
+                                                   lambda job=job: progress.chapter_audio(job), checker)
+                if result != 'skipped':
+                    converted_count += 1
+                    if recorder is not None:
+                        recorder.record(job)
+                queue.succeed(job)
+                size = os.path.getsize(get_mp3_path(job)) if result != 'skipped' else 0
+                progress.chapter_finished(job, result, size)
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+                dead = queue.fail(job, error)
+                progress.chapter_failed(job, error, dead)
+                if dead:
+                    print(f"转换失败: {job['name']}, 错误: {error}，已失败 {job['attempts']} 次，不再重试")
+                else:
+                    print(f"转换失败: {job['name']}, 错误: {error}，"
+                          f"将在 {job['next_time'] - time.time():.0f} 秒后重试（第 {job['attempts']} 次失败）")
+            finally:
+                leases.release(job_key(job['novel'], job['name']))
+        queue.save(force=False)
+        return True
+    
+    renewer = asyncio.ensure_future(renew_leases(leases))
+    try:
+        # 工作协程按并发上限的最大值准备，上限提高后可以同时转换更多章节
+        await asyncio.gather(*(worker() for _ in range(max(1, min(limiter.maximum, len(queue.jobs))))))
+    finally:
+        renewer.cancel()
+        leases.release_all()
+        for reader in readers.values():
+            reader.close()
+    return converted_count
+
+async def process_tts_async(voice, rate, total_chapters, concurrency, retry_dead=False, max_concurrency=None,
+                            policy=None, warmup=None, worker_id=None, backend=None, events=None,
+                            resynthesize=False):
+    """处理语音转换，整个过程只使用一个事件循环
+
+    未转换的章节放入持久化任务队列，失败的章节按指数退避重试，多次失败后移入死信列表；
+    队列中只剩死信任务时结束。多个进程（包括共用数据目录的多台主机）可以同时运行，
+    章节通过任务租约分配，各进程按 worker_id 使用各自的队列文件和临时目录；
+    进程标识在运行期间加锁独占，未指定时同一主机上的第二个进程自动改用 主机名-2 等标识。
+    backend 为语音合成后端名称，默认使用配置文件中的 tts_backend；events 为进度事件
+    （JSON lines）写入的文件或命名管道。resynthesize 为 True 时已转换的章节也重新合成，
+    只换语速时可以改用 rate_variants.py 由已有音频变速生成。
+    """
+    normalizer = get_speech_normalizer()
+    base_path = get_base_path()
+    text_dir = os.path.join(base_path, "data", "out_text")
+    mp3_root = os.path.join(base_path, "data", "out_mp3")
+    
+    worker_id, worker_lock = claim_worker_id(get_workers_dir(), worker_id)
+    leases = open_lease_manager(worker_id)
+    queue = open_job_queue(leases.worker_id)
+    cache = open_audio_cache()
+    client = create_backend(backend, voice, rate)
+    limiter = create_limiter(concurrency, max_concurrency, client.capabilities)
+    # 后端能提供逐词时间时同时生成字幕
+    subtitles = get_subtitle_options()
+    if not (subtitles['enabled'] and client.capabilities.get('word_boundaries')):
+        subtitles = None
+    # 合并短章节需要按逐词时间切分音频
+    batch = get_batch_options() if client.capabilities.get('word_boundaries') else None
+    # 按调度策略排列任务，未指定的选项使用配置文件中的值
+    schedule = load_config().get('tts_schedule', {})
+    policy = policy or schedule.get('policy', SCHEDULE_ROUND_ROBIN)
+    warmup = schedule.get('warmup_chapters', 0) if warmup is None else warmup
+    progress = ProgressReporter(events)
+    recorder = SynthesisRecorder(client.cache_voice, client.rate)
+    checker = open_audio_checker()
+    pending = collect_pending_chapters(text_dir, mp3_root, progress, checker, resynthesize)
+    jobs = schedule_jobs(pending, policy, warmup, schedule.get('weights'))
+    queue.sync(jobs)
+    if retry_dead and queue.dead:
+        print(f"重新加入 {queue.retry_dead()} 个死信任务")
+    print(f"待转换章节 {len(queue.jobs)} 个（进程 {leases.worker_id}，合成后端 {client.name}）")
+    progress.run_started(worker=leases.worker_id, backend=client.name, voice=voice, rate=rate,
+                         chapters=len(queue.jobs), dead=len(queue.dead))
+    progress.queued(list(queue.jobs.values()))
+    try:
+        await client.start()
+        converted_count = await convert_chapters(queue, client, limiter, normalizer, cache, leases, subtitles,
+                                                 progress, checker, batch, recorder)
+    finally:
+        await client.close()
+        queue.save()
+        recorder.save()
+        if checker is not None:
+            checker.save()
+        if cache is not None:
+            cache.save()
+        # 在处理完所有章节后清理本进程的临时目录
+        for mp3_dir in {job['mp3_dir'] for job in jobs}:
+            try:
+                cleanup_tmp_dir(os.path.join(mp3_dir, "tmp", leases.worker_id))
+                remove_empty_dir(os.path.join(mp3_dir, "tmp"))
+            except Exception as e:
+                print(f"清理临时目录失败: {str(e)}")
+        worker_lock.release()
+    
+    total_converted = count_converted_chapters()
+    progress.run_finished(converted=converted_count, total_converted=total_converted, dead=len(queue.dead))
+    progress.close()
+    print(f"本次转换 {converted_count} 个章节，已转换 {total_converted}/{total_chapters} 章节")
+    if progress.first_audio is not None:
+        print(f"首段音频用时 {progress.first_audio:.2f} 秒，最近合成速度 {progress.rate() or 0:.1f} 字/秒")
+    if cache is not None and cache.hits:
+        print(f"其中 {cache.hits} 个章节使用了缓存的音频")
+    if client.requests:
+        print(client.describe())
+    stats = limiter.stats()
+    if stats['requests']:
+        print(f"合成请求 {stats['requests']} 次，失败 {stats['errors']} 次（过载 {stats['overloads']} 次），"
+              f"最终并发上限 {stats['limit']}，{limiter.describe()}")
+    if queue.dead:
+        print(f"有 {len(queue.dead)} 个章节多次转换失败，已移入死信列表（使用 --retry-dead 重新转换）：")
+        for job in queue.dead.values():
+            print(f"  {job['novel']}/{job['name']}：{job['last_error']}")
+    else:
+        print(f"所有章节均已转换完成，共 {total_converted} 章节")
     return total_converted
 
-async def text_to_speech(text, output_path, voice, rate):
-    """将文本转换为语音"""
-    communicate = edge_tts.Communicate(text, voice, rate=rate)
-    await communicate.save(output_path)
+def process_tts(voice="zh-CN-YunxiNeural", rate="+0%", total_chapters=0, concurrency=DEFAULT_CONCURRENCY,
+                retry_dead=False, max_concurrency=None, policy=None, warmup=None, worker_id=None, backend=None,
+                events=None, resynthesize=False):
+    """处理语音转换的主函数
+
+    concurrency 为初始并发请求数，启用自适应并发时在配置的上下限（或 max_concurrency）之间自动调整；
+    retry_dead 为是否重试死信任务；policy 和 warmup 为调度策略和优先转换的开头章节数，
+    默认使用配置文件 tts_schedule 中的值；worker_id 为进程标识，默认为主机名，
+    同一主机上的其他进程已在使用时自动改用 主机名-2 等；backend 为语音合成后端（edge 或 local）；
+    events 为进度事件（JSON lines）的输出文件；resynthesize 为是否重新合成已转换的章节。
+    """
+    return asyncio.run(process_tts_async(voice, rate, total_chapters, max(1, concurrency), retry_dead,
+                                         max_concurrency, policy, warmup, worker_id, backend, events,
+                                         resynthesize))
+
+async def text_to_speech(text, output_path, voice, rate, connector=None, boundaries=None):
+    """将文本转换为语音，boundaries 为列表时把逐词时间（WordBoundary）事件加入其中"""
+    communicate = edge_tts.Communicate(text, voice, rate=rate, connector=connector, boundary="WordBoundary")
+    with open(output_path, 'wb') as f:
+        async for chunk in communicate.stream():
+            if chunk['type'] == 'audio':
+                f.write(chunk['data'])
+            elif boundaries is not None and chunk['type'] == 'WordBoundary':
+                boundaries.append(chunk)
+
+async def _closed():
+    pass
+
+class SharedConnector(aiohttp.TCPConnector):
+    """整个运行期间共用的连接器，并统计建立连接（DNS、TCP、TLS）的次数和耗时
+
+    edge_tts 每次请求结束都会关闭自己创建的会话，会话关闭时会连带关闭连接器，
+    因此这里的 close() 不做任何事，运行结束时调用 shutdown() 真正关闭。
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.connect_count = 0
+        self.connect_time = 0.0
+
+    async def connect(self, req, traces, timeout):
+        start = time.monotonic()
+        try:
+            return await super().connect(req, traces, timeout)
+        finally:
+            self.connect_count += 1
+            self.connect_time += time.monotonic() - start
+
+    def close(self, *args, **kwargs):
+        return _closed()
+
+    async def shutdown(self):
+        await super().close()
+
+class TTSBackend:
+    """语音合成后端接口：合成、列出可用语音和说明后端能力
+
+    capabilities 中 network 表示是否需要联网，adaptive 表示是否按服务端限流自适应调整并发，
+    max_concurrency 为同时合成数的上限（None 为不限），word_boundaries 表示能否提供逐词时间。
+    子类实现 synthesize() 和 list_voices()，需要准备或释放资源时实现 start() 和 close()。
+    """
+
+    name = ''
+    capabilities = {'network': False, 'adaptive': False, 'max_concurrency': None, 'word_boundaries': False}
+
+    def __init__(self, voice, rate):
+        self.voice = voice
+        self.rate = rate
+        self.requests = 0
+        self.request_time = 0.0
+
+    @property
+    def cache_voice(self):
+        """音频缓存键中的语音部分，区分不同后端的同名语音"""
+        return f"{self.name}:{self.voice}"
+
+    def list_voices(self):
+        """可用的语音列表"""
+        raise NotImplementedError
+
+    async def start(self):
+        pass
+
+    async def synthesize(self, text, output_path, boundaries=None):
+        """合成一段文本并保存为 MP3 文件 output_path
+
+        后端支持 word_boundaries 且 boundaries 为列表时，把逐词时间事件（offset、duration
+        以 100 纳秒为单位，text 为词）加入其中。
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def describe(self):
+        """合成请求的次数和平均耗时"""
+        return f"合成请求 {self.requests} 次，平均合成 {self.request_time / max(1, self.requests):.2f} 秒"
+
+class EdgeTTSBackend(TTSBackend):
+    """Edge TTS 在线语音合成：所有请求共用一个连接器（DNS 缓存等），运行开始时预热，
+    并分别统计建立连接和合成语音的耗时"""
+
+    name = 'edge'
+    capabilities = {'network': True, 'adaptive': True, 'max_concurrency': None, 'word_boundaries': True}
+
+    def __init__(self, voice, rate):
+        super().__init__(voice, rate)
+        self.connector = None
+        self._connect_base = (0, 0.0)
+
+    @property
+    def cache_voice(self):
+        # 与引入多个后端之前的缓存键保持一致
+        return self.voice
+
+    def list_voices(self):
+        return get_chinese_voices()
+
+    async def start(self):
+        """创建连接器，并发送一个很短的请求预热 DNS 缓存和连接"""
+        url = os.environ.get(EDGE_TTS_URL_ENV)
+        if url:
+            # edge_tts 每次请求时读取该模块变量
+            edge_tts.communicate.WSS_URL = url
+            print(f"使用兼容服务: {url}")
+        self.connector = SharedConnector(ttl_dns_cache=WARMUP_DNS_TTL)
+        start = time.monotonic()
+        try:
+            communicate = edge_tts.Communicate(WARMUP_TEXT, self.voice, rate=self.rate, connector=self.connector)
+            async for _ in communicate.stream():
+                pass
+            print(f"连接预热完成，用时 {time.monotonic() - start:.2f} 秒"
+                  f"（建立连接 {self.connector.connect_time:.2f} 秒）")
+        except Exception as e:
+            print(f"连接预热失败: {str(e) or e.__class__.__name__}")
+        self._connect_base = (self.connector.connect_count, self.connector.connect_time)
+
+    async def synthesize(self, text, output_path, boundaries=None):
+        start = time.monotonic()
+        try:
+            await text_to_speech(text, output_path, self.voice, self.rate, self.connector, boundaries)
+        finally:
+            self.requests += 1
+            self.request_time += time.monotonic() - start
+
+    async def close(self):
+        if self.connector is not None and not self.connector.closed:
+            await self.connector.shutdown()
+
+    def describe(self):
+        """建立连接和合成语音的平均耗时（不含预热）"""
+        connects = self.connector.connect_count - self._connect_base[0]
+        connect_time = self.connector.connect_time - self._connect_base[1]
+        synthesis_time = self.request_time - connect_time
+        text = f"建立连接 {connects} 次，平均 {connect_time / max(1, connects):.2f} 秒"
+        if self.requests:
+            text += f"；合成请求 {self.requests} 次，平均合成 {synthesis_time / self.requests:.2f} 秒"
+        return text
+
+def get_ffmpeg_path():
+    """获取ffmpeg路径，项目目录中没有时使用系统中安装的 ffmpeg"""
+    path = os.path.join(get_base_path(), "ffmpeg", "ffmpeg.exe")
+    return path if os.path.exists(path) else "ffmpeg"
+
+def parse_rate(rate):
+    """把 "+10%" 形式的语速转换为百分比数值"""
+    try:
+        return int(str(rate).strip().rstrip('%'))
+    except ValueError:
+        return 0
+
+class LocalCommandBackend(TTSBackend):
+    """调用本地命令行合成引擎（默认 espeak-ng），不需要联网
+
+    命令、语音列表和同时运行的进程数在配置的 tts_local 中设置，命令参数中的占位符见
+    DEFAULT_LOCAL_COMMAND。引擎输出 WAV 时用 ffmpeg 转为与 Edge TTS 相同规格的 MP3，直接输出 MP3 时
+    去掉标签和信息帧，分段可以直接拼接。同时运行的合成进程数默认为 CPU 核数。
+    """
+
+    name = 'local'
+
+    def __init__(self, voice, rate, options=None):
+        super().__init__(voice, rate)
+        options = load_config().get('tts_local', {}) if options is None else options
+        self.command = options.get('command') or DEFAULT_LOCAL_COMMAND
+        self.voices = options.get('voices') or DEFAULT_LOCAL_VOICES
+        self.output_format = options.get('output_format', 'wav')
+        self.speed = round(int(options.get('base_speed', DEFAULT_LOCAL_SPEED)) * (1 + parse_rate(rate) / 100))
+        self.workers = int(options.get('workers') or 0) or os.cpu_count() or 1
+        self.capabilities = dict(TTSBackend.capabilities, max_concurrency=self.workers)
+        self._slots = None
+
+    def list_voices(self):
+        return list(self.voices)
+
+    async def start(self):
+        """检查合成引擎和 ffmpeg 是否可用"""
+        programs = [self.command[0]]
+        if self.output_format != 'mp3':
+            programs.append(get_ffmpeg_path())
+        for program in programs:
+            if not os.path.exists(program) and shutil.which(program) is None:
+                raise RuntimeError(f"找不到本地合成程序: {program}")
+        self._slots = asyncio.Semaphore(self.workers)
+        print(f"使用本地合成引擎 {self.command[0]}，同时运行 {self.workers} 个进程")
+
+    async def _run(self, args):
+        """运行外部命令，失败时抛出包含错误输出的异常"""
+        process = await asyncio.create_subprocess_exec(
+            *args, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            message = stderr.decode('utf-8', errors='replace').strip()[-200:]
+            raise RuntimeError(f"{os.path.basename(args[0])} 退出码 {process.returncode}: {message}")
+
+    async def synthesize(self, text, output_path, boundaries=None):
+        input_path = output_path + '.txt'
+        raw_path = output_path if self.output_format == 'mp3' else f"{output_path}.{self.output_format}"
+        start = time.monotonic()
+        async with self._slots:
+            try:
+                with open(input_path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                values = {'input': input_path, 'output': raw_path, 'voice': self.voice,
+                          'speed': self.speed, 'rate': self.rate}
+                await self._run([arg.format(**values) for arg in self.command])
+                if raw_path != output_path:
+                    # 转为单声道 24kHz 48kbps 的 MP3，与 Edge TTS 输出一致：只有音频帧，不写 ID3 标签和
+                    # Xing/Info 信息帧，否则拼接后中间夹着标签，开头的信息帧只记录第一段的帧数
+                    await self._run([get_ffmpeg_path(), '-y', '-loglevel', 'error', '-i', raw_path,
+                                     '-map_metadata', '-1', '-ac', '1', '-ar', '24000', '-b:a', '48k',
+                                     '-write_xing', '0', '-id3v2_version', '0', '-f', 'mp3', output_path])
+                else:
+                    strip_mp3_tags(output_path)
+            finally:
+                for path in (input_path, raw_path):
+                    if path != output_path and os.path.exists(path):
+                        os.remove(path)
+                self.requests += 1
+                self.request_time += time.monotonic() - start
+
+# 可用的语音合成后端
+TTS_BACKENDS = {
+    EdgeTTSBackend.name: EdgeTTSBackend,
+    LocalCommandBackend.name: LocalCommandBackend
+}
+
+def create_backend(name, voice, rate):
+    """按名称创建语音合成后端，未指定时使用配置文件中的 tts_backend"""
+    name = name or load_config().get('tts_backend', DEFAULT_BACKEND)
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"未知的语音合成后端: {name}")
+    return TTS_BACKENDS[name](voice, rate)
+
+def get_backend_voices(name=None):
+    """获取合成后端的语音列表"""
+    return create_backend(name, None, "+0%").list_voices()
 
 def get_chinese_voices():
     """获取中文语音列表"""
@@ -130,16 +1079,40 @@ def get_chinese_voices():
     return voices
 
 if __name__ == "__main__":
-    import sys
+    # 位置参数：语音 语速 [总章节数]；语速可能以“-”开头，因此位置参数不交给 argparse 解析
+    parser = argparse.ArgumentParser(
+        description="将章节文本转换为语音",
+        usage="%(prog)s 语音 语速 [总章节数] [--concurrency N]",
+        allow_abbrev=False
+    )
+    parser.add_argument('--concurrency', '-c', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"初始并发请求数，默认 {DEFAULT_CONCURRENCY}")
+    parser.add_argument('--max-concurrency', type=int, help="自适应并发的上限，默认使用配置文件中的值")
+    parser.add_argument('--retry-dead', action='store_true', help="重新转换多次失败后进入死信列表的章节")
+    parser.add_argument('--schedule', choices=SCHEDULE_POLICIES,
+                        help="调度策略：round_robin 各小说轮流转换，sequential 逐本转换")
+    parser.add_argument('--warmup', type=int, help="先转换每本小说的前 N 章")
+    parser.add_argument('--backend', choices=sorted(TTS_BACKENDS),
+                        help="语音合成后端：edge 在线合成，local 本地命令行引擎，默认使用配置文件中的值")
+    parser.add_argument('--events', help="把进度事件以 JSON lines 格式追加写入该文件（也可以是命名管道）")
+    parser.add_argument('--worker-id', help="进程标识，多个进程共用数据目录时用于区分队列文件和临时目录，"
+                             "默认为主机名（已被同一主机上的其他进程使用时改用 主机名-2 等）")
+    parser.add_argument('--resynthesize', action='store_true',
+                        help="重新合成已转换的章节（只换语速时可以用 rate_variants.py 由已有音频变速生成）")
+    args, positional = parser.parse_known_args()
+    if len(positional) < 2:
+        parser.error("需要提供语音和语速参数")
     
     # 获取命令行参数
-    voice = sys.argv[1]
-    rate = sys.argv[2]
-    total_chapters = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    voice = positional[0]
+    rate = positional[1]
+    total_chapters = int(positional[2]) if len(positional) > 2 else 0
     
     try:
-        # 执行转换直到所有章节都完成
-        count = process_tts(voice, rate, total_chapters)
+        # 执行转换直到所有章节都完成或进入死信列表
+        count = process_tts(voice, rate, total_chapters, args.concurrency, args.retry_dead, args.max_concurrency,
+                            args.schedule, args.warmup, args.worker_id, args.backend, args.events,
+                            args.resynthesize)
         print(f"转换完成，共转换 {count} 个章节")
     except Exception as e:
-        print(f"转换失败: {str(e)}")
\ No newline at end of file
+        print(f"转换失败: {str(e)}")
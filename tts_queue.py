@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import heapq
+import random
+from collections import deque
+from typing import List, Dict, Optional
+
+# 默认重试参数：最多尝试次数，退避基准和上限（秒）
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BASE_DELAY = 2.0
+DEFAULT_MAX_DELAY = 300.0
+# 两次保存队列文件之间的最短间隔（秒）
+QUEUE_SAVE_INTERVAL = 2.0
+# 调度策略：sequential 逐本转换，round_robin 各小说轮流转换
+SCHEDULE_SEQUENTIAL = 'sequential'
+SCHEDULE_ROUND_ROBIN = 'round_robin'
+SCHEDULE_POLICIES = (SCHEDULE_ROUND_ROBIN, SCHEDULE_SEQUENTIAL)
+
+def job_key(novel: str, name: str) -> str:
+    """任务键：小说目录名/章节名"""
+    return f"{novel}/{name}"
+
+def _interleave(groups: Dict[str, List[Dict]], weights: Dict[str, int]) -> List[Dict]:
+    """按权重轮流从各小说取任务：每一轮从每本小说取“权重”个章节"""
+    ordered = []
+    positions = {novel: 0 for novel in groups}
+    while positions:
+        for novel in list(positions):
+            start = positions[novel]
+            end = start + weights[novel]
+            ordered.extend(groups[novel][start:end])
+            if end >= len(groups[novel]):
+                del positions[novel]
+            else:
+                positions[novel] = end
+    return ordered
+
+def schedule_jobs(jobs: List[Dict], policy: str = SCHEDULE_ROUND_ROBIN, warmup: int = 0,
+                  weights: Optional[Dict[str, float]] = None) -> List[Dict]:
+    """按调度策略排列任务顺序
+
+    jobs 中每项包含 novel 和章节在小说中的序号 index，同一小说的任务按序号排列。
+    warmup 大于0时，先轮流转换每本小说的前 warmup 章，让每本书都能尽快开始收听；
+    其余章节按 policy 排列。weights 为各小说的优先级权重（默认1），权重高的小说
+    排在前面，轮流转换时每轮转换的章节数与权重成正比。
+    """
+    weights = {novel: max(1, int(round(weight))) for novel, weight in (weights or {}).items()}
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job['novel'], []).append(job)
+    for group in groups.values():
+        group.sort(key=lambda job: job['index'])
+    # 权重高的小说优先，权重相同时保持原有顺序
+    novels = sorted(groups, key=lambda novel: -weights.get(novel, 1))
+    weights = {novel: weights.get(novel, 1) for novel in novels}
+
+    heads = {novel: [job for job in groups[novel] if job['index'] < warmup] for novel in novels}
+    rest = {novel: [job for job in groups[novel] if job['index'] >= warmup] for novel in novels}
+    ordered = _interleave(heads, weights)
+    if policy == SCHEDULE_SEQUENTIAL:
+        for novel in novels:
+            ordered.extend(rest[novel])
+    else:
+        ordered.extend(_interleave(rest, weights))
+    return ordered
+
+class TTSJobQueue:
+    """持久化的语音合成任务队列
+
+    每个任务记录尝试次数、最近一次错误和下次可执行时间。失败后按指数退避加随机抖动
+    延后重试，尝试次数达到上限后移入死信列表，之后的运行不再自动重试，
+    直到章节内容变化或显式调用 retry_dead()。成功的任务直接从队列中删除。
+    """
+
+    def __init__(self, path: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY):
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jobs = {}
+        self.dead = {}
+        self._ready = deque()
+        self._delayed = []
+        self._saved_at = 0.0
+        self.load()
+
+    def load(self):
+        """读取队列文件，文件不存在或损坏时从空队列开始"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.jobs = data.get('jobs', {})
+        self.dead = data.get('dead', {})
+        self._rebuild()
+
+    def save(self, force: bool = True):
+        """原子替换队列文件；force 为 False 时距上次保存不足 QUEUE_SAVE_INTERVAL 秒则跳过"""
+        if not force and time.monotonic() - self._saved_at < QUEUE_SAVE_INTERVAL:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'jobs': self.jobs, 'dead': self.dead}, f,
+                      ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        self._saved_at = time.monotonic()
+
+    def _rebuild(self):
+        """按下次可执行时间重建就绪队列和延迟堆"""
+        self._ready = deque()
+        self._delayed = []
+        now = time.time()
+        for key, job in self.jobs.items():
+            if job['next_time'] <= now:
+                self._ready.append(key)
+            else:
+                heapq.heappush(self._delayed, (job['next_time'], key))
+
+    def sync(self, pending: List[Dict]) -> int:
+        """用当前尚未转换的章节更新队列，返回新加入的任务数
+
+        pending 中每项至少包含 novel、name 和章节内容哈希 hash。已在队列中且内容未变的
+        任务保留尝试记录；内容变化的任务（包括死信）重新开始；已不在 pending 中的
+        任务（已转换或章节已删除）从队列和死信列表中删除。
+        """
+        jobs = {}
+        dead = {}
+        added = 0
+        for job in pending:
+            key = job_key(job['novel'], job['name'])
+            old = self.jobs.get(key) or self.dead.get(key)
+            if old and old.get('hash') == job['hash']:
+                old.update(job)
+                (dead if key in self.dead else jobs)[key] = old
+                continue
+            jobs[key] = dict(job, attempts=0, last_error=None, next_time=0)
+            added += 1
+        self.jobs = jobs
+        self.dead = dead
+        self._rebuild()
+        return added
+
+    def retry_dead(self) -> int:
+        """把死信列表中的任务重新放回队列，返回数量"""
+        count = len(self.dead)
+        for key, job in self.dead.items():
+            job.update(attempts=0, next_time=0)
+            self.jobs[key] = job
+        self.dead = {}
+        self._rebuild()
+        return count
+
+    def _promote(self):
+        """把已到可执行时间的延迟任务移入就绪队列"""
+        now = time.time()
+        while self._delayed and self._delayed[0][0] <= now:
+            self._ready.append(heapq.heappop(self._delayed)[1])
+
+    def next_ready(self) -> Optional[Dict]:
+        """取出一个已到可执行时间的任务，没有时返回 None"""
+        self._promote()
+        while self._ready:
+            key = self._ready.popleft()
+            if key in self.jobs:
+                return self.jobs[key]
+        return None
+
+    def is_ready(self, key: str) -> bool:
+        """任务是否在就绪队列中（已到可执行时间且尚未被取出）"""
+        self._promote()
+        return key in self.jobs and key in self._ready
+
+    def claim(self, key: str) -> Optional[Dict]:
+        """取出指定的就绪任务（如与当前任务合并转换），不在就绪队列中时返回 None"""
+        if not self.is_ready(key):
+            return None
+        self._ready.remove(key)
+        return self.jobs[key]
+
+    def wait_time(self) -> Optional[float]:
+        """距下一个延迟任务可执行的秒数，没有延迟任务时返回 None"""
+        if not self._delayed:
+            return None
+        return max(0.0, self._delayed[0][0] - time.time())
+
+    def succeed(self, job: Dict):
+        """任务完成，从队列中删除"""
+        self.jobs.pop(job_key(job['novel'], job['name']), None)
+
+    def defer(self, job: Dict, delay: float):
+        """推迟任务而不计入尝试次数（如章节正由其他进程转换）"""
+        job['next_time'] = time.time() + delay
+        heapq.heappush(self._delayed, (job['next_time'], job_key(job['novel'], job['name'])))
+
+    def fail(self, job: Dict, error: str) -> bool:
+        """记录一次失败，返回任务是否已移入死信列表"""
+        key = job_key(job['novel'], job['name'])
+        job['attempts'] += 1
+        job['last_error'] = error
+        if job['attempts'] >= self.max_attempts:
+            self.jobs.pop(key, None)
+            self.dead[key] = job
+            return True
+
+        # 指数退避，在退避时间的一半到全部之间随机取值，避免大量任务同时重试
+        backoff = min(self.max_delay, self.base_delay * 2 ** (job['attempts'] - 1))
+        job['next_time'] = time.time() + random.uniform(backoff / 2, backoff)
+        heapq.heappush(self._delayed, (job['next_time'], key))
+        return False
@@ -47,6 +47,17 @@ def create_video(mp3_path: str, image_path: str, output_path: str) -> Optional[s
             get_ffmpeg_path(),
             '-i', tmp_video,
             '-i', mp3_path,
+        ]
+        # 音频带有字幕时作为软字幕轨道（mov_text）加入，音视频不重新编码
+        srt_path = os.path.splitext(mp3_path)[0] + '.srt'
+        if os.path.exists(srt_path):
+            cmd2 += [
+                '-i', srt_path,
+                '-map', '0:v', '-map', '1:a', '-map', '2:s',
+                '-c:s', 'mov_text',
+                '-metadata:s:s:0', 'language=chi'
+            ]
+        cmd2 += [
             '-c:v', 'copy',
             '-c:a', 'copy',
             '-y',